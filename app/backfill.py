@@ -0,0 +1,327 @@
+import os
+import io
+import json
+import gzip
+import time
+import argparse
+from datetime import datetime
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import pandas as pd
+import pyarrow.parquet as pq
+from storage import get_s3_client, S3_BUCKET
+from extract import RAW_PREFIX, json_loads
+from compact import MANIFEST_DIR
+from transform import build_features_from_transaction
+from load_model import ModelRegistry, MODEL_URI
+from model_cache import ModelArtifactCache
+from compiled_model import compile_pipeline
+from load import ensure_predictions_table_exists, upsert_predictions
+from dotenv import find_dotenv, load_dotenv
+import logging
+
+# Charger le .env
+env_path = find_dotenv()
+load_dotenv(env_path, override=True)
+
+# Log infos
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# === BACKFILL : history (fraudTest.csv or archived RAW objects) rescored and bulk loaded into public.transactions ===
+## Transactions per chunk (read, scored and loaded at once)
+BACKFILL_CHUNK_SIZE = int(os.getenv("BACKFILL_CHUNK_SIZE", "50000"))
+## Scoring processes (0 : scoring in the main process)
+BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", str(os.cpu_count() or 1)))
+## RAW objects downloaded at the same time
+BACKFILL_READ_WORKERS = int(os.getenv("BACKFILL_READ_WORKERS", "16"))
+## Progress saved after every loaded chunk (a restarted backfill goes on from there)
+BACKFILL_CHECKPOINT = os.getenv("BACKFILL_CHECKPOINT", "backfill_checkpoint.json")
+
+## RAW objects : one API response per transaction (.json) or compacted hours (.parquet / .ndjson.gz)
+RAW_EXTENSIONS = (".json", ".parquet", ".ndjson.gz")
+
+
+# === Checkpoint : source, position reached (rows of the CSV / last RAW key), rows loaded, model version ===
+
+## None (start from the beginning) if the checkpoint is for another source or was scored by another model version
+def read_checkpoint(path: str, source: str, model_version=None):
+
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("source") != source:
+        logging.warning(f"⚠️ Point de reprise {path} ignoré : autre source ({checkpoint.get('source')})")
+        return None
+    if checkpoint.get("model_version") != model_version:
+        logging.warning(f"⚠️ Point de reprise {path} ignoré : transactions notées par une autre version du modèle "
+                        f"({checkpoint.get('model_version')}, version actuelle {model_version}), reprise depuis le début")
+        return None
+    return checkpoint
+
+## Replaced in one step (a crash never leaves a half-written checkpoint)
+def write_checkpoint(path: str, checkpoint: dict):
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+# === Sources : chunks of ((features, is_fraud), position after the chunk) ===
+
+## fraudTest.csv layout : features as built by build_features_from_transaction (ints as float64) + is_fraud
+def read_csv_chunks(path: str, chunk_size: int = BACKFILL_CHUNK_SIZE, start_row: int = 0):
+
+    skiprows = (lambda line: 0 < line <= start_row) if start_row else None
+    position = start_row
+    for chunk in pd.read_csv(path, index_col=0, chunksize=chunk_size, skiprows=skiprows):
+        is_fraud = chunk["is_fraud"].tolist()
+        features = chunk.drop(columns=["is_fraud"]).reset_index(drop=True)
+        features = features.astype({col: "float64" for col in features.select_dtypes(include=["int"]).columns})
+        position += len(chunk)
+        yield (features, is_fraud), position
+
+## RAW objects already merged into a compacted file (sources of the compaction manifests, kept without --delete)
+def compacted_sources(prefix: str = RAW_PREFIX, bucket: str = S3_BUCKET) -> set:
+
+    client = get_s3_client()
+    sources = set()
+    for page in client.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=f"{prefix}/{MANIFEST_DIR}/"):
+        for obj in page.get("Contents", []):
+            sources.update(json.loads(client.get_object(Bucket=bucket, Key=obj["Key"])["Body"].read())["sources"])
+    return sources
+
+## Keys of the RAW objects after `after`, in key order (resumed after the last key loaded)
+## Per-transaction objects also in a compacted file are skipped : each transaction is read once
+def list_raw_keys(prefix: str = RAW_PREFIX, bucket: str = S3_BUCKET, after: str = None) -> list:
+
+    paginator = get_s3_client().get_paginator("list_objects_v2")
+    params = {"Bucket": bucket, "Prefix": f"{prefix}/"}
+    if after:
+        params["StartAfter"] = after
+    skipped = compacted_sources(prefix, bucket)
+    manifests = f"{prefix}/{MANIFEST_DIR}/"
+    keys = []
+    for page in paginator.paginate(**params):
+        keys += [obj["Key"] for obj in page.get("Contents", []) if obj["Key"].endswith(RAW_EXTENSIONS)
+                 and not obj["Key"].startswith(manifests) and obj["Key"] not in skipped]
+    return sorted(keys)
+
+## API's response(s) stored in one RAW object, in the API's layout ('columns' / 'data')
+def read_raw_object(key: str, bucket: str = S3_BUCKET) -> dict:
+
+    body = get_s3_client().get_object(Bucket=bucket, Key=key)["Body"].read()
+    if key.endswith(".json"):
+        return json_loads(body)
+    if key.endswith(".parquet"):
+        data = pq.read_table(io.BytesIO(body)).to_pandas()
+    else:
+        # Values as written (current_time stays in ms, not parsed as a date)
+        data = pd.read_json(io.BytesIO(gzip.decompress(body)), orient="records", lines=True,
+                            convert_dates=False, dtype=False)
+    return {"columns": list(data.columns), "data": data.values.tolist()}
+
+## Whole RAW objects grouped until chunk_size transactions (position : last key of the chunk)
+def read_raw_chunks(keys: list, chunk_size: int = BACKFILL_CHUNK_SIZE, bucket: str = S3_BUCKET,
+                    read_workers: int = BACKFILL_READ_WORKERS):
+
+    columns, rows, last_key = None, [], None
+    with ThreadPoolExecutor(max_workers=read_workers) as executor:
+        # Downloads by groups of keys : memory bounded whatever the number of objects
+        for start in range(0, len(keys), read_workers * 8):
+            group = keys[start:start + read_workers * 8]
+            for key, data_api in zip(group, executor.map(lambda key: read_raw_object(key, bucket), group)):
+                if columns is None:
+                    columns = data_api["columns"]
+                elif data_api["columns"] != columns:
+                    positions = [data_api["columns"].index(col) for col in columns]
+                    data_api = {"columns": columns, "data": [[row[pos] for pos in positions] for row in data_api["data"]]}
+                rows += data_api["data"]
+                last_key = key
+                if len(rows) >= chunk_size:
+                    yield raw_chunk(columns, rows), last_key
+                    rows = []
+    if rows:
+        yield raw_chunk(columns, rows), last_key
+
+## Features as in the live pipeline + is_fraud of each transaction
+def raw_chunk(columns: list, rows: list):
+
+    data_api = {"columns": columns, "data": rows}
+    is_fraud_position = columns.index("is_fraud")
+    return build_features_from_transaction(data_api), [row[is_fraud_position] for row in rows]
+
+
+# === Scoring in worker processes (model sent once to each process) ===
+_scoring_model = None
+
+def init_scoring(model):
+
+    global _scoring_model
+    _scoring_model = model
+
+def score_chunk(features: pd.DataFrame):
+
+    return _scoring_model.predict(features)
+
+## Flat-array forest if the pipeline has the expected layout (same predictions, faster), sklearn pipeline otherwise
+def scoring_model(model):
+
+    try:
+        return compile_pipeline(model)
+    except ValueError as e:
+        logging.warning(f"⚠️ Modèle non compilable, scoring sklearn ({e})")
+        return model
+
+## Model of MODEL_URI (alias resolved once : the whole backfill is scored by the same version)
+def load_backfill_model(model_uri: str = MODEL_URI):
+
+    registry = ModelRegistry(model_uri=model_uri, poll_interval=0, cache=ModelArtifactCache()).start()
+    return registry.get(), registry.version
+
+
+# === Backfill : read -> score (process pool) -> COPY + upsert into public.transactions, checkpoint after each chunk ===
+class Backfill:
+
+    def __init__(self, model, source: str, chunk_size: int = BACKFILL_CHUNK_SIZE, workers: int = BACKFILL_WORKERS,
+                 checkpoint_path: str = BACKFILL_CHECKPOINT, model_version=None):
+
+        self.model = scoring_model(model)
+        self.source = source
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.checkpoint_path = checkpoint_path
+        self.model_version = model_version
+        self.stats = {"chunks": 0, "rows": 0, "read_seconds": 0.0, "load_seconds": 0.0}
+
+    ## Score and load every chunk of `chunks` ((features, is_fraud), position), up to max_rows transactions
+    def run(self, chunks, checkpoint: dict = None, max_rows: int = None) -> dict:
+
+        ensure_predictions_table_exists()
+        self.stats["rows"] = start_rows = checkpoint["rows"] if checkpoint else 0
+        start_time = time.perf_counter()
+
+        pool = ProcessPoolExecutor(self.workers, initializer=init_scoring, initargs=(self.model,)) if self.workers else None
+        self._loader = ThreadPoolExecutor(max_workers=1)
+        self._last_load = None
+        # Chunks read ahead and scored at the same time : memory bounded, processes busy while a chunk is loaded
+        pending = deque()
+        submitted = 0
+        try:
+            for (features, is_fraud), position in self._timed_read(chunks):
+                scoring = pool.submit(score_chunk, features) if pool else None
+                pending.append((features, is_fraud, position, scoring))
+                submitted += len(features)
+                if len(pending) > max(self.workers, 1):
+                    self._load_next(pending)
+                if max_rows is not None and submitted >= max_rows:
+                    break
+            while pending:
+                self._load_next(pending)
+            if self._last_load is not None:
+                self._last_load.result()
+        finally:
+            self._loader.shutdown(wait=True)
+            if pool is not None:
+                pool.shutdown(wait=True, cancel_futures=True)
+
+        elapsed = time.perf_counter() - start_time
+        n_rows = self.stats["rows"] - start_rows
+        self.stats.update({"seconds": elapsed, "rows_per_s": n_rows / max(elapsed, 1e-9)})
+        logging.info(f"✅✅✅ Backfill : {n_rows} transactions chargées en {elapsed:.1f} s "
+                     f"({self.stats['rows_per_s']:.0f} transactions/s, lecture {self.stats['read_seconds']:.1f} s, "
+                     f"chargement {self.stats['load_seconds']:.1f} s) 💰💰💰")
+        return self.stats
+
+    def _timed_read(self, chunks):
+
+        chunks = iter(chunks)
+        while True:
+            read_time = time.perf_counter()
+            chunk = next(chunks, None)
+            self.stats["read_seconds"] += time.perf_counter() - read_time
+            if chunk is None:
+                return
+            yield chunk
+
+    ## Oldest chunk : wait for its predictions, then load it after the previous one (checkpoint only moves forward)
+    def _load_next(self, pending: deque):
+
+        features, is_fraud, position, scoring = pending.popleft()
+        preds = scoring.result() if scoring is not None else self.model.predict(features)
+        if self._last_load is not None:
+            self._last_load.result()
+        self._last_load = self._loader.submit(self._load_chunk, features, is_fraud, preds, position)
+
+    ## COPY of one scored chunk (replacing the transactions already loaded), then checkpoint
+    ## (a crash in between reloads at most this chunk, without duplicates)
+    def _load_chunk(self, features: pd.DataFrame, is_fraud: list, preds, position):
+
+        load_time = time.perf_counter()
+        pred_df = features.copy(deep=False)
+        pred_df["classification"] = preds
+        upsert_predictions({"columns": ["is_fraud"], "data": [[value] for value in is_fraud]}, pred_df)
+        self.stats["load_seconds"] += time.perf_counter() - load_time
+        self.stats["chunks"] += 1
+        self.stats["rows"] += len(pred_df)
+
+        if self.checkpoint_path:
+            write_checkpoint(self.checkpoint_path, {
+                "source": self.source, "position": position, "rows": self.stats["rows"],
+                "model_version": self.model_version, "updated": datetime.now().isoformat(timespec="seconds")})
+        logging.info(f"✅ Lot {self.stats['chunks']} : {len(pred_df)} transactions chargées "
+                     f"({self.stats['rows']} au total, position {position})")
+
+
+## Backfill of a CSV file (fraudTest.csv layout)
+def backfill_csv(path: str, model, chunk_size: int = BACKFILL_CHUNK_SIZE, workers: int = BACKFILL_WORKERS,
+                 checkpoint_path: str = BACKFILL_CHECKPOINT, restart: bool = False, max_rows: int = None,
+                 model_version=None) -> dict:
+
+    source = f"csv:{os.path.abspath(path)}"
+    checkpoint = None if restart else read_checkpoint(checkpoint_path, source, model_version)
+    start_row = checkpoint["position"] if checkpoint else 0
+    logging.info(f"🚀 Backfill de {path} à partir de la ligne {start_row} (lots de {chunk_size}, {workers} processus)")
+
+    chunks = read_csv_chunks(path, chunk_size, start_row)
+    return Backfill(model, source, chunk_size, workers, checkpoint_path, model_version).run(chunks, checkpoint, max_rows)
+
+## Backfill of the archived RAW objects (API's responses, compacted or not)
+def backfill_raw(model, prefix: str = RAW_PREFIX, bucket: str = S3_BUCKET, chunk_size: int = BACKFILL_CHUNK_SIZE,
+                 workers: int = BACKFILL_WORKERS, checkpoint_path: str = BACKFILL_CHECKPOINT, restart: bool = False,
+                 max_rows: int = None, read_workers: int = BACKFILL_READ_WORKERS, model_version=None) -> dict:
+
+    source = f"raw:s3://{bucket}/{prefix}"
+    checkpoint = None if restart else read_checkpoint(checkpoint_path, source, model_version)
+    keys = list_raw_keys(prefix, bucket, after=checkpoint["position"] if checkpoint else None)
+    logging.info(f"🚀 Backfill de {len(keys)} fichiers RAW de s3://{bucket}/{prefix} (lots de {chunk_size}, {workers} processus)")
+
+    chunks = read_raw_chunks(keys, chunk_size, bucket, read_workers)
+    return Backfill(model, source, chunk_size, workers, checkpoint_path, model_version).run(chunks, checkpoint, max_rows)
+
+
+if __name__ == "__main__":
+
+    # python backfill.py --csv ../fraudTest.csv / python backfill.py --raw
+    parser = argparse.ArgumentParser()
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--csv", help="CSV file in the fraudTest.csv layout")
+    source.add_argument("--raw", action="store_true", help="archived RAW objects of the S3 bucket")
+    parser.add_argument("--prefix", default=RAW_PREFIX)
+    parser.add_argument("--model-uri", default=MODEL_URI)
+    parser.add_argument("--chunk-size", type=int, default=BACKFILL_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=BACKFILL_WORKERS)
+    parser.add_argument("--checkpoint", default=BACKFILL_CHECKPOINT)
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint, start from the beginning")
+    parser.add_argument("--max-rows", type=int, default=None)
+    args = parser.parse_args()
+
+    model, version = load_backfill_model(args.model_uri)
+    if args.csv:
+        backfill_csv(args.csv, model, args.chunk_size, args.workers, args.checkpoint, args.restart, args.max_rows,
+                     model_version=version)
+    else:
+        backfill_raw(model, args.prefix, chunk_size=args.chunk_size, workers=args.workers,
+                     checkpoint_path=args.checkpoint, restart=args.restart, max_rows=args.max_rows,
+                     model_version=version)
@@ -0,0 +1,228 @@
+import io
+import re
+import gzip
+import json
+import argparse
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from storage import get_s3_client, S3_BUCKET
+from extract import RAW_PREFIX
+from transform import SILVER_PREFIX, GOLD_PREFIX
+from parquet_sink import to_arrow_table, partition_keys, SILVER_SCHEMA, GOLD_SCHEMA, PARQUET_COMPRESSION
+from dotenv import find_dotenv, load_dotenv
+import logging
+
+# Charger le .env
+env_path = find_dotenv()
+load_dotenv(env_path, override=True)
+
+# Log infos
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# === COMPACTION of the small objects written one per transaction ===
+
+## Layer -> (prefix, separator between date and time in object names, extension, typed schema)
+LAYERS = {
+    "raw": (RAW_PREFIX, "-", ".json", None),
+    "silver": (SILVER_PREFIX, "_", ".csv", SILVER_SCHEMA),
+    "gold": (GOLD_PREFIX, "_", ".csv", GOLD_SCHEMA)}
+
+## 20251209-215449_transaction.json / 20251209_215449[_1a2b3c4d]_transaction.csv
+OBJECT_TIME_PATTERN = re.compile(r"/(\d{8})[-_](\d{6})(?:_[0-9a-f]+)?_transaction\.(?:json|csv)$")
+
+## Manifests of the compacted hours : {prefix}/_compacted/YYYYMMDDTHH.json
+MANIFEST_DIR = "_compacted"
+
+DELETE_BATCH_SIZE = 1000
+
+
+## Write time of a per-transaction object, from its name (None for other objects)
+def object_time(key: str):
+
+    match = OBJECT_TIME_PATTERN.search(key)
+    if match is None:
+        return None
+    return datetime.strptime(match.group(1) + match.group(2), "%Y%m%d%H%M%S")
+
+## Hours of the window [start, end)
+def hours_between(start: datetime, end: datetime) -> list:
+
+    hour = start.replace(minute=0, second=0, microsecond=0)
+    hours = []
+    while hour < end:
+        hours.append(hour)
+        hour += timedelta(hours=1)
+    return hours
+
+## Keys of the per-transaction objects written during one hour
+def list_hour(layer: str, hour: datetime, bucket: str = S3_BUCKET) -> list:
+
+    prefix, separator, extension, _ = LAYERS[layer]
+    paginator = get_s3_client().get_paginator("list_objects_v2")
+    keys = []
+    for page in paginator.paginate(Bucket=bucket, Prefix=f"{prefix}/{hour:%Y%m%d}{separator}{hour:%H}"):
+        for obj in page.get("Contents", []):
+            if obj["Key"].endswith(extension) and object_time(obj["Key"]) is not None:
+                keys.append(obj["Key"])
+    return keys
+
+## Rows of one object (raw : API's response in JSON, silver / gold : CSV)
+def read_object(layer: str, key: str, bucket: str = S3_BUCKET) -> pd.DataFrame:
+
+    body = get_s3_client().get_object(Bucket=bucket, Key=key)["Body"].read()
+    if layer == "raw":
+        data_api = json.loads(body)
+        return pd.DataFrame(data_api["data"], columns=data_api["columns"])
+    return pd.read_csv(io.BytesIO(body))
+
+## Merged rows -> compressed file content
+def serialize(layer: str, data: pd.DataFrame, file_format: str) -> bytes:
+
+    if file_format == "ndjson":
+        return gzip.compress(data.to_json(orient="records", lines=True).encode("utf-8"))
+
+    schema = LAYERS[layer][3]
+    if schema is not None and set(schema.names) <= set(data.columns):
+        table = to_arrow_table(data, schema)
+    else:
+        table = pa.Table.from_pandas(data, preserve_index=False)
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, compression=PARQUET_COMPRESSION)
+    return buffer.getvalue()
+
+## Rows of a compacted file read back from S3
+def read_compacted(body: bytes, file_format: str) -> pd.DataFrame:
+
+    if file_format == "ndjson":
+        return pd.read_json(io.BytesIO(gzip.decompress(body)), orient="records", lines=True,
+                            convert_dates=False, dtype=False)
+    return pq.read_table(io.BytesIO(body)).to_pandas()
+
+## Partition of each row from the transaction time in UTC, as written by ParquetSink (raw : current_time in ms)
+def transaction_partitions(layer: str, data: pd.DataFrame) -> pd.Series:
+
+    if layer == "raw":
+        return partition_keys(pd.DataFrame({"unix_time": data["current_time"] / 1000}))
+    return partition_keys(data)
+
+## Marker written once an hour is compacted and verified : source keys, compacted keys, rows
+def manifest_key(layer: str, hour: datetime) -> str:
+
+    return f"{LAYERS[layer][0]}/{MANIFEST_DIR}/{hour:%Y%m%dT%H}.json"
+
+def read_manifest(layer: str, hour: datetime, bucket: str = S3_BUCKET):
+
+    try:
+        body = get_s3_client().get_object(Bucket=bucket, Key=manifest_key(layer, hour))["Body"].read()
+    except get_s3_client().exceptions.NoSuchKey:
+        return None
+    return json.loads(body)
+
+## Raises if S3 could not delete some of the objects
+def delete_objects(keys: list, bucket: str = S3_BUCKET):
+
+    client = get_s3_client()
+    for start in range(0, len(keys), DELETE_BATCH_SIZE):
+        batch = keys[start:start + DELETE_BATCH_SIZE]
+        resp = client.delete_objects(Bucket=bucket, Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True})
+        errors = resp.get("Errors", [])
+        if errors:
+            raise ValueError(f"{len(errors)} fichiers non supprimés, ex. {errors[0]['Key']} : "
+                             f"{errors[0].get('Code')} {errors[0].get('Message')}")
+
+
+# === Compaction of one hour : read in parallel, merge, write, verify, delete (optional) ===
+## Objects written during `hour` -> one file per transaction hour (UTC) : {prefix}/dt=.../hour=.../compacted-<hour>.<ext>
+## Same keys when run again (files replaced, never duplicated), manifest written last
+def compact_hour(layer: str, hour: datetime, keys: list, file_format: str = "parquet", delete: bool = False,
+                 executor: ThreadPoolExecutor = None, bucket: str = S3_BUCKET) -> dict:
+
+    frames = list(executor.map(lambda key: read_object(layer, key, bucket), keys))
+    data = pd.concat(frames, ignore_index=True)
+    source_rows = sum(len(frame) for frame in frames)
+    source_trans_nums = sorted(trans_num for frame in frames for trans_num in frame["trans_num"].astype(str))
+
+    prefix = LAYERS[layer][0]
+    extension = "parquet" if file_format == "parquet" else "ndjson.gz"
+    compacted_keys = []
+    for partition, rows in data.groupby(transaction_partitions(layer, data), sort=True):
+        compacted_key = f"{prefix}/{partition}/compacted-{hour:%Y%m%dT%H}.{extension}"
+        get_s3_client().put_object(Bucket=bucket, Key=compacted_key,
+                                   Body=serialize(layer, rows.reset_index(drop=True), file_format))
+        compacted_keys.append(compacted_key)
+
+    # Files read back from S3 checked against the source objects before any deletion
+    written = [read_compacted(get_s3_client().get_object(Bucket=bucket, Key=key)["Body"].read(), file_format)
+               for key in compacted_keys]
+    n_rows = sum(len(frame) for frame in written)
+    if n_rows != source_rows:
+        raise ValueError(f"{layer} {hour:%Y-%m-%d %Hh} : {n_rows} lignes écrites pour {source_rows} lignes "
+                         f"dans {len(keys)} fichiers")
+    if sorted(trans_num for frame in written for trans_num in frame["trans_num"].astype(str)) != source_trans_nums:
+        raise ValueError(f"{layer} {hour:%Y-%m-%d %Hh} : transactions écrites différentes des fichiers d'origine")
+
+    manifest = {"hour": hour.isoformat(), "sources": sorted(keys), "compacted": compacted_keys, "rows": n_rows}
+    get_s3_client().put_object(Bucket=bucket, Key=manifest_key(layer, hour), Body=json.dumps(manifest, indent=2))
+    if delete:
+        delete_objects(keys, bucket)
+    logging.info(f"✅ {layer} {hour:%Y-%m-%d %Hh} : {len(keys)} fichiers -> {len(compacted_keys)} fichiers "
+                 f"({n_rows} lignes)")
+    return {"hour": hour, "objects": len(keys), "rows": n_rows, "keys": compacted_keys}
+
+## Hour with a manifest : not compacted again (with --delete, its verified sources still there are deleted)
+def skip_compacted_hour(layer: str, hour: datetime, keys: list, manifest: dict, delete: bool = False,
+                        bucket: str = S3_BUCKET):
+
+    compacted_sources = [key for key in keys if key in set(manifest["sources"])]
+    if delete and compacted_sources:
+        delete_objects(compacted_sources, bucket)
+    logging.info(f"✅ {layer} {hour:%Y-%m-%d %Hh} déjà compactée ({manifest['rows']} lignes), ignorée"
+                 + (f", {len(compacted_sources)} fichiers d'origine supprimés" if delete and compacted_sources else ""))
+    new_keys = len(keys) - len(compacted_sources)
+    if new_keys:
+        logging.warning(f"⚠️ {layer} {hour:%Y-%m-%d %Hh} : {new_keys} fichiers écrits après la compaction non compactés")
+
+## Compaction of a time window [start, end), hour by hour (hours already compacted are skipped)
+def compact(layer: str, start: datetime, end: datetime, file_format: str = "parquet", delete: bool = False,
+            workers: int = 16, bucket: str = S3_BUCKET) -> list:
+
+    hours = hours_between(start, end)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+
+        # Listing and manifest of every hour in parallel
+        listings = list(executor.map(lambda hour: list_hour(layer, hour, bucket), hours))
+        manifests = list(executor.map(lambda hour: read_manifest(layer, hour, bucket), hours))
+
+        reports = []
+        for hour, keys, manifest in zip(hours, listings, manifests):
+            if manifest is not None:
+                skip_compacted_hour(layer, hour, keys, manifest, delete, bucket)
+            elif keys:
+                reports.append(compact_hour(layer, hour, keys, file_format, delete, executor, bucket))
+
+    logging.info(f"✅✅✅ Compaction {layer} : {sum(r['objects'] for r in reports)} fichiers -> "
+                 f"{sum(len(r['keys']) for r in reports)} fichiers, {sum(r['rows'] for r in reports)} lignes")
+    return reports
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Merge per-transaction objects into one file per hour")
+    parser.add_argument("--layer", choices=list(LAYERS), required=True)
+    parser.add_argument("--start", required=True, help="YYYY-MM-DD or YYYY-MM-DDTHH")
+    parser.add_argument("--end", required=True, help="YYYY-MM-DD or YYYY-MM-DDTHH (excluded)")
+    parser.add_argument("--format", choices=["parquet", "ndjson"], default="parquet")
+    parser.add_argument("--delete", action="store_true", help="Delete the original objects once verified")
+    parser.add_argument("--workers", default=16)
+    args = parser.parse_args()
+
+    compact(
+        layer=args.layer,
+        start=datetime.fromisoformat(args.start),
+        end=datetime.fromisoformat(args.end),
+        file_format=args.format,
+        delete=args.delete,
+        workers=int(args.workers))
@@ -0,0 +1,272 @@
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler, FunctionTransformer
+from features import haversine
+
+# === COMPILED MODEL : the fitted Pipeline (features -> one-hot / scaler -> random forest) as flat NumPy arrays ===
+#
+# Exactly the same results as the sklearn pipeline :
+# - numeric features scaled with the same float64 operations ((x - mean) / scale), then cast to float32 like the trees do
+# - one-hot columns replaced by a category -> column lookup
+# - tree probabilities summed in the same order, then divided by the number of trees
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+WEEKDAY_NAMES = np.array(WEEKDAYS, dtype=object)
+
+## Below this number of rows, trees are walked in pure Python (no NumPy call overhead)
+PYTHON_ROWS_MAX = 8
+
+
+class CompiledForest:
+
+    def __init__(self, categorical_columns, categories, numeric_columns, mean, scale,
+                 feature, threshold, children_left, children_right, leaf_proba, roots, max_depth, classes):
+
+        self.categorical_columns = list(categorical_columns)
+        # For each categorical column : {category: transformed column (None for the dropped category)}
+        self.categories = [dict(mapping) for mapping in categories]
+        self.numeric_columns = list(numeric_columns)
+        self.mean = np.asarray(mean, dtype="float64")
+        self.scale = np.asarray(scale, dtype="float64")
+        self.feature = np.asarray(feature, dtype="int64")
+        self.threshold = np.asarray(threshold, dtype="float64")
+        self.children_left = np.asarray(children_left, dtype="int64")
+        self.children_right = np.asarray(children_right, dtype="int64")
+        self.leaf_proba = np.asarray(leaf_proba, dtype="float64")
+        self.roots = np.asarray(roots, dtype="int64")
+        self.max_depth = int(max_depth)
+        self.classes_ = np.asarray(classes)
+        self.is_leaf = self.children_left == np.arange(len(self.children_left))
+        self.n_features = sum(len(mapping) - (None in mapping.values()) for mapping in self.categories) \
+            + len(self.numeric_columns)
+        self.n_categorical = self.n_features - len(self.numeric_columns)
+
+        # Category -> code (dict for a few rows, pandas hash table for batches) -> one-hot column (-1 : dropped)
+        self._category_codes = [{value: code for code, value in enumerate(mapping)} for mapping in self.categories]
+        self._category_index = [pd.Index(list(mapping), dtype=object) for mapping in self.categories]
+        self._category_lookup = [np.array([-1 if p is None else p for p in mapping.values()], dtype="int64")
+                                 for mapping in self.categories]
+
+        # Same arrays as Python lists, for the small batches walked without NumPy
+        self._nodes = list(zip(self.feature.tolist(), self.threshold.tolist(),
+                               self.children_left.tolist(), self.children_right.tolist()))
+        self._leaf_proba = self.leaf_proba.tolist()
+
+    # === Features ===
+
+    ## Engineered columns (same values as features.features_engineering) from a DataFrame of transactions
+    @staticmethod
+    def engineer_frame(data: pd.DataFrame) -> dict:
+
+        trans_date = pd.to_datetime(data['trans_date_trans_time'])
+        codes, cc_nums = pd.factorize(data['cc_num'], use_na_sentinel=False)
+        return {
+            'category': data['category'].to_numpy(dtype=object),
+            'weekday': WEEKDAY_NAMES[trans_date.dt.dayofweek.to_numpy()],
+            'amt': data['amt'].to_numpy(dtype="float64"),
+            'city_pop': data['city_pop'].to_numpy(dtype="float64"),
+            'hour': trans_date.dt.hour.to_numpy(dtype="float64"),
+            'lenght_cc_num': cc_nums.astype(str).str.len().to_numpy(dtype="float64")[codes],
+            'age': (pd.to_datetime('today').date().year - pd.to_datetime(data['dob']).dt.year).to_numpy(dtype="float64"),
+            'distance_km': haversine(data['long'].to_numpy(dtype="float64"), data['merch_long'].to_numpy(dtype="float64"),
+                                     data['lat'].to_numpy(dtype="float64"), data['merch_lat'].to_numpy(dtype="float64"))}
+
+    ## Engineered columns from transaction dicts (test.json records), without pandas
+    @staticmethod
+    def engineer_records(records: list) -> dict:
+
+        this_year = date.today().year
+        trans_dates = [datetime.fromisoformat(str(r['trans_date_trans_time'])) for r in records]
+        column = lambda name: np.array([r[name] for r in records], dtype="float64")
+        return {
+            'category': [r['category'] for r in records],
+            'weekday': [WEEKDAYS[d.weekday()] for d in trans_dates],
+            'amt': column('amt'),
+            'city_pop': column('city_pop'),
+            'hour': np.array([d.hour for d in trans_dates], dtype="float64"),
+            'lenght_cc_num': np.array([len(str(float(r['cc_num']))) for r in records], dtype="float64"),
+            'age': np.array([this_year - datetime.fromisoformat(str(r['dob'])[:10]).year for r in records],
+                            dtype="float64"),
+            'distance_km': haversine(column('long'), column('merch_long'), column('lat'), column('merch_lat'))}
+
+    ## Model input (float32, as seen by the trees) from engineered columns
+    def transform(self, columns: dict) -> np.ndarray:
+
+        n_rows = len(columns[self.numeric_columns[0]])
+        X = np.zeros((n_rows, self.n_features), dtype="float32")
+
+        # One-hot : one column set to 1 per categorical feature (none for the dropped category)
+        for name, codes_of, index, lookup in zip(self.categorical_columns, self._category_codes,
+                                                 self._category_index, self._category_lookup):
+            values = columns[name]
+            if n_rows <= PYTHON_ROWS_MAX:
+                codes = np.array([codes_of.get(value, -1) for value in values])
+            else:
+                codes = index.get_indexer(values)
+            if (codes < 0).any():
+                raise ValueError(f"Catégorie inconnue pour '{name}' : {np.asarray(values, dtype=object)[codes < 0][0]!r}")
+            positions = lookup[codes]
+            hot = positions >= 0
+            X[np.flatnonzero(hot), positions[hot]] = 1.0
+
+        # Standard scaler, float64 then float32
+        numeric = np.column_stack([np.asarray(columns[name], dtype="float64") for name in self.numeric_columns])
+        X[:, self.n_categorical:] = (numeric - self.mean) / self.scale
+        return X
+
+    # === Trees ===
+
+    ## Sum of the leaf probabilities of every tree, rows walked together level by level (rows in a leaf stop)
+    def _forest_proba(self, X: np.ndarray) -> np.ndarray:
+
+        n_rows, n_features = X.shape
+        values = X.ravel()
+        proba = np.zeros((n_rows, len(self.classes_)), dtype="float64")
+        for root in self.roots:
+            nodes = np.full(n_rows, root)
+            active = np.arange(n_rows)
+            current = nodes
+            while active.size:
+                go_left = values[active * n_features + self.feature[current]] <= self.threshold[current]
+                current = np.where(go_left, self.children_left[current], self.children_right[current])
+                nodes[active] = current
+                moving = ~self.is_leaf[current]
+                active, current = active[moving], current[moving]
+            proba += self.leaf_proba[nodes]
+        return proba
+
+    def _forest_proba_python(self, X: np.ndarray) -> np.ndarray:
+
+        nodes, leaf_proba, roots = self._nodes, self._leaf_proba, self.roots.tolist()
+        proba = np.zeros((X.shape[0], len(self.classes_)), dtype="float64")
+        for row, x in enumerate(X.tolist()):
+            for root in roots:
+                node = root
+                feature, threshold, left, right = nodes[node]
+                while left != right:
+                    node = left if x[feature] <= threshold else right
+                    feature, threshold, left, right = nodes[node]
+                proba[row] += leaf_proba[node]
+        return proba
+
+    def predict_proba_array(self, X: np.ndarray) -> np.ndarray:
+
+        proba = self._forest_proba_python(X) if X.shape[0] <= PYTHON_ROWS_MAX else self._forest_proba(X)
+        proba /= len(self.roots)
+        return proba
+
+    # === Same interface as the Pipeline ===
+
+    ## Transactions : DataFrame (silver columns) or list of dicts (test.json records)
+    def predict_proba(self, data) -> np.ndarray:
+
+        columns = self.engineer_frame(data) if isinstance(data, pd.DataFrame) else self.engineer_records(data)
+        return self.predict_proba_array(self.transform(columns))
+
+    def predict(self, data) -> np.ndarray:
+
+        return self.classes_.take(np.argmax(self.predict_proba(data), axis=1), axis=0)
+
+    # === Storage ===
+
+    def save(self, path: str):
+
+        np.savez_compressed(
+            path, feature=self.feature, threshold=self.threshold, children_left=self.children_left,
+            children_right=self.children_right, leaf_proba=self.leaf_proba, roots=self.roots,
+            max_depth=self.max_depth, classes=self.classes_, mean=self.mean, scale=self.scale,
+            numeric_columns=np.array(self.numeric_columns), categorical_columns=np.array(self.categorical_columns),
+            categories=np.array([[name, str(value), -1 if position is None else position]
+                                 for name, mapping in zip(self.categorical_columns, self.categories)
+                                 for value, position in mapping.items()]))
+
+    @classmethod
+    def load(cls, path: str) -> "CompiledForest":
+
+        arrays = np.load(path, allow_pickle=False)
+        categorical_columns = arrays['categorical_columns'].tolist()
+        categories = [{} for _ in categorical_columns]
+        for name, value, position in arrays['categories'].tolist():
+            categories[categorical_columns.index(name)][value] = None if int(position) < 0 else int(position)
+        return cls(categorical_columns, categories, arrays['numeric_columns'].tolist(), arrays['mean'], arrays['scale'],
+                   arrays['feature'], arrays['threshold'], arrays['children_left'], arrays['children_right'],
+                   arrays['leaf_proba'], arrays['roots'], int(arrays['max_depth']), arrays['classes'])
+
+
+# === COMPILER ===
+
+## Fitted Pipeline of train/train.py -> CompiledForest (ValueError for any other layout)
+def compile_pipeline(pipeline: Pipeline) -> CompiledForest:
+
+    steps = [step for _, step in pipeline.steps]
+    if len(steps) != 3 or not isinstance(steps[0], FunctionTransformer) \
+            or not isinstance(steps[1], ColumnTransformer) or not isinstance(steps[2], RandomForestClassifier):
+        raise ValueError("Pipeline attendu : FunctionTransformer -> ColumnTransformer -> RandomForestClassifier")
+    if steps[0].func.__name__ != "features_engineering":
+        raise ValueError("La première étape doit être features.features_engineering")
+    column_transformer, forest = steps[1], steps[2]
+
+    encoder = scaler = None
+    for name, transformer, columns in column_transformer.transformers_:
+        if isinstance(transformer, OneHotEncoder):
+            encoder, categorical_columns, categorical_slice = transformer, list(columns), column_transformer.output_indices_[name]
+        elif isinstance(transformer, StandardScaler):
+            scaler, numeric_columns, numeric_slice = transformer, list(columns), column_transformer.output_indices_[name]
+        elif transformer != "drop" and len(columns):
+            raise ValueError(f"Transformation non prise en charge : {name}")
+    if encoder is None or scaler is None or categorical_slice.start != 0 or numeric_slice.start != categorical_slice.stop:
+        raise ValueError("ColumnTransformer attendu : OneHotEncoder puis StandardScaler")
+    if getattr(encoder, "infrequent_categories_", None) is not None:
+        raise ValueError("OneHotEncoder avec catégories rares non pris en charge")
+
+    # Category -> position of its one-hot column (None for the dropped category)
+    categories, position = [], 0
+    drop_idx = encoder.drop_idx_ if encoder.drop_idx_ is not None else [None] * len(encoder.categories_)
+    for values, dropped in zip(encoder.categories_, drop_idx):
+        mapping = {}
+        for k, value in enumerate(values.tolist()):
+            if dropped is not None and k == dropped:
+                mapping[value] = None
+            else:
+                mapping[value] = position
+                position += 1
+        categories.append(mapping)
+
+    n_features = numeric_slice.stop
+    mean = scaler.mean_ if scaler.with_mean else np.zeros(len(numeric_columns))
+    scale = scaler.scale_ if scaler.with_std else np.ones(len(numeric_columns))
+
+    # Every tree in the same arrays, leaves pointing to themselves (walking further doesn't move)
+    feature, threshold, left, right, leaf_proba, roots = [], [], [], [], [], []
+    offset, max_depth = 0, 0
+    n_classes = len(forest.classes_)
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        if tree.n_features != n_features:
+            raise ValueError("Nombre de colonnes différent entre les arbres et les transformations")
+        nodes = np.arange(tree.node_count)
+        is_leaf = tree.children_left == -1
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(np.where(is_leaf, np.inf, tree.threshold))
+        left.append(np.where(is_leaf, nodes, tree.children_left) + offset)
+        right.append(np.where(is_leaf, nodes, tree.children_right) + offset)
+
+        # DecisionTreeClassifier.predict_proba : leaf values normalized by their sum
+        proba = tree.value[:, 0, :n_classes].copy()
+        normalizer = proba.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        proba /= normalizer
+        leaf_proba.append(proba)
+
+        roots.append(offset)
+        offset += tree.node_count
+        max_depth = max(max_depth, tree.max_depth)
+
+    return CompiledForest(
+        categorical_columns, categories, numeric_columns, mean, scale,
+        np.concatenate(feature), np.concatenate(threshold), np.concatenate(left), np.concatenate(right),
+        np.concatenate(leaf_proba), roots, max_depth, forest.classes_)
@@ -1,9 +1,14 @@
 import os
 import json
+import time
+import random
+import threading
 from datetime import datetime
 import logging
 import requests
-import boto3
+from requests.adapters import HTTPAdapter
+from storage import get_s3_client, get_uploader, S3_BUCKET
+from metrics import timed
 from dotenv import find_dotenv, load_dotenv
 
 # Charger le .env
@@ -15,40 +20,82 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(
 
 # === API Transactions ===
 API_URL = os.getenv("API_URL")
+## Seconds to open the connection / to wait for the response (a slow API no longer stalls the worker 60s)
+API_CONNECT_TIMEOUT = float(os.getenv("API_CONNECT_TIMEOUT", "3.05"))
+API_READ_TIMEOUT = float(os.getenv("API_READ_TIMEOUT", "10"))
+## Retries on transient errors (connection, timeout, 429 / 5xx), exponential backoff + jitter
+API_RETRIES = int(os.getenv("API_RETRIES", "3"))
+API_BACKOFF = float(os.getenv("API_BACKOFF", "0.5"))
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", "10"))
+API_RETRY_STATUS = {429, 500, 502, 503, 504}
+
+## Fast JSON decoder if installed
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
 
 # === S3 ===
-AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
-AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
-AWS_REGION = os.getenv("AWS_DEFAULT_REGION")
-S3_BUCKET = os.getenv("BUCKET_NAME")
 RAW_PREFIX = "bloc4/data/raw"
 
-boto3.setup_default_session(
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-    region_name=AWS_REGION)
-
-s3 = boto3.client(
-    "s3",
-    region_name=AWS_REGION,
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY)
+# === Micro-batch ===
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "50"))
+BATCH_MAX_WAIT_MS = int(os.getenv("BATCH_MAX_WAIT_MS", "5000"))
 
 # === EXTRACT function ===
 
+_http_session = None
+_http_session_lock = threading.Lock()
+
+## One keep-alive HTTP session for the whole process (connections reused between calls)
+def get_http_session() -> requests.Session:
+
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=API_POOL_SIZE)
+            _http_session = requests.Session()
+            _http_session.mount("http://", adapter)
+            _http_session.mount("https://", adapter)
+    return _http_session
+
+## API's response is a JSON string holding the JSON of the transaction : decoded from the raw bytes,
+## without requests' charset detection, the inner document only if the first pass returned a string
+def decode_api_payload(body: bytes) -> dict:
+
+    data_api = json_loads(body)
+    if isinstance(data_api, str):
+        data_api = json_loads(data_api)
+    return data_api
+
 ## Connect API to get real_time (simulated) transactions
-def get_api() -> dict:
+@timed("get_api", rows=lambda data_api: len(data_api['data']))
+def get_api(url: str = None) -> dict:
 
-    url = API_URL
+    url = url or API_URL
     logging.info("🚀 Appel API lancé...")
-    response = requests.get(url, timeout=60)
-    response.raise_for_status()
-    data_api = json.loads(response.text)
-    data_api = json.loads(data_api)
-    logging.info("✅ Transaction récupérée")
-    return data_api
+    session = get_http_session()
+    for attempt in range(API_RETRIES + 1):
+        try:
+            response = session.get(url, timeout=(API_CONNECT_TIMEOUT, API_READ_TIMEOUT))
+            if response.status_code not in API_RETRY_STATUS:
+                response.raise_for_status()
+                data_api = decode_api_payload(response.content)
+                logging.info("✅ Transaction récupérée")
+                return data_api
+            error = requests.HTTPError(f"{response.status_code} {response.reason}", response=response)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+        if attempt == API_RETRIES:
+            logging.error(f"❌ API transactions injoignable après {attempt + 1} tentatives : {error}")
+            raise error
+        delay = API_BACKOFF * 2**attempt * random.uniform(0.5, 1.5)
+        logging.warning(f"⚠️ Erreur API ({error}), nouvel essai dans {delay:.2f}s")
+        time.sleep(delay)
 
 ## Save raw data to S3 bucket in json
+@timed("save_data_api_to_s3")
 def save_data_api_to_s3(data_api: dict, timestamp: str) -> str:
 
     logging.info("🚀 Sauvegarde transaction RAW dans s3...")   
@@ -58,7 +105,7 @@ def save_data_api_to_s3(data_api: dict, timestamp: str) -> str:
     raw_file = f"{RAW_PREFIX}/{timestamp}_transaction.json"
            
     # Upload to s3
-    s3.put_object(
+    get_s3_client().put_object(
           Bucket=S3_BUCKET,
           Key=raw_file,
           Body=json_data,
@@ -66,10 +113,56 @@ def save_data_api_to_s3(data_api: dict, timestamp: str) -> str:
           ContentEncoding='utf-8')
     logging.info(f"✅ Transaction RAW enregistrée dans s3://{S3_BUCKET}/{raw_file}")
 
-## Pipeline EXTRACT : get_transaction + save_data_api_to_s3
+## Pipeline EXTRACT : get_transaction + save_data_api_to_s3 (in background)
+@timed("extract", rows=lambda extracted: len(extracted[0]['data']))
 def extract() -> tuple[dict, str]:
 
     transaction = get_api()
     timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-    save_data_api_to_s3(transaction, timestamp)
+    # RAW upload in background : scoring doesn't wait for S3
+    get_uploader().submit(save_data_api_to_s3, transaction, timestamp)
     return transaction, timestamp
+
+## Merge several API responses into one (same 'columns' / 'index' / 'data' layout)
+def merge_transactions(transactions: list[dict]) -> dict:
+
+    columns = transactions[0]['columns']
+    merged = {'columns': columns, 'index': [], 'data': []}
+    for transaction in transactions:
+        merged['index'].extend(transaction.get('index', []))
+        if transaction['columns'] == columns:
+            merged['data'].extend(transaction['data'])
+        else:
+            # Same fields in another order : realign on the first response
+            positions = [transaction['columns'].index(col) for col in columns]
+            merged['data'].extend([row[pos] for pos in positions] for row in transaction['data'])
+    return merged
+
+## Call the API until max_size transactions are collected or max_wait_ms is elapsed
+## An API error ends the batch early : the transactions already collected are kept (raised only if there are none)
+def get_api_batch(max_size: int = BATCH_MAX_SIZE, max_wait_ms: int = BATCH_MAX_WAIT_MS) -> dict:
+
+    deadline = time.monotonic() + max_wait_ms / 1000
+    transactions = []
+    n_rows = 0
+    while n_rows < max_size:
+        try:
+            transaction = get_api()
+        except (requests.RequestException, ValueError) as e:
+            if not transactions:
+                raise
+            logging.warning(f"⚠️ Erreur API ({e}) : lot envoyé avec les {n_rows} transactions déjà récupérées")
+            break
+        transactions.append(transaction)
+        n_rows += len(transaction['data'])
+        if time.monotonic() >= deadline:
+            break
+    return merge_transactions(transactions)
+
+## Pipeline EXTRACT by batch : get_api_batch + one save_data_api_to_s3 (in background)
+def extract_batch(max_size: int = BATCH_MAX_SIZE, max_wait_ms: int = BATCH_MAX_WAIT_MS) -> tuple[dict, str]:
+
+    transactions = get_api_batch(max_size, max_wait_ms)
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    get_uploader().submit(save_data_api_to_s3, transactions, timestamp)
+    return transactions, timestamp
@@ -0,0 +1,61 @@
+import math
+import numpy as np
+import pandas as pd
+
+# === FEATURES ENGINEERING (shared by train/train.py and the model in production) ===
+
+## Columns anonymized (compliance) or useless (too many categories)
+USELESS_COLUMNS = ['trans_date_trans_time', 'cc_num', 'merchant', 'first', 'last', 'gender', 'street',
+                   'city', 'zip', 'state', 'lat', 'long', 'job', 'dob', 'trans_num', 'unix_time',
+                   'merch_lat', 'merch_long']
+
+## Square with the C library's pow, as `x**2` on the numpy scalars of the former row-by-row formula
+## (a vectorized `x**2` is x*x, up to 1 ulp away : distances would no longer be bit-identical)
+_pow = np.frompyfunc(math.pow, 2, 1)
+
+def square(values):
+
+    return np.asarray(_pow(values, 2.0), dtype="float64")
+
+## Distance (kms) between two points, on whole numpy arrays at once (same bits as the row-by-row formula)
+def haversine(long, merch_long, lat, merch_lat):
+
+    # Convert degrees to radians
+    long, merch_long, lat, merch_lat = map(np.radians, [long, merch_long, lat, merch_lat])
+    diff_lon = merch_long - long
+    diff_lat = merch_lat - lat
+    # earth radius: 6371 kms
+    distance_km = 2*6371*np.arcsin(np.sqrt(square(np.sin(diff_lat/2.0)) + np.cos(lat) * np.cos(merch_lat) \
+                                        * square(np.sin(diff_lon/2.0))))
+    return distance_km
+
+## Features engineering (step "Features_engineering" of the model pipeline)
+def features_engineering(data: pd.DataFrame) -> pd.DataFrame:
+
+    # Create new features
+    data = data.copy()
+
+    # Extract date information (dates parsed only once)
+    trans_date = pd.to_datetime(data['trans_date_trans_time'])
+    data['weekday'] = trans_date.dt.day_name()
+    data['hour'] = trans_date.dt.hour
+
+    # Enrichment with lenght of credit card number
+    # (a card appears in many transactions : each distinct number is converted to str only once)
+    codes, cc_nums = pd.factorize(data['cc_num'], use_na_sentinel=False)
+    data['lenght_cc_num'] = cc_nums.astype(str).str.len().to_numpy()[codes]
+
+    # Convert date of birthday in age (from today)
+    data['age'] = pd.to_datetime('today').date().year - pd.to_datetime(data['dob']).dt.year
+
+    # Enrichment with distance (kms) between customer and merchant, vectorized on all rows
+    data['distance_km'] = haversine(data['long'].to_numpy(dtype="float64"),
+                                    data['merch_long'].to_numpy(dtype="float64"),
+                                    data['lat'].to_numpy(dtype="float64"),
+                                    data['merch_lat'].to_numpy(dtype="float64"))
+
+    # Anonymize (because of compliance) and drop useless data (or too many categories)
+    data = data.drop(USELESS_COLUMNS, axis=1)
+    data = data.astype({col: "float64" for col in data.select_dtypes(include=["int"]).columns})
+
+    return data
@@ -0,0 +1,196 @@
+import os
+import time
+import queue
+import threading
+from collections import OrderedDict
+from extract import get_api, merge_transactions, API_URL, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS
+from dotenv import find_dotenv, load_dotenv
+import logging
+
+# Charger le .env
+env_path = find_dotenv()
+load_dotenv(env_path, override=True)
+
+# Log infos
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# === Concurrent intake ===
+## API requests in flight at the same time
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "4"))
+## Max API requests per second, all threads together (0 = no limit)
+FETCH_RATE_LIMIT = float(os.getenv("FETCH_RATE_LIMIT", "10"))
+## Responses waiting for the downstream stages (the fetch threads block above : backpressure)
+FETCH_QUEUE_SIZE = int(os.getenv("FETCH_QUEUE_SIZE", "1000"))
+## trans_num remembered to drop transactions already received
+FETCH_DEDUPE_SIZE = int(os.getenv("FETCH_DEDUPE_SIZE", "100000"))
+## Pause of a fetch thread after an API error (get_api already retried)
+FETCH_ERROR_SLEEP = float(os.getenv("FETCH_ERROR_SLEEP", "5"))
+
+
+## Requests evenly spaced at `rate` per second, shared by all fetch threads
+class RateLimiter:
+
+    def __init__(self, rate: float):
+
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_time = time.monotonic()
+        self._lock = threading.Lock()
+
+    ## Block until the next request slot
+    def acquire(self):
+
+        if self.interval == 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_time - now
+            self._next_time = max(self._next_time, now) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+## Last `max_size` transaction numbers received (oldest forgotten first)
+class SeenTransactions:
+
+    def __init__(self, max_size: int = FETCH_DEDUPE_SIZE):
+
+        self.max_size = max_size
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+
+    ## True if trans_num is new (and remember it)
+    def add(self, trans_num) -> bool:
+
+        with self._lock:
+            if trans_num in self._seen:
+                self._seen.move_to_end(trans_num)
+                return False
+            self._seen[trans_num] = None
+            if len(self._seen) > self.max_size:
+                self._seen.popitem(last=False)
+            return True
+
+    ## Forget trans_nums that were never delivered (received again, they are new)
+    def discard(self, trans_nums):
+
+        with self._lock:
+            for trans_num in trans_nums:
+                self._seen.pop(trans_num, None)
+
+
+# === Fetcher : FETCH_CONCURRENCY threads calling the API, new transactions put in a bounded queue ===
+class TransactionFetcher:
+
+    def __init__(self, url: str = API_URL, concurrency: int = FETCH_CONCURRENCY,
+                 rate_limit: float = FETCH_RATE_LIMIT, queue_size: int = FETCH_QUEUE_SIZE,
+                 dedupe_size: int = FETCH_DEDUPE_SIZE, error_sleep: float = FETCH_ERROR_SLEEP):
+
+        self.url = url
+        self.concurrency = concurrency
+        self.error_sleep = error_sleep
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._rate_limiter = RateLimiter(rate_limit)
+        self._seen = SeenTransactions(dedupe_size)
+        self._stop_event = threading.Event()
+        self._threads = []
+        self._stats_lock = threading.Lock()
+        self.fetched = 0
+        self.duplicates = 0
+        self.errors = 0
+
+    def start(self):
+
+        if not self._threads:
+            self._stop_event.clear()
+            for i in range(self.concurrency):
+                thread = threading.Thread(target=self._fetch_loop, name=f"fetcher-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            logging.info(f"✅ Collecte lancée : {self.concurrency} appels API en parallèle")
+        return self
+
+    def stop(self):
+
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    ## Keep only the transactions never received before (None if nothing is new)
+    def _dedupe(self, data_api: dict):
+
+        if 'trans_num' not in data_api['columns']:
+            return data_api
+        position = data_api['columns'].index('trans_num')
+        index = data_api.get('index') or [None] * len(data_api['data'])
+        new_rows = [(i, row) for i, row in zip(index, data_api['data']) if self._seen.add(row[position])]
+
+        with self._stats_lock:
+            self.duplicates += len(data_api['data']) - len(new_rows)
+        if not new_rows:
+            return None
+        if len(new_rows) == len(data_api['data']):
+            return data_api
+        return {
+            'columns': data_api['columns'],
+            'index': [i for i, _ in new_rows] if data_api.get('index') else [],
+            'data': [row for _, row in new_rows]}
+
+    ## Put in the queue, waiting while it is full (unless the fetcher is stopped) : True if queued
+    def _put(self, data_api: dict) -> bool:
+
+        while not self._stop_event.is_set():
+            try:
+                self.queue.put(data_api, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _fetch_loop(self):
+
+        while not self._stop_event.is_set():
+            self._rate_limiter.acquire()
+            try:
+                data_api = get_api(self.url)
+            except Exception as e:
+                with self._stats_lock:
+                    self.errors += 1
+                logging.error(f"❌ Erreur API : pause de {self.error_sleep:g} secondes avant prochain appel ({e})")
+                self._stop_event.wait(self.error_sleep)
+                continue
+
+            # Marked as seen by _dedupe (no other worker queues them), forgotten if the fetcher stops before they are queued
+            data_api = self._dedupe(data_api)
+            if data_api is None:
+                continue
+            if self._put(data_api):
+                with self._stats_lock:
+                    self.fetched += len(data_api['data'])
+            elif 'trans_num' in data_api['columns']:
+                position = data_api['columns'].index('trans_num')
+                self._seen.discard(row[position] for row in data_api['data'])
+
+    ## Next batch of new transactions : up to max_size rows or max_wait_ms, None if nothing arrived
+    def get_batch(self, max_size: int = BATCH_MAX_SIZE, max_wait_ms: int = BATCH_MAX_WAIT_MS):
+
+        deadline = time.monotonic() + max_wait_ms / 1000
+        transactions = []
+        n_rows = 0
+        while n_rows < max_size:
+            remaining = deadline - time.monotonic()
+            try:
+                # Rows already waiting are taken at once, then wait for the deadline
+                data_api = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            transactions.append(data_api)
+            n_rows += len(data_api['data'])
+        if not transactions:
+            return None
+        return merge_transactions(transactions)
+
+    @property
+    def queue_depth(self) -> int:
+
+        return self.queue.qsize()
@@ -1,8 +1,14 @@
 import os
+import io
+import time
+import threading
 import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
 from psycopg2.extras import execute_values
-from sqlalchemy import create_engine, text
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from metrics import timed
 from dotenv import find_dotenv, load_dotenv
 import logging
 
@@ -18,15 +24,162 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(
 ## === NEON PostgreSQL ===
 DATABASE_URL = os.getenv("BACKEND_STORE_URI")
 
+## Connection pool
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "5"))
+## A connection idle for more than this (seconds) is checked with 'SELECT 1' before use
+DB_HEALTH_CHECK_INTERVAL = float(os.getenv("DB_HEALTH_CHECK_INTERVAL", "30"))
+## Retries on a new connection when the connection is lost
+DB_RETRIES = int(os.getenv("DB_RETRIES", "1"))
+## Rows per INSERT statement in execute_values
+INSERT_PAGE_SIZE = int(os.getenv("INSERT_PAGE_SIZE", "1000"))
+## Bulk load : COPY from this number of rows, one commit every COPY_CHUNK_SIZE rows
+COPY_MIN_ROWS = int(os.getenv("COPY_MIN_ROWS", "500"))
+COPY_CHUNK_SIZE = int(os.getenv("COPY_CHUNK_SIZE", "50000"))
+
+CONNECTION_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
 ## Connexion NEON PostgreSQL
 def pg_connect():
 
     return psycopg2.connect(DATABASE_URL)
 
-## Create table if it doesn't exist
+## Pooled connection, remembers when it was last given back to the pool
+class PooledConnection(psycopg2.extensions.connection):
+
+    released_at = 0.0
+
+# === Long-lived connection pool (shared by the whole process) ===
+class PgPool:
+
+    def __init__(self, dsn: str = DATABASE_URL, min_size: int = DB_POOL_MIN_SIZE, max_size: int = DB_POOL_MAX_SIZE,
+                 health_check_interval: float = DB_HEALTH_CHECK_INTERVAL, retries: int = DB_RETRIES):
+
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.health_check_interval = health_check_interval
+        self.retries = retries
+        self._pool = None
+        self._lock = threading.Lock()
+
+    ## Pool opened on first use
+    def _get_pool(self) -> ThreadedConnectionPool:
+
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadedConnectionPool(self.min_size, self.max_size, self.dsn,
+                                                    connection_factory=PooledConnection)
+            return self._pool
+
+    def _is_alive(self, conn) -> bool:
+
+        if conn.closed:
+            return False
+        idle_time = time.monotonic() - conn.released_at
+        if idle_time < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except CONNECTION_ERRORS:
+            return False
+
+    ## Healthy connection from the pool : dead connections are discarded until a live one is found
+    ## or the pool opens a new one (every idle connection may have been dropped by the server)
+    def getconn(self):
+
+        pool = self._get_pool()
+        # At most max_size idle connections to discard, then one new connection
+        for _ in range(self.max_size + 1):
+            conn = pool.getconn()
+            if self._is_alive(conn):
+                return conn
+            logging.warning("⚠️ Connexion à la base de données perdue : reconnexion...")
+            self.discard(conn)
+        raise psycopg2.OperationalError("Aucune connexion valide à la base de données")
+
+    def putconn(self, conn):
+
+        conn.released_at = time.monotonic()
+        self._get_pool().putconn(conn)
+
+    def discard(self, conn):
+
+        self._get_pool().putconn(conn, close=True)
+
+    ## Run func(cursor) in one transaction, on a new connection if the connection is lost
+    ## autocommit=True : no COMMIT round-trip (only for a single statement), never retried once func started :
+    ## the server may have committed the statement before the connection dropped
+    def run(self, func, autocommit: bool = False):
+
+        for attempt in range(self.retries + 1):
+            conn = self.getconn()
+            try:
+                conn.autocommit = autocommit
+            except CONNECTION_ERRORS as e:
+                self.discard(conn)
+                if attempt == self.retries:
+                    raise
+                logging.warning(f"⚠️ Connexion à la base de données perdue ({e}) : nouvelle tentative...")
+                continue
+            try:
+                with conn.cursor() as cur:
+                    result = func(cur)
+            except CONNECTION_ERRORS as e:
+                self.discard(conn)
+                # Transaction : rolled back by the server with the connection, safe to replay
+                if autocommit or attempt == self.retries:
+                    raise
+                logging.warning(f"⚠️ Connexion à la base de données perdue ({e}) : nouvelle tentative...")
+                continue
+            except Exception:
+                conn.rollback()
+                self.putconn(conn)
+                raise
+
+            # No retry once COMMIT was sent : the transaction may already be written
+            try:
+                if not autocommit:
+                    conn.commit()
+            except CONNECTION_ERRORS:
+                self.discard(conn)
+                raise
+            self.putconn(conn)
+            return result
+
+    def close(self):
+
+        with self._lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+
+
+_pg_pool = None
+_pg_pool_lock = threading.Lock()
+
+## Process-wide connection pool
+def get_pg_pool() -> PgPool:
+
+    global _pg_pool
+    with _pg_pool_lock:
+        if _pg_pool is None:
+            _pg_pool = PgPool()
+    return _pg_pool
+
+_table_ready = False
+_table_lock = threading.Lock()
+
+## Create table if it doesn't exist (DDL run only once per process)
+@timed("ensure_predictions_table_exists")
 def ensure_predictions_table_exists():
-    
-    engine = create_engine(DATABASE_URL)
+
+    global _table_ready
+    if _table_ready:
+        return
 
     ddl_fraud_pred = """
     CREATE TABLE IF NOT EXISTS public.transactions (
@@ -54,51 +207,85 @@ def ensure_predictions_table_exists():
         trans_date_trans_time VARCHAR,
         classification NUMERIC
     );
+    CREATE INDEX IF NOT EXISTS transactions_trans_num_idx ON public.transactions (trans_num);
     """
 
-    with engine.begin() as conn:
-        conn.execute(text(ddl_fraud_pred))
+    with _table_lock:
+        if not _table_ready:
+            get_pg_pool().run(lambda cur: cur.execute(ddl_fraud_pred))
+            _table_ready = True
+
+## Columns of public.transactions (insert order) and their python type
+DB_COLUMNS = [
+    ("cc_num", float),
+    ("merchant", str),
+    ("category", str),
+    ("amt", float),
+    ("first", str),
+    ("last", str),
+    ("gender", str),
+    ("street", str),
+    ("city", str),
+    ("state", str),
+    ("zip", float),
+    ("lat", float),
+    ("long", float),
+    ("city_pop", float),
+    ("job", str),
+    ("dob", str),
+    ("trans_num", str),
+    ("merch_lat", float),
+    ("merch_long", float),
+    ("is_fraud", float),
+    ("unix_time", float),
+    ("trans_date_trans_time", str),
+    ("classification", float)]
+
+## 'is_fraud' of every transaction of the API's response (same order as pred_df rows)
+def get_is_fraud(data_api: dict) -> list:
+
+    index_is_fraud = data_api['columns'].index('is_fraud')
+    return [row[index_is_fraud] for row in data_api['data']]
 
 ## Build list of tuples ready to be inserted into database
+## Each column is extracted and converted at once, then columns are zipped into rows
 def build_db_rows(data_api: dict, pred_df: pd.DataFrame):
 
-    ## Find index of 'is_fraud' column and get value
-    index_is_fraud = data_api['columns'].index('is_fraud')
-    is_fraud = data_api['data'][0][index_is_fraud]
- 
-    rows = []
-    for _, row in pred_df.iterrows():
-        rows.append(
-            (
-                float(row["cc_num"]),
-                str(row["merchant"]),
-                str(row["category"]),
-                float(row["amt"]),
-                str(row["first"]),
-                str(row["last"]),
-                str(row["gender"]),
-                str(row["street"]), 
-                str(row["city"]),  
-                str(row["state"]),                                             
-                float(row["zip"]),
-                float(row["lat"]),
-                float(row["long"]),
-                float(row["city_pop"]),
-                str(row["job"]),
-                str(row["dob"]),
-                str(row["trans_num"]),
-                float(row["merch_lat"]),
-                float(row["merch_long"]),
-                float(is_fraud),                       
-                float(row["unix_time"]),
-                str(row["trans_date_trans_time"]),                              
-                float(row["classification"])
-            )
-        )
-    return rows
-
-## Insert predictions into database 'transactions'
-def insert_predictions(rows):
+    is_fraud = get_is_fraud(data_api)
+    if len(is_fraud) != len(pred_df):
+        raise ValueError(f"{len(is_fraud)} transactions reçues pour {len(pred_df)} prédictions")
+
+    columns = []
+    for col, col_type in DB_COLUMNS:
+        if col == "is_fraud":
+            columns.append(list(map(float, is_fraud)))
+        elif col_type is float:
+            columns.append(pred_df[col].to_numpy(dtype="float64").tolist())
+        else:
+            columns.append(list(map(str, pred_df[col].tolist())))
+
+    return list(zip(*columns))
+
+## DataFrame with the columns of public.transactions (insert order, 'is_fraud' of each transaction)
+def build_db_frame(data_api: dict, pred_df: pd.DataFrame) -> pd.DataFrame:
+
+    is_fraud = get_is_fraud(data_api)
+    if len(is_fraud) != len(pred_df):
+        raise ValueError(f"{len(is_fraud)} transactions reçues pour {len(pred_df)} prédictions")
+
+    frame = {}
+    for col, col_type in DB_COLUMNS:
+        if col == "is_fraud":
+            frame[col] = pd.Series(is_fraud, index=pred_df.index, dtype="float64")
+        elif col_type is float:
+            frame[col] = pred_df[col].astype("float64")
+        else:
+            frame[col] = pred_df[col].astype(str)
+    return pd.DataFrame(frame)
+
+## Insert predictions into database 'transactions', return the number of rows
+@timed("insert_predictions", rows=lambda n_rows: n_rows)
+def insert_predictions(rows) -> int:
 
     logging.info(f"🚀 Insertion de prévisions en base de données...")
 
@@ -109,10 +296,71 @@ def insert_predictions(rows):
     trans_date_trans_time,classification)
     VALUES %s;
     """
-    with pg_connect() as conn, conn.cursor() as cur:
-        if rows:
-            execute_values(cur, insert_sql, rows)
-        conn.commit()
+    if rows:
+        # One INSERT statement is atomic by itself : no separate COMMIT needed
+        # (not replayed if the connection drops : the INSERT may already be committed)
+        get_pg_pool().run(
+            lambda cur: execute_values(cur, insert_sql, rows, page_size=INSERT_PAGE_SIZE),
+            autocommit=len(rows) <= INSERT_PAGE_SIZE)
     logging.info(f"✅ Transaction écrite dans la base de données")
+    return len(rows)
 
  
+
+## CSV without header, written by Arrow straight from the columns (much faster than DataFrame.to_csv)
+def csv_buffer(table: pa.Table) -> io.BytesIO:
+
+    buffer = io.BytesIO()
+    pa_csv.write_csv(table, buffer, pa_csv.WriteOptions(include_header=False))
+    return buffer
+
+## Bulk load predictions with COPY FROM STDIN (CSV streamed from an in-memory buffer)
+## Small batches go through insert_predictions, large ones are committed by chunk
+@timed("copy_predictions", rows=lambda n_rows: n_rows)
+def copy_predictions(data_api: dict, pred_df: pd.DataFrame,
+                     chunk_size: int = COPY_CHUNK_SIZE, min_rows: int = COPY_MIN_ROWS) -> int:
+
+    if len(pred_df) < min_rows:
+        rows = build_db_rows(data_api=data_api, pred_df=pred_df)
+        insert_predictions(rows)
+        return len(rows)
+
+    logging.info(f"🚀 Chargement de {len(pred_df)} prévisions en base de données (COPY)...")
+    frame = build_db_frame(data_api, pred_df)
+    copy_sql = f"COPY public.transactions ({','.join(frame.columns)}) FROM STDIN WITH (FORMAT csv)"
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+
+    for start in range(0, table.num_rows, chunk_size):
+        buffer = csv_buffer(table.slice(start, chunk_size))
+
+        def copy_chunk(cur, buffer=buffer):
+            # Rewind : the chunk may be sent again on a new connection
+            buffer.seek(0)
+            cur.copy_expert(copy_sql, buffer)
+
+        get_pg_pool().run(copy_chunk)
+
+    logging.info(f"✅ {table.num_rows} transactions écrites dans la base de données")
+    return table.num_rows
+
+## Rescored transactions (backfill) : COPY into a staging table, then replaced by trans_num in public.transactions,
+## all in one transaction (transactions loaded again are never duplicated)
+@timed("upsert_predictions", rows=lambda n_rows: n_rows)
+def upsert_predictions(data_api: dict, pred_df: pd.DataFrame) -> int:
+
+    frame = build_db_frame(data_api, pred_df)
+    columns = ",".join(frame.columns)
+    buffer = csv_buffer(pa.Table.from_pandas(frame, preserve_index=False))
+
+    def upsert(cur):
+        # Rewind : the chunk may be sent again on a new connection
+        buffer.seek(0)
+        cur.execute("CREATE TEMP TABLE transactions_staging (LIKE public.transactions) ON COMMIT DROP")
+        cur.copy_expert(f"COPY transactions_staging ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+        cur.execute("DELETE FROM public.transactions t USING transactions_staging s WHERE t.trans_num = s.trans_num")
+        cur.execute(f"INSERT INTO public.transactions ({columns}) "
+                    f"SELECT DISTINCT ON (trans_num) {columns} FROM transactions_staging")
+
+    get_pg_pool().run(upsert)
+    return len(frame)
+
@@ -1,6 +1,11 @@
 import os
+import re
+import threading
 import mlflow
 import mlflow.sklearn
+from mlflow.tracking import MlflowClient
+from model_cache import ModelArtifactCache
+from metrics import timed
 from dotenv import find_dotenv, load_dotenv
 import logging
 
@@ -16,13 +21,172 @@ MLFLOW_TRACKING_URI = os.getenv("MLFLOW_TRACKING_URI")
 #MLFLOW_MODEL_URI = os.getenv("MLFLOW_MODEL_URI")
 MODEL_URI = os.getenv("MODEL_URI")
 
+## Seconds between two checks of the alias (0 = never check again after startup)
+MODEL_POLL_INTERVAL = float(os.getenv("MODEL_POLL_INTERVAL", "60"))
+
+## models:/<name>@<alias>
+ALIAS_URI_PATTERN = re.compile(r"^models:/(?P<name>[^/@]+)@(?P<alias>[^/@]+)$")
+
 
 # === LOAD MODEL from MLFlow function ===
+@timed("load_mlflow_model")
 def load_mlflow_model(tracking_uri: str = MLFLOW_TRACKING_URI, model_uri: str = MODEL_URI):
-    
+
     logging.info(f"🚀 Chargement du modèle MLflow depuis {tracking_uri} avec le modèle URI {model_uri}...")
     mlflow.set_tracking_uri(tracking_uri)
     model = mlflow.sklearn.load_model(model_uri)
     logging.info("✅ Modèle récupéré depuis MLflow")
     return model
 
+
+# === MODEL REGISTRY (model kept in memory for the whole process) ===
+class ModelRegistry:
+
+    def __init__(self, tracking_uri: str = MLFLOW_TRACKING_URI, model_uri: str = MODEL_URI,
+                 poll_interval: float = MODEL_POLL_INTERVAL, cache: ModelArtifactCache = None):
+
+        self.tracking_uri = tracking_uri
+        self.model_uri = model_uri
+        self.poll_interval = poll_interval
+        self.cache = cache
+
+        # Alias URI (models:/name@production) can be followed, other URIs are loaded once
+        match = ALIAS_URI_PATTERN.match(model_uri or "")
+        self.model_name = match.group("name") if match else None
+        self.model_alias = match.group("alias") if match else None
+
+        # (version, model) is swapped in a single assignment : readers never see a half-loaded model
+        self._current = (None, None)
+        self._refresh_lock = threading.Lock()
+        self._listeners = []
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    ## Version currently pointed by the alias (None if the URI has no alias)
+    def resolve_version(self):
+
+        if self.model_alias is None:
+            return None
+        client = MlflowClient(tracking_uri=self.tracking_uri)
+        model_version = client.get_model_version_by_alias(self.model_name, self.model_alias)
+        return str(model_version.version)
+
+    ## Load the model of a given version (whole URI if the version is unknown)
+    ## Local cache first, MLflow download only on a cache miss
+    def _load_version(self, version):
+
+        if version is None:
+            return load_mlflow_model(self.tracking_uri, self.model_uri)
+
+        if self.cache is not None:
+            model = self.cache.get(self.model_name, version)
+            if model is not None:
+                return model
+
+        model = load_mlflow_model(self.tracking_uri, f"models:/{self.model_name}/{version}")
+        if self.cache is not None:
+            try:
+                self.cache.put(self.model_name, version, model)
+            except Exception as e:
+                logging.error(f"❌ Erreur lors de l'enregistrement du modèle dans le cache local : {e}")
+        return model
+
+    ## Version to load : alias in MLflow, or last cached version if MLflow can't be reached at startup
+    def _target_version(self):
+
+        try:
+            return self.resolve_version()
+        except Exception as e:
+            if self._current[1] is not None or self.cache is None or self.model_name is None:
+                raise
+            version = self.cache.latest_version(self.model_name)
+            if version is None:
+                raise
+            logging.warning(f"⚠️ MLflow injoignable ({e}) : utilisation du modèle v{version} en cache")
+            return version
+
+    ## Reload the model if the alias moved, return True if a new model was swapped in
+    def refresh(self) -> bool:
+
+        with self._refresh_lock:
+            version = self._target_version()
+            current_version, current_model = self._current
+            if current_model is not None and version == current_version:
+                return False
+
+            # The new model is fully loaded before being published
+            model = self._load_version(version)
+            self._current = (version, model)
+            for callback in self._listeners:
+                self._notify(callback, version, model)
+
+        if current_model is None:
+            logging.info(f"✅ Modèle chargé en mémoire (version {version})")
+        else:
+            logging.info(f"✅ Nouveau modèle en production : version {current_version} -> {version}")
+        return True
+
+    ## callback(version, model) run in the loading thread each time a model is swapped in (now for the current one)
+    ## e.g. model compiled once per version, never by the readers
+    def add_listener(self, callback):
+
+        with self._refresh_lock:
+            self._listeners.append(callback)
+            version, model = self._current
+            if model is not None:
+                self._notify(callback, version, model)
+
+    def _notify(self, callback, version, model):
+
+        try:
+            callback(version, model)
+        except Exception as e:
+            logging.error(f"❌ Erreur après le chargement du modèle version {version} : {e}")
+
+    ## Background check of the alias
+    def _poll(self):
+
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logging.error(f"❌ Erreur lors de la vérification du modèle MLflow (modèle actuel conservé) : {e}")
+
+    ## Load the model once, then follow the alias in a daemon thread
+    def start(self):
+
+        self.refresh()
+        if self.model_alias is not None and self.poll_interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._poll, name="model-registry-poll", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    ## Model in production (keep the returned object for the whole prediction)
+    def get(self):
+
+        return self._current[1]
+
+    @property
+    def version(self):
+
+        return self._current[0]
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+## Process-wide registry, loaded on first call
+def get_model_registry() -> ModelRegistry:
+
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry(cache=ModelArtifactCache()).start()
+    return _registry
@@ -0,0 +1,230 @@
+import os
+import time
+import threading
+import functools
+from bisect import bisect_left
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import logging
+
+# Log infos
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# === Metrics of the ETL stages (Prometheus text format) ===
+## Port of the worker's /metrics endpoint (0 : no endpoint, 8000 is taken by the scoring API)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "8001"))
+## File for the node_exporter textfile collector ('' : no file), rewritten every METRICS_TEXTFILE_INTERVAL seconds
+METRICS_TEXTFILE = os.getenv("METRICS_TEXTFILE", "")
+METRICS_TEXTFILE_INTERVAL = float(os.getenv("METRICS_TEXTFILE_INTERVAL", "15"))
+
+## Latency buckets (seconds) : from an in-memory step to a slow S3 / Neon / MLflow round trip
+LATENCY_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+
+## Counts of observed values per bucket (upper bounds), plus count and sum (one lock taken per observation)
+## Shared by the ETL stages and the dynamic batcher of the scoring API (fastAPI/server/batcher.py)
+class Histogram:
+
+    def __init__(self, buckets: list):
+
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+
+        with self._lock:
+            self._observe(value)
+
+    ## Lock held by the caller
+    def _observe(self, value: float):
+
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    ## Cumulative counts (value <= bound), as in Prometheus histograms : [(bound, count), ..., ("+Inf", count)]
+    def snapshot(self) -> dict:
+
+        with self._lock:
+            return self._snapshot()
+
+    def _snapshot(self) -> dict:
+
+        cumulative, total = [], 0
+        for bound, count in zip(self.buckets + ["+Inf"], self.counts):
+            total += count
+            cumulative.append((bound, total))
+        return {"buckets": cumulative, "count": self.count, "sum": self.sum,
+                "mean": self.sum / self.count if self.count else 0.0}
+
+
+## Calls of one stage : latency histogram, rows processed and errors (one lock taken per call)
+class StageMetrics(Histogram):
+
+    def __init__(self, buckets: list = LATENCY_BUCKETS):
+
+        super().__init__(buckets)
+        self.rows = 0
+        self.errors = 0
+
+    def observe(self, seconds: float, rows: int = None, error: bool = False):
+
+        with self._lock:
+            self._observe(seconds)
+            if rows:
+                self.rows += rows
+            if error:
+                self.errors += 1
+
+    def snapshot(self) -> dict:
+
+        with self._lock:
+            return {**self._snapshot(), "rows": self.rows, "errors": self.errors}
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+
+        self.stages = {}
+        self.gauges = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name: str) -> StageMetrics:
+
+        metrics = self.stages.get(name)
+        if metrics is None:
+            with self._lock:
+                metrics = self.stages.setdefault(name, StageMetrics())
+        return metrics
+
+    ## Gauge read when the metrics are rendered : callback() -> value, or {label value: value}
+    def register_gauge(self, name: str, help_text: str, label: str, callback):
+
+        with self._lock:
+            self.gauges.setdefault(name, (help_text, label, []))[2].append(callback)
+
+    ## Prometheus text exposition format (version 0.0.4)
+    def render(self) -> str:
+
+        lines = []
+        snapshots = {name: metrics.snapshot() for name, metrics in sorted(self.stages.items())}
+
+        lines += ["# HELP etl_stage_duration_seconds Duration of the ETL stages",
+                  "# TYPE etl_stage_duration_seconds histogram"]
+        for name, snapshot in snapshots.items():
+            for bound, total in snapshot["buckets"]:
+                le = bound if bound == "+Inf" else f"{bound:g}"
+                lines.append(f'etl_stage_duration_seconds_bucket{{stage="{name}",le="{le}"}} {total}')
+            lines.append(f'etl_stage_duration_seconds_sum{{stage="{name}"}} {snapshot["sum"]!r}')
+            lines.append(f'etl_stage_duration_seconds_count{{stage="{name}"}} {snapshot["count"]}')
+
+        for metric, key, help_text in (("etl_stage_rows_total", "rows", "Transactions processed by the ETL stages"),
+                                       ("etl_stage_errors_total", "errors", "Failed calls of the ETL stages")):
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+            lines += [f'{metric}{{stage="{name}"}} {snapshot[key]}' for name, snapshot in snapshots.items()]
+
+        with self._lock:
+            gauges = sorted(self.gauges.items())
+        for name, (help_text, label, callbacks) in gauges:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+            for callback in callbacks:
+                try:
+                    values = callback()
+                except Exception as e:
+                    logging.warning(f"⚠️ Métrique {name} illisible ({e})")
+                    continue
+                if not isinstance(values, dict):
+                    values = {"": values}
+                lines += [f'{name}{{{label}="{key}"}} {value}' if key else f"{name} {value}"
+                          for key, value in values.items()]
+
+        return "\n".join(lines) + "\n"
+
+
+_registry = MetricsRegistry()
+## Code of every instrumented function -> its stage (used by the profiler to annotate the stacks)
+STAGE_CODES = {}
+
+## Process-wide registry (every instrumented function records into it)
+def get_metrics() -> MetricsRegistry:
+
+    return _registry
+
+## Record the latency, errors and rows (rows(result)) of every call of the decorated function
+def timed(stage: str, rows=None):
+
+    def decorator(func):
+
+        metrics = _registry.stage(stage)
+        STAGE_CODES[func.__code__] = stage
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+
+            start_time = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                metrics.observe(time.perf_counter() - start_time, error=True)
+                raise
+            metrics.observe(time.perf_counter() - start_time, rows(result) if rows else None)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+# === Exporters ===
+
+## GET /metrics served by a background thread, returns the server (server.shutdown() to stop it)
+def start_metrics_server(port: int = METRICS_PORT, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = _registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logging.info(f"✅ Métriques exposées sur http://{host}:{server.server_port}/metrics")
+    return server
+
+## Replace the file in one step (the collector never reads a half-written file)
+def write_textfile(path: str = METRICS_TEXTFILE):
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(_registry.render())
+    os.replace(tmp_path, path)
+
+## Rewrite the textfile every `interval` seconds in a background thread
+def start_textfile_exporter(path: str = METRICS_TEXTFILE, interval: float = METRICS_TEXTFILE_INTERVAL) -> threading.Thread:
+
+    def export():
+        while True:
+            try:
+                write_textfile(path)
+            except OSError as e:
+                logging.error(f"❌ Écriture des métriques dans {path} impossible : {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=export, name="metrics-textfile", daemon=True)
+    thread.start()
+    logging.info(f"✅ Métriques écrites toutes les {interval:g} secondes dans {path}")
+    return thread
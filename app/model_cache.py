@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import shutil
+import pickle
+import hashlib
+import tempfile
+import threading
+import joblib
+import cloudpickle
+from dotenv import find_dotenv, load_dotenv
+import logging
+
+# Charger le .env
+env_path = find_dotenv()
+load_dotenv(env_path, override=True)
+
+# Log infos
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# === Local model cache ===
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "bloc4_models"))
+MODEL_CACHE_MAX_BYTES = int(os.getenv("MODEL_CACHE_MAX_BYTES", str(2 * 1024**3)))
+
+MODEL_FILE = "model.joblib"
+META_FILE = "meta.json"
+
+
+## SHA-256 of a file, read by chunks
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# === On-disk cache of model artifacts, keyed by (registered model name, version) ===
+class ModelArtifactCache:
+
+    def __init__(self, cache_dir: str = MODEL_CACHE_DIR, max_bytes: int = MODEL_CACHE_MAX_BYTES):
+
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _entry_dir(self, name: str, version: str) -> str:
+
+        return os.path.join(self.cache_dir, name, str(version))
+
+    def _read_meta(self, entry_dir: str):
+
+        try:
+            with open(os.path.join(entry_dir, META_FILE), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    ## All complete entries : (entry_dir, meta, last_used)
+    def _entries(self):
+
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for name in os.listdir(self.cache_dir):
+            name_dir = os.path.join(self.cache_dir, name)
+            if name.startswith(".") or not os.path.isdir(name_dir):
+                continue
+            for version in os.listdir(name_dir):
+                entry_dir = os.path.join(name_dir, version)
+                meta = self._read_meta(entry_dir)
+                if meta is None:
+                    continue
+                last_used = os.path.getmtime(os.path.join(entry_dir, META_FILE))
+                entries.append((entry_dir, meta, last_used))
+        return entries
+
+    def size(self) -> int:
+
+        return sum(meta["size"] for _, meta, _ in self._entries())
+
+    ## Most recently used cached version of a model (used when the registry can't be reached)
+    def latest_version(self, name: str):
+
+        entries = [(meta, last_used) for _, meta, last_used in self._entries() if meta["name"] == name]
+        if not entries:
+            return None
+        return max(entries, key=lambda entry: entry[1])[0]["version"]
+
+    ## Load a cached model, None if missing or corrupted
+    def get(self, name: str, version: str):
+
+        entry_dir = self._entry_dir(name, version)
+        meta = self._read_meta(entry_dir)
+        if meta is None:
+            return None
+
+        model_path = os.path.join(entry_dir, MODEL_FILE)
+        try:
+            valid = os.path.getsize(model_path) == meta["size"] and file_sha256(model_path) == meta["sha256"]
+        except OSError:
+            valid = False
+        if not valid:
+            logging.warning(f"⚠️ Cache du modèle {name} v{version} corrompu : suppression")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return None
+
+        # joblib : numpy arrays (trees of the forest) are memory-mapped instead of copied
+        if meta["format"] == "joblib":
+            model = joblib.load(model_path, mmap_mode="r")
+        else:
+            with open(model_path, "rb") as f:
+                model = pickle.load(f)
+
+        # Last use date for LRU eviction
+        os.utime(os.path.join(entry_dir, META_FILE))
+        logging.info(f"✅ Modèle {name} v{version} chargé depuis le cache local {entry_dir}")
+        return model
+
+    ## Store a model in the cache then evict least recently used entries above max_bytes
+    def put(self, name: str, version: str, model) -> str:
+
+        entry_dir = self._entry_dir(name, version)
+        os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+
+        # Written in a temporary directory then renamed : an entry is always complete
+        tmp_dir = tempfile.mkdtemp(prefix=".tmp_", dir=self.cache_dir)
+        try:
+            model_path = os.path.join(tmp_dir, MODEL_FILE)
+            try:
+                joblib.dump(model, model_path)
+                model_format = "joblib"
+            except (pickle.PicklingError, AttributeError, TypeError):
+                # Functions defined in a training script can only be pickled by value
+                with open(model_path, "wb") as f:
+                    cloudpickle.dump(model, f)
+                model_format = "cloudpickle"
+
+            meta = {
+                "name": name,
+                "version": str(version),
+                "format": model_format,
+                "size": os.path.getsize(model_path),
+                "sha256": file_sha256(model_path),
+                "created_at": time.time()}
+            with open(os.path.join(tmp_dir, META_FILE), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+
+            with self._lock:
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                os.replace(tmp_dir, entry_dir)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        logging.info(f"✅ Modèle {name} v{version} enregistré dans le cache local ({meta['size']} octets)")
+        self.evict(keep=entry_dir)
+        return entry_dir
+
+    ## Remove least recently used entries until the cache fits in max_bytes
+    def evict(self, keep: str = None):
+
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda entry: entry[2])
+            total = sum(meta["size"] for _, meta, _ in entries)
+            for entry_dir, meta, _ in entries:
+                if total <= self.max_bytes:
+                    break
+                if entry_dir == keep:
+                    continue
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                total -= meta["size"]
+                logging.info(f"🧹 Modèle {meta['name']} v{meta['version']} retiré du cache local")
@@ -0,0 +1,218 @@
+import io
+import os
+import time
+import uuid
+import atexit
+import threading
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from storage import get_s3_client, get_uploader, S3_BUCKET
+from metrics import get_metrics
+from dotenv import find_dotenv, load_dotenv
+import logging
+
+# Charger le .env
+env_path = find_dotenv()
+load_dotenv(env_path, override=True)
+
+# Log infos
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# === Parquet files (SILVER / GOLD) ===
+## A buffer is written when it holds PARQUET_FLUSH_ROWS rows or is older than PARQUET_FLUSH_SECONDS
+PARQUET_FLUSH_ROWS = int(os.getenv("PARQUET_FLUSH_ROWS", "10000"))
+PARQUET_FLUSH_SECONDS = float(os.getenv("PARQUET_FLUSH_SECONDS", "300"))
+PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "zstd")
+
+## Transaction after transformation (SILVER)
+SILVER_SCHEMA = pa.schema([
+    ("cc_num", pa.float64()),
+    ("merchant", pa.string()),
+    ("category", pa.string()),
+    ("amt", pa.float64()),
+    ("first", pa.string()),
+    ("last", pa.string()),
+    ("gender", pa.string()),
+    ("street", pa.string()),
+    ("city", pa.string()),
+    ("state", pa.string()),
+    ("zip", pa.float64()),
+    ("lat", pa.float64()),
+    ("long", pa.float64()),
+    ("city_pop", pa.float64()),
+    ("job", pa.string()),
+    ("dob", pa.string()),
+    ("trans_num", pa.string()),
+    ("merch_lat", pa.float64()),
+    ("merch_long", pa.float64()),
+    ("unix_time", pa.float64()),
+    ("trans_date_trans_time", pa.string())])
+
+## Transaction with classification (GOLD)
+GOLD_SCHEMA = SILVER_SCHEMA.append(pa.field("classification", pa.float64()))
+
+
+## Typed Arrow table (columns of the schema only, in the schema order), missing values (None / NaN) written as nulls
+def to_arrow_table(df: pd.DataFrame, schema: pa.Schema) -> pa.Table:
+
+    columns = []
+    for field in schema:
+        values = df[field.name]
+        if pa.types.is_string(field.type):
+            values = values.where(values.isna(), values.astype(str))
+        else:
+            values = values.astype("float64")
+        columns.append(pa.array(values, type=field.type, from_pandas=True))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+## Hive-style partition of each row, from the transaction time : dt=YYYY-MM-DD/hour=HH
+def partition_keys(df: pd.DataFrame) -> pd.Series:
+
+    event_time = pd.to_datetime(df["unix_time"], unit="s", utc=True)
+    return "dt=" + event_time.dt.strftime("%Y-%m-%d") + "/hour=" + event_time.dt.strftime("%H")
+
+## Unique object name (several workers / flushes in the same second never overwrite each other)
+def parquet_object_key(prefix: str, partition: str) -> str:
+
+    return f"{prefix}/{partition}/part-{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{uuid.uuid4().hex}.parquet"
+
+
+# === Buffered Parquet writer, partitioned by day / hour ===
+class ParquetSink:
+
+    def __init__(self, prefix: str, schema: pa.Schema, max_rows: int = PARQUET_FLUSH_ROWS,
+                 max_seconds: float = PARQUET_FLUSH_SECONDS, compression: str = PARQUET_COMPRESSION,
+                 bucket: str = S3_BUCKET, uploader=None):
+
+        self.prefix = prefix
+        self.schema = schema
+        self.max_rows = max_rows
+        self.max_seconds = max_seconds
+        self.compression = compression
+        self.bucket = bucket
+        self.uploader = uploader
+        self._frames = []
+        self._n_rows = 0
+        self._first_row_time = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        # Latency / rows / errors of the writes of this layer (write_parquet_silver, write_parquet_gold)
+        self._metrics = get_metrics().stage(f"write_parquet_{prefix.rsplit('/', 1)[-1]}")
+
+    ## Add rows to the buffer (written at once when the buffer is full)
+    def add(self, df: pd.DataFrame):
+
+        with self._lock:
+            self._frames.append(df)
+            self._n_rows += len(df)
+            if self._first_row_time is None:
+                self._first_row_time = time.monotonic()
+            full = self._n_rows >= self.max_rows
+        if full:
+            self.flush()
+        self._start_timer()
+
+    ## Time-based flush : the buffer never stays more than max_seconds in memory
+    def _start_timer(self):
+
+        if self._thread is None and self.max_seconds > 0:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._watch, name="parquet-flush", daemon=True)
+                    self._thread.start()
+
+    def _watch(self):
+
+        while not self._stop_event.wait(min(self.max_seconds, 1.0)):
+            with self._lock:
+                expired = (self._first_row_time is not None
+                           and time.monotonic() - self._first_row_time >= self.max_seconds)
+            if expired:
+                self.flush()
+
+    ## Empty the buffer : one Parquet file per partition
+    ## Uploaded in background (returns the upload Future), or before returning if wait=True (returns the keys)
+    def flush(self, wait: bool = False):
+
+        with self._lock:
+            frames, self._frames = self._frames, []
+            self._n_rows = 0
+            self._first_row_time = None
+        if not frames:
+            return [] if wait else None
+
+        # Filled with the files on the first attempt : a retried upload reuses the same keys
+        files = []
+        if wait:
+            return self._write(frames, files)
+        uploader = self.uploader or get_uploader()
+        return uploader.submit(self._write, frames, files)
+
+    ## Write the buffered rows (run by the uploader, retried with the same `files`), return the written keys
+    def _write(self, frames, files: list) -> list:
+
+        start_time = time.perf_counter()
+        try:
+            # Keys and Parquet content built once : a retry overwrites the files already sent, never adds new ones
+            if not files:
+                files.extend(self._build_files(frames))
+            for key, body, n_rows in files:
+                get_s3_client().put_object(
+                    Bucket=self.bucket,
+                    Key=key,
+                    Body=body,
+                    ContentType="application/vnd.apache.parquet")
+                logging.info(f"✅ {n_rows} transactions enregistrées dans s3://{self.bucket}/{key}")
+        except Exception:
+            self._metrics.observe(time.perf_counter() - start_time, error=True)
+            raise
+        self._metrics.observe(time.perf_counter() - start_time, sum(len(frame) for frame in frames))
+        return [key for key, _, _ in files]
+
+    ## One Parquet file per partition : [(key, content, rows), ...]
+    def _build_files(self, frames) -> list:
+
+        data = pd.concat(frames, ignore_index=True)
+        files = []
+        for partition, rows in data.groupby(partition_keys(data), sort=True):
+            buffer = io.BytesIO()
+            pq.write_table(to_arrow_table(rows, self.schema), buffer, compression=self.compression)
+            files.append((parquet_object_key(self.prefix, partition), buffer.getvalue(), len(rows)))
+        return files
+
+    ## Last rows written synchronously (background threads are stopped when the process exits)
+    def close(self):
+
+        self._stop_event.set()
+        self.flush(wait=True)
+
+
+## All rows of one day (one or a few Parquet files per hour)
+def read_partition(prefix: str, day: str, bucket: str = S3_BUCKET) -> pd.DataFrame:
+
+    client = get_s3_client()
+    tables = []
+    paginator = client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=f"{prefix}/dt={day}/"):
+        for obj in page.get("Contents", []):
+            if obj["Key"].endswith(".parquet"):
+                body = client.get_object(Bucket=bucket, Key=obj["Key"])["Body"].read()
+                tables.append(pq.read_table(io.BytesIO(body)))
+    if not tables:
+        return pd.DataFrame()
+    return pa.concat_tables(tables).to_pandas()
+
+
+_sinks = {}
+_sinks_lock = threading.Lock()
+
+## Process-wide sink of a prefix, flushed when the process exits
+def get_parquet_sink(prefix: str, schema: pa.Schema) -> ParquetSink:
+
+    with _sinks_lock:
+        if prefix not in _sinks:
+            _sinks[prefix] = ParquetSink(prefix, schema)
+            atexit.register(_sinks[prefix].close)
+        return _sinks[prefix]
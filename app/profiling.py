@@ -0,0 +1,302 @@
+import os
+import sys
+import time
+import pstats
+import signal
+import cProfile
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from metrics import STAGE_CODES
+import logging
+
+# Log infos
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# === On-demand profiling of the worker (kill -USR1 <pid>, or PROFILE_ON_START=true) ===
+## "cprofile" : deterministic, worker thread only (pstats) / "sampling" : stacks of every thread (collapsed stacks)
+PROFILE_MODE = os.getenv("PROFILE_MODE", "cprofile")
+## A capture lasts PROFILE_ITERATIONS runs, or PROFILE_SECONDS if set (whichever comes first)
+PROFILE_ITERATIONS = int(os.getenv("PROFILE_ITERATIONS", "10"))
+PROFILE_SECONDS = float(os.getenv("PROFILE_SECONDS", "0"))
+## Capture of the streaming pipeline (no runs to count) when PROFILE_SECONDS is not set
+PROFILE_STREAM_SECONDS = 30.0
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+## tracemalloc snapshot diff : memory growth per run, by line
+PROFILE_MEMORY = os.getenv("PROFILE_MEMORY", "false").lower() == "true"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/profiles")
+PROFILE_ON_START = os.getenv("PROFILE_ON_START", "false").lower() == "true"
+## Lines of the reports (functions, memory)
+PROFILE_TOP = 40
+## Allocations of the profiler itself left out of the memory report
+MEMORY_FILTERS = [tracemalloc.Filter(False, cProfile.__file__), tracemalloc.Filter(False, pstats.__file__),
+                  tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+
+
+## Name of a frame in the reports : function (file:line)
+def frame_name(code) -> str:
+
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+# === Sampling profiler : stacks of every thread every `interval` seconds ===
+class StackSampler:
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL):
+
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._sample_loop, name="profiler-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _sample_loop(self):
+
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    self.stacks[self._collapse(frame, names.get(thread_id, str(thread_id)))] += 1
+            self.samples += 1
+
+    ## "stage:<innermost ETL stage>;thread:<name>;outer frame;...;inner frame"
+    @staticmethod
+    def _collapse(frame, thread_name: str) -> str:
+
+        names = []
+        stage = None
+        while frame is not None:
+            names.append(frame_name(frame.f_code))
+            if stage is None:
+                stage = STAGE_CODES.get(frame.f_code)
+            frame = frame.f_back
+        names.append(f"thread:{thread_name}")
+        names.append(f"stage:{stage or 'other'}")
+        return ";".join(reversed(names)).replace(" ", "_")
+
+    ## Collapsed stacks (flamegraph.pl, speedscope) : "frame;frame;frame count" per line
+    def collapsed(self) -> str:
+
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+# === One capture : started when requested, written after N runs or T seconds ===
+class ProfileSession:
+
+    def __init__(self, mode: str, iterations: int, seconds: float, memory: bool, interval: float):
+
+        self.mode = mode
+        self.iterations = iterations
+        self.seconds = seconds
+        self.memory = memory
+        self.done_iterations = 0
+        self.start_time = time.monotonic()
+        self.name = f"profile-{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+        self.memory_baseline = None
+        self.memory_baseline_iterations = 0
+        self._profile = cProfile.Profile() if mode == "cprofile" else None
+        self._sampler = StackSampler(interval) if mode == "sampling" else None
+
+    def start(self):
+
+        if self.memory:
+            tracemalloc.start()
+            self.memory_baseline = tracemalloc.take_snapshot()
+        if self._profile is not None:
+            self._profile.enable()
+        else:
+            self._sampler.start()
+
+    ## cProfile paused between runs (the worker's sleep is left out of the profile)
+    def resume(self):
+
+        if self._profile is not None:
+            self._profile.enable()
+
+    def pause(self):
+
+        if self._profile is not None:
+            self._profile.disable()
+
+    ## End of a run (the first run warms the caches : memory growth measured from the second one)
+    def iteration_done(self):
+
+        self.done_iterations += 1
+        if self.memory and self.done_iterations == 1 and self.iterations > 1:
+            self.memory_baseline = tracemalloc.take_snapshot()
+            self.memory_baseline_iterations = 1
+
+    def finished(self) -> bool:
+
+        if self.seconds and time.monotonic() - self.start_time >= self.seconds:
+            return True
+        return self.iterations > 0 and self.done_iterations >= self.iterations
+
+    ## Stop the capture and write the reports, return their paths
+    def stop(self, output_dir: str) -> list:
+
+        os.makedirs(output_dir, exist_ok=True)
+        base_path = os.path.join(output_dir, self.name)
+        elapsed = time.monotonic() - self.start_time
+        header = (f"# {self.mode} : {self.done_iterations} runs in {elapsed:.2f} s "
+                  f"(pid {os.getpid()}, {datetime.now().isoformat(timespec='seconds')})\n")
+        paths = []
+
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile.dump_stats(f"{base_path}.pstats")
+            with open(f"{base_path}.txt", "w", encoding="utf-8") as f:
+                f.write(header)
+                f.write(self._stage_summary())
+                stats = pstats.Stats(self._profile, stream=f)
+                stats.sort_stats("cumulative").print_stats(PROFILE_TOP)
+            paths += [f"{base_path}.pstats", f"{base_path}.txt"]
+        else:
+            self._sampler.stop()
+            with open(f"{base_path}.collapsed", "w", encoding="utf-8") as f:
+                f.write(self._sampler.collapsed())
+            paths.append(f"{base_path}.collapsed")
+
+        if self.memory:
+            snapshot = tracemalloc.take_snapshot().filter_traces(MEMORY_FILTERS)
+            tracemalloc.stop()
+            with open(f"{base_path}.memory.txt", "w", encoding="utf-8") as f:
+                f.write(header)
+                f.write(self._memory_report(snapshot))
+            paths.append(f"{base_path}.memory.txt")
+        return paths
+
+    ## Calls and cumulative time of every instrumented ETL stage
+    def _stage_summary(self) -> str:
+
+        stats = pstats.Stats(self._profile).stats
+        stage_keys = {(code.co_filename, code.co_firstlineno, code.co_name): stage for code, stage in STAGE_CODES.items()}
+        lines = [f"# {'stage':<34} {'calls':>7} {'cumulative (s)':>15}\n"]
+        rows = []
+        for key, (_, n_calls, _, cumulative, _) in stats.items():
+            if key in stage_keys:
+                rows.append((cumulative, stage_keys[key], n_calls))
+        for cumulative, stage, n_calls in sorted(rows, reverse=True):
+            lines.append(f"# {stage:<34} {n_calls:>7} {cumulative:>15.4f}\n")
+        return "".join(lines) + "\n"
+
+    ## Memory allocated since the baseline, by line, and per run
+    def _memory_report(self, snapshot) -> str:
+
+        runs = max(self.done_iterations - self.memory_baseline_iterations, 1)
+        differences = snapshot.compare_to(self.memory_baseline.filter_traces(MEMORY_FILTERS), "lineno")
+        growth = sum(difference.size_diff for difference in differences)
+        lines = [f"# growth over {runs} runs : {growth / 1024:.1f} KiB ({growth / runs / 1024:.1f} KiB per run)\n"]
+        for difference in differences[:PROFILE_TOP]:
+            frame = difference.traceback[0]
+            lines.append(f"{difference.size_diff / runs / 1024:>10.1f} KiB/run {difference.count_diff / runs:>9.1f} blocks/run "
+                         f"{frame.filename}:{frame.lineno}\n")
+        return "".join(lines)
+
+
+# === Profiler of the worker : captures requested at any time, without restart ===
+class WorkerProfiler:
+
+    def __init__(self, mode: str = PROFILE_MODE, iterations: int = PROFILE_ITERATIONS,
+                 seconds: float = PROFILE_SECONDS, memory: bool = PROFILE_MEMORY,
+                 output_dir: str = PROFILE_DIR, interval: float = PROFILE_SAMPLE_INTERVAL):
+
+        if mode not in ("cprofile", "sampling"):
+            raise ValueError(f"PROFILE_MODE inconnu : {mode} (cprofile ou sampling)")
+        self.mode = mode
+        self.iterations = iterations
+        self.seconds = seconds
+        self.memory = memory
+        self.output_dir = output_dir
+        self.interval = interval
+        self.session = None
+        self.last_paths = []
+        self._requested = threading.Event()
+
+    ## Capture the next runs (safe from a signal handler : only sets a flag)
+    def request(self, *args):
+
+        self._requested.set()
+
+    ## kill -USR1 <pid> requests a capture
+    def install_signal(self, signum: int = signal.SIGUSR1):
+
+        signal.signal(signum, self.request)
+        logging.info(f"✅ Profilage à la demande : kill -{signal.Signals(signum).name[3:]} {os.getpid()}")
+
+    def _start(self, mode: str, iterations: int, seconds: float):
+
+        self._requested.clear()
+        self.session = ProfileSession(mode, iterations, seconds, self.memory, self.interval)
+        self.session.start()
+        limit = f"{seconds:g} s" if seconds and not iterations else f"{iterations} itérations"
+        logging.info(f"🚀 Profilage lancé ({mode}, {limit}{', mémoire' if self.memory else ''})")
+
+    def _stop(self):
+
+        session, self.session = self.session, None
+        try:
+            self.last_paths = session.stop(self.output_dir)
+            logging.info(f"✅ Profil écrit : {', '.join(self.last_paths)}")
+        except Exception as e:
+            logging.error(f"❌ Écriture du profil impossible : {e}")
+
+    ## Around each run of the worker loop : starts a requested capture, stops it after N runs or T seconds
+    @contextmanager
+    def iteration(self):
+
+        if self.session is None and self._requested.is_set():
+            self._start(self.mode, self.iterations, self.seconds)
+        elif self.session is not None:
+            self.session.resume()
+        try:
+            yield
+        finally:
+            if self.session is not None:
+                self.session.pause()
+                self.session.iteration_done()
+                if self.session.finished():
+                    self._stop()
+
+    ## Streaming pipeline (stages in worker threads, no runs to count) : sampling captures of T seconds
+    def watch(self) -> threading.Thread:
+
+        def watch_loop():
+            while True:
+                self._requested.wait()
+                self._start("sampling", 0, self.seconds or PROFILE_STREAM_SECONDS)
+                time.sleep(self.session.seconds)
+                self._stop()
+
+        thread = threading.Thread(target=watch_loop, name="profiler-watch", daemon=True)
+        thread.start()
+        return thread
+
+
+_profiler = None
+
+## Process-wide profiler (PROFILE_ON_START : first capture requested at startup)
+def get_profiler() -> WorkerProfiler:
+
+    global _profiler
+    if _profiler is None:
+        _profiler = WorkerProfiler()
+        if PROFILE_ON_START:
+            _profiler.request()
+    return _profiler
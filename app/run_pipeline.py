@@ -1,18 +1,22 @@
 from dotenv import find_dotenv, load_dotenv
-import os
-import boto3
+import time
+import uuid
 import logging
-from extract import extract
-from load_model import load_mlflow_model
+from datetime import datetime
+from extract import extract, extract_batch, save_data_api_to_s3, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS
+from load_model import get_model_registry
+from storage import get_uploader
 from transform import (
     build_features_from_transaction,
     save_features_to_s3,
+    add_features_to_silver,
     predict_fraud,
-    save_predictions_to_s3)
+    save_predictions_to_s3,
+    add_predictions_to_gold,
+    LAKE_FORMAT)
 from load import (
     ensure_predictions_table_exists,
-    build_db_rows,
-    insert_predictions)
+    copy_predictions)
 
 # Charger le .env
 env_path = find_dotenv()
@@ -21,25 +25,34 @@ load_dotenv(env_path, override=True)
 # Log infos
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-# === S3 ===
-AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
-AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
-AWS_REGION = os.getenv("AWS_DEFAULT_REGION", "eu-north-1")
-S3_BUCKET = os.getenv("BUCKET_NAME")
+# === ETL function ===
 
+## Transform -> Predict -> Load for transactions already extracted (one or many rows)
+def transform_and_load(data_api: dict, timestamp: str) -> int:
 
-boto3.setup_default_session(
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-    region_name=AWS_REGION)
+    # LOAD MODEL (kept in memory, swapped when the 'production' alias moves)
+    model = get_model_registry().get()
 
-s3 = boto3.client(
-    "s3",
-    region_name=AWS_REGION,
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY)
+    # TRANSFORM (SILVER / GOLD uploads in background : scoring and DB insert don't wait for S3)
+    uploader = get_uploader()
+    features_df = build_features_from_transaction(data_api)
+    if LAKE_FORMAT == "parquet":
+        add_features_to_silver(features_df)
+    else:
+        uploader.submit(save_features_to_s3, features_df, timestamp)
 
-# === ETL function ===
+    # PREDICT
+    pred_df = predict_fraud(model, features_df)
+    if LAKE_FORMAT == "parquet":
+        add_predictions_to_gold(pred_df)
+    else:
+        uploader.submit(save_predictions_to_s3, pred_df, timestamp)
+
+    # LOAD MODEL to Database
+    ensure_predictions_table_exists()
+    return copy_predictions(
+        data_api=data_api,
+        pred_df=pred_df)
 
 ## Apply complete ETL : Extract -> Transform -> Predict -> Load
 def run_etl_once():
@@ -48,25 +61,50 @@ def run_etl_once():
     # EXTRACT
     data_api, timestamp = extract()
 
-    # LOAD MODEL
-    model = load_mlflow_model()
+    transform_and_load(data_api, timestamp)
+    logging.info("✅✅✅ Pipeline réalisé avec succès 💰💰💰")
 
-    # TRANSFORM
-    features_df = build_features_from_transaction(data_api)
-    save_features_to_s3(features_df, timestamp)
+## Apply complete ETL on a micro-batch : one predict, one SILVER, one GOLD and one insert per batch
+def run_etl_batch(max_size: int = BATCH_MAX_SIZE, max_wait_ms: int = BATCH_MAX_WAIT_MS) -> int:
 
-    # PREDICT
-    pred_df = predict_fraud(model, features_df)
-    save_predictions_to_s3(pred_df, timestamp)
+    logging.info(f"🚀 Démarrage du pipeline ETL par lot (max {max_size} transactions / {max_wait_ms} ms)")
+    start_time = time.perf_counter()
 
-    # LOAD MODEL to Database
-    ensure_predictions_table_exists()
-    rows = build_db_rows(
-        data_api=data_api,
-        pred_df=pred_df)
-    
-    insert_predictions(rows)
-    logging.info("✅✅✅ Pipeline réalisé avec succès 💰💰💰")
+    # EXTRACT
+    data_api, timestamp = extract_batch(max_size, max_wait_ms)
+    extract_time = time.perf_counter()
+
+    n_rows = transform_and_load(data_api, timestamp)
+    end_time = time.perf_counter()
+
+    processing_time = end_time - extract_time
+    logging.info(
+        f"✅✅✅ Lot de {n_rows} transactions traité en {end_time - start_time:.2f} s "
+        f"(collecte {extract_time - start_time:.2f} s, traitement {processing_time:.2f} s, "
+        f"{n_rows / max(processing_time, 1e-9):.1f} transactions/s) 💰💰💰")
+    return n_rows
+
+## Apply complete ETL on the next batch collected by a TransactionFetcher (concurrent intake)
+def run_etl_fetched(fetcher, max_size: int = BATCH_MAX_SIZE, max_wait_ms: int = BATCH_MAX_WAIT_MS) -> int:
+
+    start_time = time.perf_counter()
+
+    # EXTRACT (already running in the fetcher's threads)
+    data_api = fetcher.get_batch(max_size, max_wait_ms)
+    if data_api is None:
+        logging.info(f"⚠️ Aucune nouvelle transaction en {max_wait_ms} ms")
+        return 0
+    # Several batches per second : unique RAW name (same pattern as SILVER / GOLD names)
+    timestamp = f"{datetime.now():%Y%m%d-%H%M%S}_{uuid.uuid4().hex[:8]}"
+    get_uploader().submit(save_data_api_to_s3, data_api, timestamp)
+
+    n_rows = transform_and_load(data_api, timestamp)
+    processing_time = time.perf_counter() - start_time
+    logging.info(
+        f"✅✅✅ Lot de {n_rows} transactions traité en {processing_time:.2f} s "
+        f"({fetcher.queue_depth} réponses en attente) 💰💰💰")
+    return n_rows
 
 if __name__ == "__main__":
-    run_etl_once()
\ No newline at end of file
+    run_etl_once()
+    get_uploader().flush()
\ No newline at end of file
@@ -0,0 +1,141 @@
+import os
+import time
+import atexit
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import boto3
+from botocore.config import Config
+from dotenv import find_dotenv, load_dotenv
+import logging
+
+# Charger le .env
+env_path = find_dotenv()
+load_dotenv(env_path, override=True)
+
+# Log infos
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# === S3 ===
+AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
+AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
+AWS_REGION = os.getenv("AWS_DEFAULT_REGION", "eu-north-1")
+S3_BUCKET = os.getenv("BUCKET_NAME")
+## Local S3 stand-in (moto server, MinIO...), AWS if empty
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "20"))
+
+# === Background uploads ===
+S3_UPLOAD_WORKERS = int(os.getenv("S3_UPLOAD_WORKERS", "4"))
+## Uploads waiting or running at the same time (submit blocks above)
+S3_UPLOAD_QUEUE_SIZE = int(os.getenv("S3_UPLOAD_QUEUE_SIZE", "100"))
+S3_UPLOAD_RETRIES = int(os.getenv("S3_UPLOAD_RETRIES", "3"))
+
+_s3_client = None
+_s3_client_lock = threading.Lock()
+
+## One S3 client for the whole process (boto3 clients are thread-safe and keep their connections open)
+def get_s3_client():
+
+    global _s3_client
+    with _s3_client_lock:
+        if _s3_client is None:
+            _s3_client = boto3.client(
+                "s3",
+                region_name=AWS_REGION,
+                endpoint_url=S3_ENDPOINT_URL,
+                aws_access_key_id=AWS_ACCESS_KEY_ID,
+                aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+                config=Config(
+                    max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+                    retries={"max_attempts": 3, "mode": "standard"}))
+    return _s3_client
+
+
+# === Uploads run in background threads, off the scoring path ===
+class S3Uploader:
+
+    def __init__(self, workers: int = S3_UPLOAD_WORKERS, queue_size: int = S3_UPLOAD_QUEUE_SIZE,
+                 retries: int = S3_UPLOAD_RETRIES, backoff: float = 0.5):
+
+        self.retries = retries
+        self.backoff = backoff
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="s3-upload")
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.failed = 0
+
+    ## Call upload(*args), retried with exponential backoff (+ jitter)
+    def _run(self, upload, args):
+
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    return upload(*args)
+                except Exception as e:
+                    if attempt == self.retries:
+                        with self._stats_lock:
+                            self.failed += 1
+                        logging.error(f"❌ Envoi S3 abandonné après {attempt + 1} tentatives : {e}")
+                        raise
+                    time.sleep(self.backoff * 2**attempt * random.uniform(0.5, 1.5))
+        finally:
+            self._slots.release()
+
+    ## Queue an upload and return its Future (blocks while the queue is full)
+    def submit(self, upload, *args):
+
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._run, upload, args)
+        except BaseException:
+            # Never queued (e.g. executor shut down) : _run won't release the slot
+            self._slots.release()
+            raise
+        with self._pending_lock:
+            self._pending.add(future)
+        future.add_done_callback(self._forget)
+        return future
+
+    def _forget(self, future):
+
+        with self._pending_lock:
+            self._pending.discard(future)
+
+    @property
+    def queue_depth(self) -> int:
+
+        with self._pending_lock:
+            return len(self._pending)
+
+    ## Wait until every queued upload is done
+    def flush(self, timeout: float = None):
+
+        with self._pending_lock:
+            pending = list(self._pending)
+        for future in pending:
+            try:
+                future.result(timeout=timeout)
+            except Exception:
+                pass
+
+    def shutdown(self):
+
+        self.flush()
+        self._executor.shutdown(wait=True)
+
+
+_uploader = None
+_uploader_lock = threading.Lock()
+
+## Process-wide uploader, pending uploads are flushed when the process exits
+def get_uploader() -> S3Uploader:
+
+    global _uploader
+    with _uploader_lock:
+        if _uploader is None:
+            _uploader = S3Uploader()
+            atexit.register(_uploader.shutdown)
+    return _uploader
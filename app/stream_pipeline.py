@@ -0,0 +1,254 @@
+import os
+import time
+import uuid
+import signal
+import asyncio
+from datetime import datetime
+from extract import save_data_api_to_s3, API_URL, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS
+from fetcher import TransactionFetcher, FETCH_CONCURRENCY, FETCH_RATE_LIMIT
+from load_model import get_model_registry
+from transform import (
+    build_features_from_transaction,
+    save_features_to_s3,
+    add_features_to_silver,
+    predict_fraud,
+    save_predictions_to_s3,
+    add_predictions_to_gold,
+    LAKE_FORMAT)
+from load import ensure_predictions_table_exists, copy_predictions
+from dotenv import find_dotenv, load_dotenv
+import logging
+
+# Charger le .env
+env_path = find_dotenv()
+load_dotenv(env_path, override=True)
+
+# Log infos
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# === Streaming pipeline : fetch -> features -> scoring -> archive (S3) / DB ===
+## Batches waiting between two stages (a full queue blocks the stage before : backpressure up to the API calls)
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "4"))
+## Batches processed at the same time by each stage
+STREAM_FEATURES_CONCURRENCY = int(os.getenv("STREAM_FEATURES_CONCURRENCY", "2"))
+STREAM_SCORING_CONCURRENCY = int(os.getenv("STREAM_SCORING_CONCURRENCY", "1"))
+STREAM_ARCHIVE_CONCURRENCY = int(os.getenv("STREAM_ARCHIVE_CONCURRENCY", "2"))
+STREAM_DB_CONCURRENCY = int(os.getenv("STREAM_DB_CONCURRENCY", "2"))
+## Ordered sink : batches written one at a time, in the order they were fetched
+STREAM_ARCHIVE_ORDERED = os.getenv("STREAM_ARCHIVE_ORDERED", "false").lower() == "true"
+STREAM_DB_ORDERED = os.getenv("STREAM_DB_ORDERED", "true").lower() == "true"
+
+## End of stream, sent down every queue
+STOP = object()
+
+
+## Transactions travelling through the stages (a failed batch keeps its place for ordered sinks)
+class Batch:
+
+    def __init__(self, seq: int, data_api: dict, timestamp: str):
+
+        self.seq = seq
+        self.data_api = data_api
+        self.timestamp = timestamp
+        self.features_df = None
+        self.pred_df = None
+        self.error = None
+
+    @property
+    def n_rows(self) -> int:
+
+        return len(self.data_api['data'])
+
+
+# === Stage bodies (existing extract / transform / load functions, run in worker threads) ===
+
+def features_stage(batch: Batch):
+
+    batch.features_df = build_features_from_transaction(batch.data_api)
+
+def scoring_stage(batch: Batch):
+
+    # Model kept in memory, swapped when the 'production' alias moves
+    batch.pred_df = predict_fraud(get_model_registry().get(), batch.features_df)
+
+def archive_stage(batch: Batch):
+
+    save_data_api_to_s3(batch.data_api, batch.timestamp)
+    if LAKE_FORMAT == "parquet":
+        add_features_to_silver(batch.features_df)
+        add_predictions_to_gold(batch.pred_df)
+    else:
+        save_features_to_s3(batch.features_df, batch.timestamp)
+        save_predictions_to_s3(batch.pred_df, batch.timestamp)
+
+def db_stage(batch: Batch):
+
+    ensure_predictions_table_exists()
+    copy_predictions(data_api=batch.data_api, pred_df=batch.pred_df)
+
+
+# === Stage runner ===
+
+## Run `body` on every batch of `inbox` with `concurrency` tasks, forward the batches to every outbox
+## ordered=True : one batch at a time, in seq order (batches finishing early wait for the previous ones)
+async def run_stage(name: str, body, inbox: asyncio.Queue, outboxes: list, concurrency: int = 1,
+                    ordered: bool = False, stats: dict = None) -> None:
+
+    stats = stats if stats is not None else {}
+    stats.setdefault(name, {"batches": 0, "rows": 0, "errors": 0, "seconds": 0.0})
+
+    async def process(batch: Batch):
+
+        if batch.error is None:
+            start_time = time.perf_counter()
+            try:
+                await asyncio.to_thread(body, batch)
+                stats[name]["batches"] += 1
+                stats[name]["rows"] += batch.n_rows
+            except Exception as e:
+                batch.error = e
+                stats[name]["errors"] += 1
+                logging.error(f"❌ Étape {name} : lot {batch.seq} en erreur ({e})")
+            stats[name]["seconds"] += time.perf_counter() - start_time
+        for outbox in outboxes:
+            await outbox.put(batch)
+
+    async def worker():
+
+        while True:
+            batch = await inbox.get()
+            if batch is STOP:
+                # Let the other tasks of the stage see the end of stream too
+                await inbox.put(STOP)
+                return
+            await process(batch)
+
+    async def ordered_worker():
+
+        next_seq = 0
+        waiting = {}
+        while True:
+            batch = await inbox.get()
+            if batch is STOP:
+                # Batches after a gap (never expected here : failed batches still flow) are written anyway
+                for seq in sorted(waiting):
+                    await process(waiting.pop(seq))
+                return
+            waiting[batch.seq] = batch
+            while next_seq in waiting:
+                await process(waiting.pop(next_seq))
+                next_seq += 1
+
+    if ordered:
+        await ordered_worker()
+    else:
+        await asyncio.gather(*[worker() for _ in range(max(concurrency, 1))])
+    for outbox in outboxes:
+        await outbox.put(STOP)
+
+
+class StreamingPipeline:
+
+    def __init__(self, url: str = API_URL, fetch_concurrency: int = FETCH_CONCURRENCY,
+                 rate_limit: float = FETCH_RATE_LIMIT, batch_size: int = BATCH_MAX_SIZE,
+                 batch_wait_ms: int = BATCH_MAX_WAIT_MS, queue_size: int = STREAM_QUEUE_SIZE,
+                 features_concurrency: int = STREAM_FEATURES_CONCURRENCY,
+                 scoring_concurrency: int = STREAM_SCORING_CONCURRENCY,
+                 archive_concurrency: int = STREAM_ARCHIVE_CONCURRENCY, archive_ordered: bool = STREAM_ARCHIVE_ORDERED,
+                 db_concurrency: int = STREAM_DB_CONCURRENCY, db_ordered: bool = STREAM_DB_ORDERED):
+
+        # Fetch stage : concurrent API calls, rate limit and trans_num dedupe (its queue holds a few batches only)
+        self.fetcher = TransactionFetcher(url=url, concurrency=fetch_concurrency, rate_limit=rate_limit,
+                                          queue_size=max(batch_size, 1) * max(queue_size, 1))
+        self.batch_size = batch_size
+        self.batch_wait_ms = batch_wait_ms
+        self.queue_size = queue_size
+        self.features_concurrency = features_concurrency
+        self.scoring_concurrency = scoring_concurrency
+        self.archive_concurrency = archive_concurrency
+        self.archive_ordered = archive_ordered
+        self.db_concurrency = db_concurrency
+        self.db_ordered = db_ordered
+        self.stats = {}
+        self.queues = {}
+        self._stop_event = None
+
+    ## Micro-batches taken from the fetcher until max_rows transactions or stop()
+    async def _fetch_stage(self, outbox: asyncio.Queue, max_rows: int = None):
+
+        seq = 0
+        n_rows = 0
+        self.fetcher.start()
+        try:
+            while not self._stop_event.is_set() and (max_rows is None or n_rows < max_rows):
+                max_size = self.batch_size if max_rows is None else min(self.batch_size, max_rows - n_rows)
+                data_api = await asyncio.to_thread(self.fetcher.get_batch, max_size, self.batch_wait_ms)
+                if data_api is None:
+                    continue
+                # Several batches per second : unique RAW name (same pattern as SILVER / GOLD names)
+                timestamp = f"{datetime.now():%Y%m%d-%H%M%S}_{uuid.uuid4().hex[:8]}"
+                # Waits here while the next stage is full
+                await outbox.put(Batch(seq, data_api, timestamp))
+                seq += 1
+                n_rows += len(data_api['data'])
+        finally:
+            self.fetcher.stop()
+        self.stats["fetch"] = {"batches": seq, "rows": n_rows, "errors": self.fetcher.errors,
+                               "duplicates": self.fetcher.duplicates}
+        await outbox.put(STOP)
+
+    ## Run until max_rows transactions went through every sink (or stop() is called), return the stats
+    async def run_async(self, max_rows: int = None) -> dict:
+
+        self._stop_event = asyncio.Event()
+        try:
+            # docker stop : the intake stops, the batches in flight are still written
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, self.stop)
+        except (NotImplementedError, RuntimeError):
+            pass
+        self.queues = {name: asyncio.Queue(maxsize=self.queue_size)
+                       for name in ("features", "scoring", "archive", "db")}
+        queues = self.queues
+        start_time = time.perf_counter()
+
+        await asyncio.gather(
+            self._fetch_stage(queues["features"], max_rows),
+            run_stage("features", features_stage, queues["features"], [queues["scoring"]],
+                      self.features_concurrency, stats=self.stats),
+            run_stage("scoring", scoring_stage, queues["scoring"], [queues["archive"], queues["db"]],
+                      self.scoring_concurrency, stats=self.stats),
+            run_stage("archive", archive_stage, queues["archive"], [],
+                      self.archive_concurrency, self.archive_ordered, stats=self.stats),
+            run_stage("db", db_stage, queues["db"], [],
+                      self.db_concurrency, self.db_ordered, stats=self.stats))
+
+        elapsed = time.perf_counter() - start_time
+        n_rows = self.stats["db"]["rows"]
+        logging.info(f"✅✅✅ Pipeline en flux : {n_rows} transactions en base en {elapsed:.2f} s "
+                     f"({n_rows / max(elapsed, 1e-9):.1f} transactions/s) 💰💰💰")
+        return self.stats
+
+    def run(self, max_rows: int = None) -> dict:
+
+        return asyncio.run(self.run_async(max_rows))
+
+    ## Stop the intake : batches already fetched still go through every stage (call from the event loop)
+    def stop(self):
+
+        if self._stop_event is not None:
+            self._stop_event.set()
+
+    ## Batches waiting in front of each stage
+    def queue_depths(self) -> dict:
+
+        depths = {name: q.qsize() for name, q in self.queues.items()}
+        depths["fetch"] = self.fetcher.queue_depth
+        return depths
+
+
+if __name__ == "__main__":
+
+    # Load the model and create the table once at startup
+    get_model_registry()
+    ensure_predictions_table_exists()
+    StreamingPipeline().run()
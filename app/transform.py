@@ -1,7 +1,12 @@
 import os
+import uuid
 from datetime import datetime
+from functools import lru_cache
+import numpy as np
 import pandas as pd
-import boto3
+from storage import get_s3_client, S3_BUCKET
+from parquet_sink import get_parquet_sink, SILVER_SCHEMA, GOLD_SCHEMA
+from metrics import timed
 from dotenv import find_dotenv, load_dotenv
 import logging
 
@@ -13,28 +18,16 @@ load_dotenv(env_path, override=True)
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 # === S3 ===
-AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
-AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
-AWS_REGION = os.getenv("AWS_DEFAULT_REGION")
-S3_BUCKET = os.getenv("BUCKET_NAME")
 SILVER_PREFIX = "bloc4/data/silver"
 GOLD_PREFIX = "bloc4/data/gold"
-
-boto3.setup_default_session(
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-    region_name=AWS_REGION)
-
-s3 = boto3.client(
-    "s3",
-    region_name=AWS_REGION,
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY)
+## "parquet" : SILVER / GOLD buffered in partitioned Parquet files, "csv" : one CSV per run
+LAKE_FORMAT = os.getenv("LAKE_FORMAT", "parquet")
 
 # === TRANSFORM function ===
 
-## API's response to Dataframe (after transformation)
-def build_features_from_transaction(data_api: dict) -> pd.DataFrame:
+## API's response to Dataframe (after transformation), built column by column with pandas
+## (reference implementation, used for any layout the compiled schema doesn't handle)
+def build_features_from_frame(data_api: dict) -> pd.DataFrame:
 
     # Convert API's response to Dataframe
     data_api_transaction = data_api['data']
@@ -51,7 +44,71 @@ def build_features_from_transaction(data_api: dict) -> pd.DataFrame:
 
     return features
 
+## Compiled schema of a column layout : (name, position) of the kept columns + position of current_time
+## Resolved once per layout (None : layout left to build_features_from_frame)
+@lru_cache(maxsize=32)
+def feature_schema(columns: tuple):
+
+    if 'current_time' not in columns or 'is_fraud' not in columns or len(set(columns)) != len(columns) \
+            or 'unix_time' in columns or 'trans_date_trans_time' in columns:
+        return None
+    kept = tuple((name, position) for position, name in enumerate(columns) if name not in ('current_time', 'is_fraud'))
+    return kept, columns.index('current_time')
+
+## Raw values -> same column as the pandas path (ints as float64, strings as objects), None if unsure
+def convert_column(values: tuple):
+
+    if isinstance(values[0], str):
+        column = np.empty(len(values), dtype=object)
+        column[:] = values
+        return column
+    column = np.array(values)
+    if column.dtype.kind == 'i':
+        return column.astype("float64")
+    if column.dtype.kind in 'fb':
+        return column
+    return None
+
+## Time in ms -> 'YYYY-MM-DD HH:MM:SS' (sub-second part dropped, like strftime)
+def format_current_time(current_time: np.ndarray) -> np.ndarray:
+
+    seconds = (current_time // 1000).astype("datetime64[s]")
+    formatted = np.empty(len(current_time), dtype=object)
+    formatted[:] = [text.replace('T', ' ') for text in np.datetime_as_string(seconds, unit='s').tolist()]
+    return formatted
+
+## API's response to Dataframe (after transformation)
+## Rows turned into columns in one pass, one DataFrame built at the end (same values and dtypes as the pandas path)
+@timed("build_features_from_transaction", rows=len)
+def build_features_from_transaction(data_api: dict) -> pd.DataFrame:
+
+    rows = data_api['data']
+    schema = feature_schema(tuple(data_api['columns']))
+    if schema is None or not rows:
+        return build_features_from_frame(data_api)
+    kept, time_position = schema
+
+    values = list(zip(*rows))
+    if len(values) != len(data_api['columns']):
+        return build_features_from_frame(data_api)
+
+    features = {}
+    for name, position in kept:
+        column = convert_column(values[position])
+        if column is None:
+            return build_features_from_frame(data_api)
+        features[name] = column
+
+    current_time = np.array(values[time_position])
+    if current_time.dtype.kind != 'i':
+        return build_features_from_frame(data_api)
+    features['unix_time'] = current_time / 1000
+    features['trans_date_trans_time'] = format_current_time(current_time)
+
+    return pd.DataFrame(features, copy=False)
+
 ## Save data (transformed) as SILVER into S3 
+@timed("save_features_to_s3")
 def save_features_to_s3(features_df: pd.DataFrame, timestamp: str) -> str:
 
     # Convert data (transformed) to CSV string
@@ -59,12 +116,12 @@ def save_features_to_s3(features_df: pd.DataFrame, timestamp: str) -> str:
     
     # Create filename identified with timestamp and SILVER_PREFIX
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    silver_file = f"{SILVER_PREFIX}/{timestamp}_transaction.csv" 
+    silver_file = f"{SILVER_PREFIX}/{timestamp}_{uuid.uuid4().hex[:8]}_transaction.csv"
     
     # Upload to S3
     logging.info("🚀 Sauvegarde transaction SILVER dans s3...")
     try:
-        s3.put_object(
+        get_s3_client().put_object(
             Bucket=S3_BUCKET,
             Key=silver_file,
             Body=csv_silver,
@@ -77,20 +134,24 @@ def save_features_to_s3(features_df: pd.DataFrame, timestamp: str) -> str:
         raise e
     
 ## Launch detection model (result within a dataframe)
+@timed("predict_fraud", rows=len)
 def predict_fraud(model, features: pd.DataFrame) -> pd.DataFrame:
 
     preds = model.predict(features)
-    result = features.copy()
+    # Shallow copy : the features (already in the SILVER buffer) are not modified, their data is not copied
+    result = features.copy(deep=False)
     result["classification"] = preds
 
     # Real-time alerting by mail (not configured)
-    if (preds == 1):
-        print("************** Fraud detected! *****************")
+    n_frauds = int((preds == 1).sum())
+    if n_frauds:
+        print(f"************** Fraud detected! ({n_frauds}) *****************")
         print("**** Mail sent to mister.blabla@gmail.com ******")
 
     return result
 
 ## Save transaction with classification (GOLD) to csv file
+@timed("save_predictions_to_s3")
 def save_predictions_to_s3(pred_df: pd.DataFrame, timestamp: str) -> str:
 
     # Convert predicted data to CSV string
@@ -98,12 +159,12 @@ def save_predictions_to_s3(pred_df: pd.DataFrame, timestamp: str) -> str:
 
     # Create filename identified with timestamp and GOLD_PREFIX
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    gold_file = f'{GOLD_PREFIX}/{timestamp}_transaction.csv'
+    gold_file = f'{GOLD_PREFIX}/{timestamp}_{uuid.uuid4().hex[:8]}_transaction.csv'
       
     # Upload to S3
     logging.info("🚀 Sauvegarde transaction GOLD dans s3...")
     try:
-        s3.put_object(
+        get_s3_client().put_object(
             Bucket=S3_BUCKET,
             Key=gold_file,
             Body=csv_gold,
@@ -115,3 +176,12 @@ def save_predictions_to_s3(pred_df: pd.DataFrame, timestamp: str) -> str:
         logging.error(f"❌ Erreur lors de l'enregistrement GOLD sur S3: {e}")
         raise e
 
+## Add data (transformed) to the SILVER Parquet buffer (dt=YYYY-MM-DD/hour=HH, written by batch)
+def add_features_to_silver(features_df: pd.DataFrame):
+
+    get_parquet_sink(SILVER_PREFIX, SILVER_SCHEMA).add(features_df)
+
+## Add transactions with classification to the GOLD Parquet buffer
+def add_predictions_to_gold(pred_df: pd.DataFrame):
+
+    get_parquet_sink(GOLD_PREFIX, GOLD_SCHEMA).add(pred_df)
@@ -1,19 +1,69 @@
+import os
 import time
-from run_pipeline import run_etl_once
+from run_pipeline import run_etl_once, run_etl_batch, run_etl_fetched
+from fetcher import TransactionFetcher
+from stream_pipeline import StreamingPipeline
+from load_model import get_model_registry
+from load import ensure_predictions_table_exists
+from storage import get_uploader
+from metrics import get_metrics, timed, start_metrics_server, start_textfile_exporter, METRICS_PORT, METRICS_TEXTFILE
+from profiling import get_profiler
 import logging
 
 # Log infos
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+## "single" : one transaction per run / "batch" : micro-batches (BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS)
+## "concurrent" : micro-batches fed by FETCH_CONCURRENCY API calls in flight (no sleep between runs)
+## "stream" : staged pipeline, every stage running at the same time (STREAM_* settings)
+WORKER_MODE = os.getenv("WORKER_MODE", "single")
+WORKER_SLEEP = float(os.getenv("WORKER_SLEEP", "20"))
+
 
 if __name__ == "__main__":
 
+    # Stage metrics : /metrics endpoint (METRICS_PORT) and / or textfile for node_exporter (METRICS_TEXTFILE)
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+    if METRICS_TEXTFILE:
+        start_textfile_exporter(METRICS_TEXTFILE)
+    metrics = get_metrics()
+    metrics.register_gauge("etl_queue_depth", "Items waiting in front of a stage", "queue",
+                           lambda: {"s3_upload": get_uploader().queue_depth})
+
+    # Profiling without restart : kill -USR1 <pid> captures the next PROFILE_ITERATIONS runs (PROFILE_* settings)
+    profiler = get_profiler()
+    profiler.install_signal()
+
+    # Load the model and create the table once at startup
+    get_model_registry()
+    ensure_predictions_table_exists()
+
+    if WORKER_MODE == "stream":
+        pipeline = StreamingPipeline()
+        metrics.register_gauge("etl_queue_depth", "Items waiting in front of a stage", "queue", pipeline.queue_depths)
+        profiler.watch()
+        pipeline.run()
+        raise SystemExit(0)
+
+    if WORKER_MODE == "concurrent":
+        fetcher = TransactionFetcher().start()
+        metrics.register_gauge("etl_queue_depth", "Items waiting in front of a stage", "queue",
+                               lambda: {"fetch": fetcher.queue_depth})
+        run_etl = lambda: run_etl_fetched(fetcher)
+    else:
+        run_etl = run_etl_batch if WORKER_MODE == "batch" else run_etl_once
+    # Whole runs, next to the stages
+    run_etl = timed("run_etl")(run_etl)
+
     #while True:
     for i in range(10) : # Limit to 10 iterations for testing
         try:
-            run_etl_once()  # Apply complete ETL
+            with profiler.iteration():
+                run_etl()  # Apply complete ETL
         
         except Exception as e:
-            logging.error(f"❌ Erreur API : pause de 20 secondes avant prochain appel !")
-        # Wait for 20 secondes
-        time.sleep(20)
+            logging.error(f"❌ Erreur API : pause de {WORKER_SLEEP:g} secondes avant prochain appel !")
+        # Wait before next call (20 secondes by default), the fetcher paces itself (FETCH_RATE_LIMIT)
+        if WORKER_MODE != "concurrent":
+            time.sleep(WORKER_SLEEP)
@@ -0,0 +1,66 @@
+# python benchmarks/bench_build_db_rows.py
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+import json
+import time
+import argparse
+import pandas as pd
+from load import build_db_rows, get_is_fraud
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+## Previous row by row implementation (iterrows), kept as reference
+def build_db_rows_iterrows(data_api: dict, pred_df: pd.DataFrame):
+
+    is_fraud = get_is_fraud(data_api)
+    rows = []
+    for i, (_, row) in enumerate(pred_df.iterrows()):
+        rows.append((
+            float(row["cc_num"]), str(row["merchant"]), str(row["category"]), float(row["amt"]),
+            str(row["first"]), str(row["last"]), str(row["gender"]), str(row["street"]),
+            str(row["city"]), str(row["state"]), float(row["zip"]), float(row["lat"]),
+            float(row["long"]), float(row["city_pop"]), str(row["job"]), str(row["dob"]),
+            str(row["trans_num"]), float(row["merch_lat"]), float(row["merch_long"]),
+            float(is_fraud[i]), float(row["unix_time"]), str(row["trans_date_trans_time"]),
+            float(row["classification"])))
+    return rows
+
+## Prediction frame + API response of n_rows transactions shaped like test.json
+def make_batch(n_rows: int):
+
+    with open(os.path.join(ROOT_DIR, "test.json"), encoding="utf-8") as f:
+        records = json.load(f)
+    pred_df = pd.DataFrame([records[i % len(records)] for i in range(n_rows)])
+    pred_df["classification"] = [float(i % 2) for i in range(n_rows)]
+    data_api = {"columns": ["is_fraud"], "data": [[i % 2] for i in range(n_rows)]}
+    return data_api, pred_df
+
+## Best time of several runs
+def best_time(func, data_api, pred_df, repeat: int) -> float:
+
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func(data_api, pred_df)
+        timings.append(time.perf_counter() - start_time)
+    return min(timings)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1,1000,100000")
+    parser.add_argument("--repeat", default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'iterrows (s)':>14} {'columnar (s)':>14} {'speedup':>8}")
+    for n_rows in [int(size) for size in args.sizes.split(",")]:
+        data_api, pred_df = make_batch(n_rows)
+        assert build_db_rows(data_api, pred_df) == build_db_rows_iterrows(data_api, pred_df)
+        old = best_time(build_db_rows_iterrows, data_api, pred_df, int(args.repeat))
+        new = best_time(build_db_rows, data_api, pred_df, int(args.repeat))
+        print(f"{n_rows:>8} {old:>14.6f} {new:>14.6f} {old / new:>7.1f}x")
@@ -0,0 +1,69 @@
+# python benchmarks/bench_build_features.py --data data/fraudTest.csv
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+import time
+import argparse
+import tracemalloc
+import pandas as pd
+from transform import build_features_from_transaction, build_features_from_frame
+
+
+## API responses (same layout as the transactions API) built from the CSV rows
+def make_data_api(data: pd.DataFrame) -> dict:
+
+    api = data.drop(columns=["unix_time", "trans_date_trans_time"])
+    api["current_time"] = data["unix_time"].astype("int64") * 1000 + 123
+    return {"columns": list(api.columns), "index": list(range(len(api))), "data": api.values.tolist()}
+
+## Best time of several runs
+def best_time(func, data, repeat: int) -> float:
+
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func(data)
+        timings.append(time.perf_counter() - start_time)
+    return min(timings)
+
+## Peak of the memory allocated by one run
+def peak_memory(func, data) -> int:
+
+    tracemalloc.start()
+    func(data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", default="data/fraudTest.csv")
+    parser.add_argument("--sizes", default="1,100,10000,100000")
+    parser.add_argument("--repeat", default=5)
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.data, index_col=0)
+    # Rows as the API sends them : python ints / floats / str
+    rows = make_data_api(data)
+
+    repeat = int(args.repeat)
+    print(f"{'rows':>8} {'pandas (ms)':>12} {'schema (ms)':>12} {'speedup':>8} {'pandas peak (MB)':>17} {'schema peak (MB)':>17}")
+    for n_rows in [int(size) for size in args.sizes.split(",")]:
+        # Sizes above the file : rows repeated
+        data_rows = (rows["data"] * (n_rows // len(rows["data"]) + 1))[:n_rows]
+        data_api = {"columns": rows["columns"], "index": list(range(n_rows)), "data": data_rows}
+
+        # Same DataFrame, value for value and dtype for dtype
+        pd.testing.assert_frame_equal(build_features_from_transaction(data_api), build_features_from_frame(data_api),
+                                      check_exact=True)
+
+        old = best_time(build_features_from_frame, data_api, repeat)
+        new = best_time(build_features_from_transaction, data_api, repeat)
+        old_peak = peak_memory(build_features_from_frame, data_api)
+        new_peak = peak_memory(build_features_from_transaction, data_api)
+        print(f"{n_rows:>8} {old * 1000:>12.3f} {new * 1000:>12.3f} {old / new:>7.1f}x "
+              f"{old_peak / 1e6:>17.2f} {new_peak / 1e6:>17.2f}")
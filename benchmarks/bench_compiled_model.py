@@ -0,0 +1,61 @@
+# python benchmarks/bench_compiled_model.py --data data/fraudTest.csv
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from load_model import load_mlflow_model, MLFLOW_TRACKING_URI, MODEL_URI
+from compiled_model import compile_pipeline
+
+
+## Best time of several runs
+def best_time(func, data, repeat: int) -> float:
+
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func(data)
+        timings.append(time.perf_counter() - start_time)
+    return min(timings)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", default="data/fraudTest.csv")
+    parser.add_argument("--model-uri", default=MODEL_URI)
+    parser.add_argument("--sizes", default="1,10,100,1000,10000")
+    parser.add_argument("--repeat", default=5)
+    args = parser.parse_args()
+
+    model = load_mlflow_model(MLFLOW_TRACKING_URI, args.model_uri)
+    start_time = time.perf_counter()
+    compiled = compile_pipeline(model)
+    print(f"compilation  : {(time.perf_counter() - start_time) * 1000:.1f} ms, "
+          f"{len(compiled.roots)} arbres, {len(compiled.feature)} noeuds")
+
+    data = pd.read_csv(args.data, index_col=0)
+    data = data.astype({col: "float64" for col in data.select_dtypes(include=["int"]).columns})
+    X = data.drop(columns=["is_fraud"])
+    records = X.to_dict("records")
+
+    # Same predictions on the whole file (DataFrame and dict records)
+    expected = model.predict_proba(X)
+    assert np.array_equal(compiled.predict_proba(X), expected), "❌ Probabilités différentes (DataFrame)"
+    assert np.array_equal(compiled.predict_proba(records), expected), "❌ Probabilités différentes (dicts)"
+    assert np.array_equal(compiled.predict(X), model.predict(X)), "❌ Classes différentes"
+    print(f"✅ {len(X)} transactions : prédictions identiques à sklearn")
+
+    repeat = int(args.repeat)
+    print(f"{'rows':>8} {'sklearn (ms)':>14} {'compiled df (ms)':>17} {'compiled dicts (ms)':>20} {'speedup':>8}")
+    for n_rows in [int(size) for size in args.sizes.split(",")] + [len(X)]:
+        frame, dicts = X.iloc[:n_rows], records[:n_rows]
+        old = best_time(model.predict_proba, frame, repeat)
+        new_frame = best_time(compiled.predict_proba, frame, repeat)
+        new_dicts = best_time(compiled.predict_proba, dicts, repeat)
+        print(f"{n_rows:>8} {old * 1000:>14.3f} {new_frame * 1000:>17.3f} {new_dicts * 1000:>20.3f} "
+              f"{old / min(new_frame, new_dicts):>7.1f}x")
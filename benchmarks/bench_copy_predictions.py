@@ -0,0 +1,59 @@
+# BACKEND_STORE_URI=postgresql://... python benchmarks/bench_copy_predictions.py
+# To be run against a local PostgreSQL (rows are written then deleted from public.transactions)
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+import time
+import argparse
+from load import (
+    ensure_predictions_table_exists,
+    build_db_rows,
+    insert_predictions,
+    copy_predictions,
+    get_pg_pool)
+from bench_build_db_rows import make_batch
+
+BENCH_MERCHANT = "BENCH_COPY_PREDICTIONS"
+
+
+def delete_bench_rows():
+
+    get_pg_pool().run(lambda cur: cur.execute("DELETE FROM public.transactions WHERE merchant = %s", (BENCH_MERCHANT,)))
+
+## execute_values path (rows built as tuples)
+def load_with_insert(data_api, pred_df):
+
+    insert_predictions(build_db_rows(data_api=data_api, pred_df=pred_df))
+
+## COPY path (forced, whatever the batch size)
+def load_with_copy(data_api, pred_df, chunk_size):
+
+    copy_predictions(data_api, pred_df, chunk_size=chunk_size, min_rows=0)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10,1000,100000")
+    parser.add_argument("--chunk_size", default=50000)
+    args = parser.parse_args()
+
+    ensure_predictions_table_exists()
+    print(f"{'rows':>8} {'execute_values (s)':>20} {'COPY (s)':>10} {'speedup':>8}")
+    for n_rows in [int(size) for size in args.sizes.split(",")]:
+        data_api, pred_df = make_batch(n_rows)
+        pred_df["merchant"] = BENCH_MERCHANT
+
+        start_time = time.perf_counter()
+        load_with_insert(data_api, pred_df)
+        insert_time = time.perf_counter() - start_time
+        delete_bench_rows()
+
+        start_time = time.perf_counter()
+        load_with_copy(data_api, pred_df, int(args.chunk_size))
+        copy_time = time.perf_counter() - start_time
+        delete_bench_rows()
+
+        print(f"{n_rows:>8} {insert_time:>20.4f} {copy_time:>10.4f} {insert_time / copy_time:>7.1f}x")
@@ -0,0 +1,273 @@
+# python benchmarks/bench_etl.py --sizes 1,100,10000,100000
+# Every ETL stage against local stand-ins : local HTTP API, moto S3, local PostgreSQL (BACKEND_STORE_URI),
+# local model (--model-uri, or a small pipeline trained on the synthetic transactions).
+# Results compared with benchmarks/baseline_etl.json (--save-baseline to replace it).
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+# moto S3 : fake credentials, never the real bucket
+os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+os.environ.pop("S3_ENDPOINT_URL", None)
+
+import io
+import gc
+import json
+import time
+import platform
+import argparse
+import threading
+import contextlib
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy as np
+import pandas as pd
+import boto3
+from moto import mock_aws
+import storage
+import extract
+import transform
+from extract import get_api
+from transform import build_features_from_transaction, predict_fraud, save_features_to_s3, save_predictions_to_s3
+from load import ensure_predictions_table_exists, build_db_rows, insert_predictions, copy_predictions, get_pg_pool
+import logging
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT_DIR, "benchmarks", "baseline_etl.json")
+BENCH_BUCKET = "bloc4-bench-bucket"
+BENCH_MERCHANT = "BENCH_ETL"
+
+## Fields of the transactions API : test.json records, with is_fraud and the time in ms (current_time)
+with open(os.path.join(ROOT_DIR, "test.json"), encoding="utf-8") as f:
+    RECORDS = json.load(f)
+COLUMNS = [col for col in RECORDS[0] if col not in ("unix_time", "trans_date_trans_time")] + ["is_fraud", "current_time"]
+## Categories of test.json only (known by every model trained on the dataset)
+CATEGORIES = sorted({record["category"] for record in RECORDS})
+
+
+## API response of n_rows transactions shaped like test.json (random amounts, categories, times, trans_num)
+def make_data_api(n_rows: int, seed: int = 0) -> dict:
+
+    rng = np.random.default_rng(seed)
+    amt = rng.gamma(2.0, 60.0, n_rows).round(2).tolist()
+    category = rng.choice(CATEGORIES, n_rows).tolist()
+    current_time = (1735689600000 + rng.integers(0, 365 * 86400 * 1000, n_rows)).tolist()
+    is_fraud = (rng.random(n_rows) < 0.05).astype(int).tolist()
+
+    data = []
+    for i in range(n_rows):
+        record = dict(RECORDS[i % len(RECORDS)], amt=amt[i], category=category[i], trans_num=f"{seed:08x}{i:024x}",
+                      is_fraud=is_fraud[i], current_time=current_time[i])
+        data.append([record[col] for col in COLUMNS])
+    return {"columns": COLUMNS, "index": list(range(n_rows)), "data": data}
+
+## Small pipeline with the layout of train/train.py, trained on the synthetic transactions (no MLflow needed)
+def train_local_model(n_rows: int = 5000):
+
+    from sklearn.compose import ColumnTransformer
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import FunctionTransformer, OneHotEncoder, StandardScaler
+    from features import features_engineering
+
+    features = build_features_from_transaction(make_data_api(n_rows, seed=1))
+    labels = pd.Series(features["amt"] > 300).astype(int)
+    engineered = features_engineering(features)
+    categorical_features = engineered.select_dtypes("object").columns
+    numeric_features = engineered.columns[~engineered.columns.isin(categorical_features)]
+    model = Pipeline(steps=[
+        ("Features_engineering", FunctionTransformer(features_engineering)),
+        ("Features_transforming", ColumnTransformer(transformers=[
+            ("categorical_transformer", OneHotEncoder(drop='first'), categorical_features),
+            ("numeric_transformer", StandardScaler(), numeric_features)])),
+        ("Classifier", RandomForestClassifier(n_estimators=5, min_samples_split=4, random_state=42))])
+    return model.fit(features, labels)
+
+
+# === Local stand-in of the transactions API : the same payload (n_rows transactions) on every call ===
+class LocalAPI:
+
+    def __init__(self):
+
+        self.payload = b""
+        local_api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                body = local_api.payload
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    ## JSON encoded in a JSON string, like the real API
+    def serve(self, data_api: dict):
+
+        self.payload = json.dumps(json.dumps(data_api)).encode("utf-8")
+
+    def close(self):
+
+        self.server.shutdown()
+        self.server.server_close()
+
+
+## Run func `repeat` times (after one warm-up call), cleanup after each call (not timed)
+def measure(func, repeat: int, cleanup=None) -> list:
+
+    func()
+    if cleanup:
+        cleanup()
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start_time = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start_time)
+        if cleanup:
+            cleanup()
+    return timings
+
+## Latency percentiles (ms) and throughput (transactions/s at the median latency)
+def summarize(timings: list, n_rows: int) -> dict:
+
+    timings_ms = np.array(timings) * 1000
+    p50, p95, p99 = np.percentile(timings_ms, [50, 95, 99])
+    return {"runs": len(timings), "p50_ms": round(float(p50), 4), "p95_ms": round(float(p95), 4),
+            "p99_ms": round(float(p99), 4), "mean_ms": round(float(timings_ms.mean()), 4),
+            "rows_per_s": round(n_rows / (p50 / 1000), 1)}
+
+## Stages slower than the baseline (median latency above baseline * (1 + tolerance))
+def compare_with_baseline(results: dict, baseline: dict, tolerance: float) -> list:
+
+    regressions = []
+    for stage, by_size in results.items():
+        for size, current in by_size.items():
+            previous = baseline.get(stage, {}).get(size)
+            if previous and current["p50_ms"] > previous["p50_ms"] * (1 + tolerance):
+                regressions.append((stage, size, previous["p50_ms"], current["p50_ms"]))
+    return regressions
+
+
+## Every stage at one batch size : {stage: summary}
+def bench_size(n_rows: int, api: LocalAPI, model, use_db: bool, repeat: int) -> dict:
+
+    data_api = make_data_api(n_rows)
+    api.serve(data_api)
+    features = build_features_from_transaction(data_api)
+    pred_df = predict_fraud(model, features)
+    # Rows written to the database are tagged, then deleted after each run
+    db_pred_df = pred_df.assign(merchant=BENCH_MERCHANT)
+    rows = build_db_rows(data_api, db_pred_df)
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+
+    stages = {
+        "get_api": (lambda: get_api(api.url), None),
+        "build_features_from_transaction": (lambda: build_features_from_transaction(data_api), None),
+        "predict_fraud": (lambda: predict_fraud(model, features), None),
+        "build_db_rows": (lambda: build_db_rows(data_api, db_pred_df), None),
+        "save_data_api_to_s3": (lambda: extract.save_data_api_to_s3(data_api, timestamp), None),
+        "save_features_to_s3": (lambda: save_features_to_s3(features, timestamp), None),
+        "save_predictions_to_s3": (lambda: save_predictions_to_s3(pred_df, timestamp), None)}
+    if use_db:
+        stages["insert_predictions"] = (lambda: insert_predictions(rows), delete_bench_rows)
+        stages["copy_predictions"] = (lambda: copy_predictions(data_api, db_pred_df), delete_bench_rows)
+
+    return {stage: summarize(measure(func, repeat, cleanup), n_rows) for stage, (func, cleanup) in stages.items()}
+
+def delete_bench_rows():
+
+    get_pg_pool().run(lambda cur: cur.execute("DELETE FROM public.transactions WHERE merchant = %s", (BENCH_MERCHANT,)))
+
+## PostgreSQL reachable (BACKEND_STORE_URI) : database stages are measured, skipped otherwise
+def database_available() -> bool:
+
+    if not os.getenv("BACKEND_STORE_URI"):
+        return False
+    try:
+        ensure_predictions_table_exists()
+        delete_bench_rows()
+        return True
+    except Exception as e:
+        print(f"⚠️ PostgreSQL injoignable, étapes base de données ignorées ({e})")
+        return False
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1,100,10000,100000")
+    parser.add_argument("--repeat", default=50, help="runs per stage (fewer for large batches, see --rows-budget)")
+    parser.add_argument("--rows-budget", default=300000, help="max transactions per stage and batch size")
+    parser.add_argument("--model-uri", default=os.getenv("MODEL_URI"), help="MLflow URI or local model directory")
+    parser.add_argument("--output", default=None, help="JSON file for the results")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", default=0.25, help="regression if p50 > baseline p50 * (1 + tolerance)")
+    args = parser.parse_args()
+
+    # Stage logs (one per call) left out of the timings
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if args.model_uri:
+        import mlflow.sklearn
+        model = mlflow.sklearn.load_model(args.model_uri)
+    else:
+        model = train_local_model()
+    use_db = database_available()
+
+    with mock_aws():
+        storage._s3_client = None
+        extract.S3_BUCKET = transform.S3_BUCKET = BENCH_BUCKET
+        boto3.client("s3", region_name=storage.AWS_REGION).create_bucket(
+            Bucket=BENCH_BUCKET, CreateBucketConfiguration={"LocationConstraint": storage.AWS_REGION})
+        api = LocalAPI()
+
+        results = {}
+        print(f"{'stage':<32} {'rows':>8} {'runs':>5} {'p50 (ms)':>11} {'p95 (ms)':>11} {'p99 (ms)':>11} {'rows/s':>12}")
+        try:
+            for n_rows in [int(size) for size in args.sizes.split(",")]:
+                repeat = max(3, min(int(args.repeat), int(args.rows_budget) // n_rows))
+                # Fraud alerts printed by predict_fraud left out of the report
+                with contextlib.redirect_stdout(io.StringIO()):
+                    summaries = bench_size(n_rows, api, model, use_db, repeat)
+                for stage, summary in summaries.items():
+                    results.setdefault(stage, {})[str(n_rows)] = summary
+                    print(f"{stage:<32} {n_rows:>8} {summary['runs']:>5} {summary['p50_ms']:>11.3f} "
+                          f"{summary['p95_ms']:>11.3f} {summary['p99_ms']:>11.3f} {summary['rows_per_s']:>12.1f}")
+        finally:
+            api.close()
+
+    report = {"machine": {"python": platform.python_version(), "platform": platform.platform(),
+                          "cpus": os.cpu_count(), "date": datetime.now().isoformat(timespec="seconds"),
+                          "model": args.model_uri or "local"},
+              "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Référence enregistrée dans {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline["results"], float(args.tolerance))
+        for stage, size, previous, current in regressions:
+            print(f"❌ {stage} ({size} lignes) : p50 {previous:.3f} ms -> {current:.3f} ms")
+        if regressions:
+            sys.exit(1)
+        print(f"✅ Aucune régression par rapport à {args.baseline} (référence du {baseline['machine']['date']})")
@@ -0,0 +1,123 @@
+import os
+import time
+import asyncio
+from metrics import Histogram
+
+# === Dynamic batching : concurrent requests scored together in one model call ===
+## A batch is scored as soon as it holds SCORING_MAX_BATCH_SIZE transactions or its first request waited SCORING_MAX_WAIT_MS
+SCORING_MAX_BATCH_SIZE = int(os.getenv("SCORING_MAX_BATCH_SIZE", "64"))
+SCORING_MAX_WAIT_MS = float(os.getenv("SCORING_MAX_WAIT_MS", "2"))
+## Batches scored at the same time (1 : the GIL serializes most of predict_proba, larger batches pay more)
+SCORING_BATCH_CONCURRENCY = int(os.getenv("SCORING_BATCH_CONCURRENCY", "1"))
+
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024]
+WAIT_MS_BUCKETS = [0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100, 250]
+
+
+## Histogram of app/metrics.py as JSON : {"buckets": {"bound": cumulative count}, "count", "sum", "mean"}
+def histogram_json(histogram: Histogram) -> dict:
+
+    snapshot = histogram.snapshot()
+    return {**snapshot, "buckets": {str(bound): total for bound, total in snapshot["buckets"]}}
+
+
+class DynamicBatcher:
+
+    def __init__(self, score, get_model, executor, workers: int = SCORING_BATCH_CONCURRENCY,
+                 max_batch_size: int = SCORING_MAX_BATCH_SIZE, max_wait_ms: float = SCORING_MAX_WAIT_MS):
+
+        self.score = score
+        self.get_model = get_model
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+        self.wait_ms = Histogram(WAIT_MS_BUCKETS)
+        self._queue = asyncio.Queue()
+        # Batches scored at the same time : while every worker is busy, the next batch keeps growing
+        self._slots = asyncio.Semaphore(workers)
+        self._task = None
+        self._scoring = set()
+
+    def start(self):
+
+        self._task = asyncio.get_running_loop().create_task(self._collect())
+        return self
+
+    async def stop(self):
+
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._scoring:
+            await asyncio.gather(*self._scoring, return_exceptions=True)
+
+    ## Score the transactions of one request (waits for the batch it joined)
+    async def submit(self, transactions: list) -> list:
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((transactions, future, time.perf_counter()))
+        return await future
+
+    ## Requests queued : the first one opens a batch, closed when full or after max_wait
+    async def _collect(self):
+
+        while True:
+            # Wait for a free worker first : requests arriving meanwhile join the next batch
+            await self._slots.acquire()
+            request = await self._queue.get()
+            requests = [request]
+            n_rows = len(request[0])
+            deadline = request[2] + self.max_wait
+            while n_rows < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                try:
+                    request = self._queue.get_nowait() if timeout <= 0 else \
+                        await asyncio.wait_for(self._queue.get(), timeout)
+                except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                    break
+                requests.append(request)
+                n_rows += len(request[0])
+
+            task = asyncio.get_running_loop().create_task(self._score_batch(requests))
+            self._scoring.add(task)
+            task.add_done_callback(self._scoring.discard)
+
+    ## One model call for the whole batch, results handed back to each request
+    async def _score_batch(self, requests: list):
+
+        try:
+            start_time = time.perf_counter()
+            transactions = [t for request in requests for t in request[0]]
+            self.batch_size.observe(len(transactions))
+            for _, _, enqueue_time in requests:
+                self.wait_ms.observe((start_time - enqueue_time) * 1000)
+
+            loop = asyncio.get_running_loop()
+            try:
+                predictions = await loop.run_in_executor(self.executor, self.score, self.get_model(), transactions)
+            except Exception as e:
+                for _, future, _ in requests:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            position = 0
+            for request_transactions, future, _ in requests:
+                if not future.done():
+                    future.set_result(predictions[position:position + len(request_transactions)])
+                position += len(request_transactions)
+        finally:
+            self._slots.release()
+
+    def metrics(self) -> dict:
+
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": self._queue.qsize(),
+            "batch_size": histogram_json(self.batch_size),
+            "wait_ms": histogram_json(self.wait_ms)}
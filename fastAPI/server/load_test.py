@@ -0,0 +1,64 @@
+# python fastAPI/server/load_test.py --url http://localhost:8000 --requests 2000 --concurrency 16
+
+import os
+import json
+import time
+import asyncio
+import argparse
+import numpy as np
+import httpx
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+## Send n_requests (concurrency at a time), return the latency of each call in seconds
+async def run_load(url: str, records: list, n_requests: int, concurrency: int, batch_size: int) -> list:
+
+    endpoint = f"{url}/predict" if batch_size == 0 else f"{url}/predict/batch"
+    latencies = []
+    counter = iter(range(n_requests))
+
+    async def client_loop(client: httpx.AsyncClient):
+
+        for i in counter:
+            if batch_size == 0:
+                payload = records[i % len(records)]
+            else:
+                payload = [records[(i + j) % len(records)] for j in range(batch_size)]
+            start_time = time.perf_counter()
+            response = await client.post(endpoint, json=payload)
+            latencies.append(time.perf_counter() - start_time)
+            response.raise_for_status()
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        await asyncio.gather(*[client_loop(client) for _ in range(concurrency)])
+    return latencies
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--requests", default=1000)
+    parser.add_argument("--concurrency", default=8)
+    parser.add_argument("--batch-size", default=0, help="0 : /predict, N : /predict/batch with N transactions")
+    parser.add_argument("--warmup", default=50)
+    args = parser.parse_args()
+
+    with open(os.path.join(ROOT_DIR, "test.json"), encoding="utf-8") as f:
+        records = json.load(f)
+    batch_size = int(args.batch_size)
+
+    asyncio.run(run_load(args.url, records, int(args.warmup), int(args.concurrency), batch_size))
+    start_time = time.perf_counter()
+    latencies = asyncio.run(run_load(args.url, records, int(args.requests), int(args.concurrency), batch_size))
+    elapsed = time.perf_counter() - start_time
+
+    latencies_ms = np.array(latencies) * 1000
+    n_transactions = len(latencies) * max(batch_size, 1)
+    print(f"requests     : {len(latencies)} ({args.concurrency} concurrent, batch size {batch_size or 1})")
+    print(f"throughput   : {len(latencies) / elapsed:.1f} req/s, {n_transactions / elapsed:.1f} transactions/s")
+    for name, q in [("p50", 50), ("p90", 90), ("p99", 99)]:
+        print(f"latency {name:<4} : {np.percentile(latencies_ms, q):.2f} ms")
+    print(f"latency max  : {latencies_ms.max():.2f} ms")
@@ -0,0 +1,184 @@
+import os
+import sys
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+from dotenv import find_dotenv, load_dotenv
+import logging
+
+# Model loading is shared with the ETL (app/load_model.py, app/model_cache.py)
+APP_DIR = os.getenv("APP_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "app"))
+sys.path.append(APP_DIR)
+from load_model import get_model_registry
+from compiled_model import compile_pipeline, CompiledForest
+from batcher import DynamicBatcher
+
+# Charger le .env
+env_path = find_dotenv()
+load_dotenv(env_path, override=True)
+
+# Log infos
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# === Scoring service ===
+## Threads running model.predict_proba (the event loop only parses requests and answers)
+SCORING_WORKERS = int(os.getenv("SCORING_WORKERS", "4"))
+## Max transactions in one /predict/batch call
+SCORING_MAX_BATCH = int(os.getenv("SCORING_MAX_BATCH", "10000"))
+## Concurrent requests coalesced into one model call (SCORING_MAX_BATCH_SIZE, SCORING_MAX_WAIT_MS)
+SCORING_BATCHING = os.getenv("SCORING_BATCHING", "true").lower() == "true"
+## Score with the compiled forest (app/compiled_model.py, same predictions, no pandas / sklearn overhead)
+SCORING_COMPILED = os.getenv("SCORING_COMPILED", "true").lower() == "true"
+
+
+## One transaction, as in test.json (fields expected by the model pipeline)
+class Transaction(BaseModel):
+    cc_num: float
+    merchant: str
+    category: str
+    amt: float
+    first: str
+    last: str
+    gender: str
+    street: str
+    city: str
+    state: str
+    zip: float
+    lat: float
+    long: float
+    city_pop: float
+    job: str
+    dob: str
+    trans_num: str
+    merch_lat: float
+    merch_long: float
+    unix_time: float
+    trans_date_trans_time: str
+
+class Prediction(BaseModel):
+    trans_num: str
+    classification: int
+    probability: float
+
+class BatchPrediction(BaseModel):
+    model_version: str | None
+    predictions: list[Prediction]
+
+TRANSACTION_COLUMNS = list(Transaction.model_fields)
+
+## Scored once at startup, so that the first client doesn't pay the warm-up
+WARMUP_TRANSACTION = Transaction(
+    cc_num=3538520143479972.0, merchant="fraud_Heaney-Marquardt", category="entertainment", amt=5.38,
+    first="Cassandra", last="Nunez", gender="F", street="9572 Austin Forge Suite 612", city="Clay Center",
+    state="OH", zip=43408.0, lat=41.5686, long=-83.3632, city_pop=269.0, job="Insurance underwriter",
+    dob="1965-09-15", trans_num="warmup", merch_lat=41.534246, merch_long=-83.786492,
+    unix_time=1765483557.381, trans_date_trans_time="2025-12-11 20:05:57")
+
+
+## Fraud probability and class of each transaction (run in the scoring threads)
+## classification = class of highest probability, same as model.predict, without scoring twice
+def score(model, transactions: list[Transaction]) -> list[Prediction]:
+
+    if isinstance(model, CompiledForest):
+        probabilities = model.predict_proba([t.model_dump() for t in transactions])
+    else:
+        features = pd.DataFrame([[getattr(t, col) for col in TRANSACTION_COLUMNS] for t in transactions],
+                                columns=TRANSACTION_COLUMNS)
+        probabilities = model.predict_proba(features)
+    classes = model.classes_[np.argmax(probabilities, axis=1)]
+    fraud_column = list(model.classes_).index(1)
+    return [
+        Prediction(trans_num=t.trans_num, classification=int(c), probability=float(p))
+        for t, c, p in zip(transactions, classes, probabilities[:, fraud_column])]
+
+_scoring_model = None
+_scoring_lock = threading.Lock()
+
+## Compiled forest of each new model, built in the registry's loading thread when the model is swapped
+## (never on the event loop), sklearn Pipeline if it can't be compiled
+def prepare_scoring_model(version, model):
+
+    global _scoring_model
+    scoring_model = model
+    if SCORING_COMPILED:
+        try:
+            scoring_model = compile_pipeline(model)
+        except Exception as e:
+            logging.warning(f"⚠️ Modèle version {version} non compilable, scoring avec sklearn : {e}")
+    with _scoring_lock:
+        _scoring_model = scoring_model
+
+## Model used for scoring (compiled once per model version)
+def get_scoring_model():
+
+    with _scoring_lock:
+        return _scoring_model
+
+
+## Model loaded once at startup (kept in memory, swapped when the 'production' alias moves)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+
+    app.state.registry = get_model_registry()
+    app.state.registry.add_listener(prepare_scoring_model)
+    app.state.executor = ThreadPoolExecutor(max_workers=SCORING_WORKERS, thread_name_prefix="scoring")
+    app.state.executor.submit(score, get_scoring_model(), [WARMUP_TRANSACTION]).result()
+    app.state.batcher = None
+    if SCORING_BATCHING:
+        app.state.batcher = DynamicBatcher(score, get_scoring_model, app.state.executor).start()
+    logging.info(f"✅ Service de scoring prêt (modèle version {app.state.registry.version})")
+    yield
+    if app.state.batcher is not None:
+        await app.state.batcher.stop()
+    app.state.executor.shutdown(wait=True)
+
+app = FastAPI(title="Fraud detection - scoring", lifespan=lifespan)
+
+
+async def run_scoring(transactions: list[Transaction]) -> list[Prediction]:
+
+    model = get_scoring_model()
+    if model is None:
+        raise HTTPException(status_code=503, detail="Modèle non chargé")
+    if app.state.batcher is not None:
+        return await app.state.batcher.submit(transactions)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(app.state.executor, score, model, transactions)
+
+@app.get("/health")
+async def health():
+
+    return {"status": "ok", "model_version": app.state.registry.version}
+
+## Batch sizes and waiting times of the dynamic batcher
+@app.get("/metrics/batching")
+async def batching_metrics():
+
+    if app.state.batcher is None:
+        return {"enabled": False}
+    return {"enabled": True, **app.state.batcher.metrics()}
+
+@app.post("/predict", response_model=Prediction)
+async def predict(transaction: Transaction):
+
+    predictions = await run_scoring([transaction])
+    return predictions[0]
+
+@app.post("/predict/batch", response_model=BatchPrediction)
+async def predict_batch(transactions: list[Transaction]):
+
+    if len(transactions) > SCORING_MAX_BATCH:
+        raise HTTPException(status_code=413, detail=f"Au plus {SCORING_MAX_BATCH} transactions par appel")
+    predictions = await run_scoring(transactions) if transactions else []
+    return BatchPrediction(model_version=app.state.registry.version, predictions=predictions)
+
+
+if __name__ == "__main__":
+
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", "8000")))
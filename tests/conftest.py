@@ -0,0 +1,81 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+import json
+import boto3
+import numpy as np
+import pandas as pd
+import pytest
+from moto import mock_aws
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import FunctionTransformer, OneHotEncoder, StandardScaler
+from features import features_engineering
+import storage
+import transform
+
+TEST_BUCKET = "bloc4-test-bucket"
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CATEGORIES = ["entertainment", "gas_transport", "grocery_pos", "misc_pos", "shopping_net", "travel"]
+
+
+## Transactions shaped like test.json (random amounts, dates, places and categories) + label
+def make_transactions(n_rows: int, seed: int = 0) -> pd.DataFrame:
+
+    with open(os.path.join(ROOT_DIR, "test.json"), encoding="utf-8") as f:
+        records = json.load(f)
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame([records[i % len(records)] for i in range(n_rows)])
+    data["category"] = rng.choice(CATEGORIES, n_rows)
+    data["amt"] = rng.gamma(2.0, 60.0, n_rows).round(2)
+    data["cc_num"] = rng.choice([4.65e15, 3.5e15, 6.0e11, 2.3e13], n_rows)
+    data["merch_lat"] = data["lat"] + rng.normal(0, 0.8, n_rows)
+    data["merch_long"] = data["long"] + rng.normal(0, 0.8, n_rows)
+    trans_time = pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 365 * 86400, n_rows), unit="s")
+    data["trans_date_trans_time"] = trans_time.strftime("%Y-%m-%d %H:%M:%S")
+    data["is_fraud"] = ((data["amt"] > 200) & (trans_time.hour < 6)).astype(int) | (rng.random(n_rows) < 0.05)
+    return data
+
+## Same layout as train/train.py
+def train_pipeline(data: pd.DataFrame) -> Pipeline:
+
+    engineered = features_engineering(data.drop(columns="is_fraud"))
+    categorical_features = engineered.select_dtypes("object").columns
+    numeric_features = engineered.columns[~engineered.columns.isin(categorical_features)]
+    model = Pipeline(steps=[
+        ("Features_engineering", FunctionTransformer(features_engineering)),
+        ("Features_transforming", ColumnTransformer(transformers=[
+            ("categorical_transformer", OneHotEncoder(drop='first'), categorical_features),
+            ("numeric_transformer", StandardScaler(), numeric_features)])),
+        ("Classifier", RandomForestClassifier(n_estimators=7, min_samples_split=4, random_state=42))])
+    return model.fit(data.drop(columns="is_fraud"), data["is_fraud"])
+
+
+@pytest.fixture(scope="session")
+def trained_pipeline():
+    """
+    Pipeline au format de train/train.py, entraîné une fois sur 3000 transactions générées
+    """
+    return train_pipeline(make_transactions(3000))
+
+
+@pytest.fixture
+def s3_bucket(monkeypatch):
+    """
+    S3 local (moto) : bucket de test + client partagé recréé dans le mock
+    """
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with mock_aws():
+        monkeypatch.setattr(storage, "_s3_client", None)
+        monkeypatch.setattr(storage, "AWS_ACCESS_KEY_ID", "testing")
+        monkeypatch.setattr(storage, "AWS_SECRET_ACCESS_KEY", "testing")
+        monkeypatch.setattr(storage, "S3_ENDPOINT_URL", None)
+        monkeypatch.setattr(transform, "S3_BUCKET", TEST_BUCKET)
+        client = boto3.client("s3", region_name=storage.AWS_REGION)
+        client.create_bucket(Bucket=TEST_BUCKET, CreateBucketConfiguration={"LocationConstraint": storage.AWS_REGION})
+        yield client
@@ -0,0 +1,75 @@
+import os
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+## Fields of the transactions API : test.json records, with is_fraud and the time in ms (current_time)
+with open(os.path.join(ROOT_DIR, "test.json"), encoding="utf-8") as f:
+    RECORDS = json.load(f)
+COLUMNS = [col for col in RECORDS[0] if col not in ("unix_time", "trans_date_trans_time")] + ["is_fraud", "current_time"]
+
+
+# === Local stand-in of the transactions API (JSON encoded in a JSON string, like the real one) ===
+class FakeTransactionAPI:
+
+    def __init__(self, latency: float = 0.0, unique: bool = True):
+
+        self.latency = latency
+        self.unique = unique
+        self.requests = 0
+        # Calls being answered right now, and the most seen at the same time
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        fake_api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                body = fake_api.next_payload()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+
+    ## One transaction per call : test.json records in turn, with a new trans_num if unique
+    def next_payload(self) -> bytes:
+
+        with self._lock:
+            number = self.requests
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.in_flight -= 1
+        record = dict(RECORDS[number % len(RECORDS)])
+        if self.unique:
+            record["trans_num"] = f"{record['trans_num'][:24]}{number:08x}"
+        record["is_fraud"] = number % 2
+        record["current_time"] = int(record["unix_time"] * 1000)
+        data_api = {"columns": COLUMNS, "index": [number], "data": [[record[col] for col in COLUMNS]]}
+        return json.dumps(json.dumps(data_api)).encode("utf-8")
+
+    def __enter__(self):
+
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+
+        self.server.shutdown()
+        self.server.server_close()
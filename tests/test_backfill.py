@@ -0,0 +1,169 @@
+# pytest tests/test_backfill.py
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+import json
+import gzip
+import pytest
+import pandas as pd
+from datetime import datetime
+from backfill import backfill_csv, backfill_raw
+from compact import compact
+from extract import RAW_PREFIX
+from load import pg_connect
+from fake_api import RECORDS, COLUMNS
+from conftest import TEST_BUCKET, CATEGORIES, make_transactions
+import logging
+
+# Log infos
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+BACKFILL_MERCHANT = "TEST_BACKFILL_PYTEST"
+
+
+def loaded_predictions() -> dict:
+
+    conn = pg_connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT trans_num, classification FROM public.transactions WHERE merchant = %s",
+                        (BACKFILL_MERCHANT,))
+            return dict(cur.fetchall())
+    finally:
+        conn.close()
+
+def count_predictions() -> int:
+
+    conn = pg_connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM public.transactions WHERE merchant = %s", (BACKFILL_MERCHANT,))
+            return cur.fetchone()[0]
+    finally:
+        conn.close()
+
+def delete_predictions():
+
+    conn = pg_connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM public.transactions WHERE merchant = %s", (BACKFILL_MERCHANT,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+## fraudTest.csv layout (is_fraud last), transactions of BACKFILL_MERCHANT
+def write_history_csv(path, n_rows: int) -> pd.DataFrame:
+
+    data = make_transactions(n_rows, seed=3)
+    data["merchant"] = BACKFILL_MERCHANT
+    data["trans_num"] = [f"backfill{i:024d}" for i in range(len(data))]
+    data = data[[col for col in data.columns if col != "is_fraud"] + ["is_fraud"]]
+    data.to_csv(path)
+    return data
+
+
+@pytest.fixture(scope="module")
+def model(trained_pipeline):
+    return trained_pipeline
+
+@pytest.fixture
+def clean_table():
+    delete_predictions()
+    yield
+    delete_predictions()
+
+
+def test_backfill_csv_resumes_from_checkpoint(model, clean_table, tmp_path):
+    """
+    Backfill d'un CSV au format fraudTest.csv, par lots de 64 :
+    - arrêt après 100 lignes (2 lots chargés), point de reprise enregistré
+    - reprise : seules les lignes restantes sont chargées, aucune en double
+    - classification en base = prédiction du modèle
+    """
+
+    csv_path = tmp_path / "history.csv"
+    data = write_history_csv(csv_path, 300)
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+
+    stats = backfill_csv(str(csv_path), model, chunk_size=64, workers=0, checkpoint_path=checkpoint_path, max_rows=100)
+    assert stats["rows"] == 128, f"❌ 2 lots de 64 attendus, {stats['rows']} lignes chargées"
+    checkpoint = json.load(open(checkpoint_path, encoding="utf-8"))
+    assert checkpoint["position"] == 128 and checkpoint["rows"] == 128, f"❌ Point de reprise incorrect : {checkpoint}"
+
+    stats = backfill_csv(str(csv_path), model, chunk_size=64, workers=0, checkpoint_path=checkpoint_path)
+    assert stats["rows"] == 300, f"❌ 300 lignes attendues au total, {stats['rows']}"
+
+    loaded = loaded_predictions()
+    assert len(loaded) == 300, f"❌ 300 transactions distinctes attendues en base, {len(loaded)}"
+    features = data.drop(columns="is_fraud")
+    features = features.astype({col: "float64" for col in features.select_dtypes(include=["int"]).columns})
+    expected = dict(zip(data["trans_num"], model.predict(features).astype(float)))
+    assert loaded == expected, "❌ Classifications différentes des prédictions du modèle"
+
+    # Relancé depuis le début : les transactions déjà chargées sont remplacées, pas dupliquées
+    backfill_csv(str(csv_path), model, chunk_size=64, workers=0, checkpoint_path=checkpoint_path, restart=True)
+    assert count_predictions() == 300, f"❌ {count_predictions()} lignes en base pour 300 transactions"
+    logging.info("✅ Backfill CSV avec reprise OK")
+
+def test_backfill_restarts_with_another_model_version(model, clean_table, tmp_path):
+    """Point de reprise d'une autre version du modèle : pas de reprise, tout l'historique est renoté"""
+
+    csv_path = tmp_path / "history.csv"
+    write_history_csv(csv_path, 200)
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+
+    backfill_csv(str(csv_path), model, chunk_size=64, workers=0, checkpoint_path=checkpoint_path, max_rows=100,
+                 model_version="1")
+    stats = backfill_csv(str(csv_path), model, chunk_size=64, workers=0, checkpoint_path=checkpoint_path,
+                         model_version="2")
+    assert stats["rows"] == 200, f"❌ Nouvelle version : les 200 lignes devaient être renotées, {stats['rows']}"
+    assert count_predictions() == 200, f"❌ Transactions renotées en double : {count_predictions()} lignes en base"
+    checkpoint = json.load(open(checkpoint_path, encoding="utf-8"))
+    assert checkpoint["position"] == 200 and checkpoint["model_version"] == "2", f"❌ Point de reprise incorrect : {checkpoint}"
+    logging.info("✅ Point de reprise d'une autre version du modèle ignoré")
+
+
+def test_backfill_raw_objects_with_process_pool(model, clean_table, s3_bucket, tmp_path):
+    """
+    Backfill des fichiers RAW (réponses de l'API, un fichier par transaction + une heure compactée en ndjson.gz),
+    scoring dans un processus séparé :
+    - les fichiers par transaction déjà compactés (sans --delete) ne sont lus qu'une fois
+    - relancé : rien de nouveau après le dernier fichier chargé
+    """
+
+    rows = []
+    for i in range(40):
+        record = dict(RECORDS[i % len(RECORDS)], merchant=BACKFILL_MERCHANT, category=CATEGORIES[i % len(CATEGORIES)],
+                      trans_num=f"rawbackfill{i:021d}", is_fraud=i % 2, current_time=int(RECORDS[0]["unix_time"] * 1000) + i)
+        rows.append([record[col] for col in COLUMNS])
+    for i in range(30):
+        data_api = {"columns": COLUMNS, "index": [i], "data": [rows[i]]}
+        s3_bucket.put_object(Bucket=TEST_BUCKET, Key=f"{RAW_PREFIX}/20251209-2{1 + i // 20}{i:02d}00_transaction.json",
+                             Body=json.dumps(data_api).encode("utf-8"))
+    compacted = pd.DataFrame(rows[30:], columns=COLUMNS).to_json(orient="records", lines=True)
+    s3_bucket.put_object(Bucket=TEST_BUCKET, Key=f"{RAW_PREFIX}/dt=2025-12-09/hour=20/compacted-0.ndjson.gz",
+                         Body=gzip.compress(compacted.encode("utf-8")))
+    # 21h compactée sans --delete : ses 20 fichiers restent à côté du fichier compacté
+    reports = compact("raw", datetime(2025, 12, 9, 21), datetime(2025, 12, 9, 22), file_format="ndjson",
+                      bucket=TEST_BUCKET)
+
+    stats = backfill_raw(model, bucket=TEST_BUCKET, chunk_size=16, workers=1, read_workers=4,
+                         checkpoint_path=str(tmp_path / "checkpoint.json"))
+    assert stats["rows"] == 40, f"❌ 40 transactions attendues, {stats['rows']} chargées"
+    assert count_predictions() == 40, f"❌ {count_predictions()} lignes en base pour 40 transactions"
+    checkpoint = json.load(open(tmp_path / "checkpoint.json", encoding="utf-8"))
+    assert checkpoint["position"] == reports[0]["keys"][-1], "❌ Le point de reprise doit être le dernier fichier"
+
+    loaded = loaded_predictions()
+    assert sorted(loaded) == sorted(row[COLUMNS.index("trans_num")] for row in rows), "❌ Transactions manquantes en base"
+
+    # Relancé : rien de nouveau après le dernier fichier chargé
+    stats = backfill_raw(model, bucket=TEST_BUCKET, chunk_size=16, workers=1,
+                         checkpoint_path=str(tmp_path / "checkpoint.json"))
+    assert stats["rows"] == 40 and count_predictions() == 40, "❌ Aucune transaction ne doit être rechargée"
+    logging.info("✅ Backfill des fichiers RAW OK")
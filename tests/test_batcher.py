@@ -0,0 +1,72 @@
+# pytest tests/test_batcher.py
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fastAPI", "server"))
+
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from batcher import DynamicBatcher
+import logging
+
+# Log infos
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+
+def test_dynamic_batcher_coalesces_requests():
+    """
+    50 requêtes simultanées, modèle lent (10 ms par appel) :
+    - regroupées en quelques appels au modèle (au plus max_batch_size transactions)
+    - chaque requête reçoit ses propres résultats, dans l'ordre
+    """
+    calls = []
+
+    def score(model, transactions):
+        calls.append(len(transactions))
+        time.sleep(0.01)
+        return [model * t for t in transactions]
+
+    async def scenario():
+        executor = ThreadPoolExecutor(max_workers=1)
+        batcher = DynamicBatcher(score, lambda: 10, executor, workers=1, max_batch_size=16, max_wait_ms=5).start()
+        results = await asyncio.gather(*[batcher.submit([i, i + 1000]) for i in range(50)])
+        await batcher.stop()
+        executor.shutdown()
+        return results, batcher.metrics()
+
+    results, metrics = asyncio.run(scenario())
+    assert results == [[10 * i, 10 * (i + 1000)] for i in range(50)], "❌ Résultats mal redistribués"
+    assert sum(calls) == 100 and len(calls) <= 10, f"❌ Requêtes pas assez regroupées : {calls}"
+    assert max(calls) <= 16, f"❌ Lot au-delà de max_batch_size : {calls}"
+    assert metrics["batch_size"]["count"] == len(calls) and metrics["wait_ms"]["count"] == 50, \
+        "❌ Histogrammes incomplets"
+    assert metrics["batch_size"]["buckets"]["16"] == metrics["batch_size"]["buckets"]["+Inf"] == len(calls), \
+        f"❌ Buckets de taille de lot incorrects : {metrics['batch_size']['buckets']}"
+    logging.info(f"✅ Regroupement dynamique OK : 50 requêtes -> {len(calls)} appels au modèle")
+
+
+def test_dynamic_batcher_propagates_errors():
+    """
+    Erreur du modèle : chaque requête du lot reçoit l'exception, le batcher continue
+    """
+    def score(model, transactions):
+        if "bad" in transactions:
+            raise ValueError("transaction invalide")
+        return transactions
+
+    async def scenario():
+        executor = ThreadPoolExecutor(max_workers=1)
+        batcher = DynamicBatcher(score, lambda: None, executor, workers=1, max_batch_size=8, max_wait_ms=1).start()
+        with pytest.raises(ValueError):
+            await batcher.submit(["bad"])
+        result = await batcher.submit(["ok"])
+        await batcher.stop()
+        executor.shutdown()
+        return result
+
+    assert asyncio.run(scenario()) == ["ok"], "❌ Le batcher doit continuer après une erreur"
+    logging.info("✅ Propagation des erreurs OK")
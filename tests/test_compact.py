@@ -0,0 +1,122 @@
+# pytest tests/test_compact.py
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+import io
+import json
+import gzip
+from datetime import datetime
+import pytest
+import pandas as pd
+import pyarrow.parquet as pq
+from compact import compact, object_time
+import storage
+from conftest import TEST_BUCKET
+import logging
+
+# Log infos
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+columns = ["trans_num", "amt", "is_fraud", "current_time"]
+
+
+def put_raw(s3_bucket, key, trans_num):
+
+    data_api = {"columns": columns, "index": [0], "data": [[trans_num, 10.5, 0, 1765317289296]]}
+    s3_bucket.put_object(Bucket=TEST_BUCKET, Key=key, Body=json.dumps(data_api, indent=2).encode("utf-8"))
+
+
+def test_object_time():
+    """
+    Date d'écriture lue dans le nom des fichiers RAW / SILVER / GOLD
+    """
+    assert object_time("bloc4/data/raw/20251209-215449_transaction.json") == datetime(2025, 12, 9, 21, 54, 49)
+    assert object_time("bloc4/data/gold/20251209_215449_transaction.csv") == datetime(2025, 12, 9, 21, 54, 49)
+    assert object_time("bloc4/data/gold/20251209_215449_1a2b3c4d_transaction.csv") == datetime(2025, 12, 9, 21, 54, 49)
+    assert object_time("bloc4/data/gold/dt=2025-12-09/hour=21/part-1.parquet") is None
+    logging.info("✅ Date des fichiers OK")
+
+
+def test_compact_raw_to_parquet(s3_bucket):
+    """
+    Compaction RAW :
+    - un fichier Parquet par heure d'écriture, dans la partition de l'heure de la transaction (UTC)
+    - les fichiers d'origine sont supprimés (--delete)
+    - les fichiers hors de la fenêtre ne sont pas touchés
+    """
+    put_raw(s3_bucket, "bloc4/data/raw/20251209-210000_transaction.json", "a")
+    put_raw(s3_bucket, "bloc4/data/raw/20251209-213000_transaction.json", "b")
+    put_raw(s3_bucket, "bloc4/data/raw/20251209-220500_transaction.json", "c")
+    put_raw(s3_bucket, "bloc4/data/raw/20251210-010000_transaction.json", "out_of_window")
+
+    reports = compact("raw", datetime(2025, 12, 9), datetime(2025, 12, 10), delete=True, workers=4, bucket=TEST_BUCKET)
+
+    assert [report["rows"] for report in reports] == [2, 1], "❌ 2 lignes écrites à 21h et 1 ligne à 22h attendues"
+    # current_time 1765317289296 : 2025-12-09 21:54:49 UTC, même pour le fichier écrit à 22h05
+    assert [report["keys"] for report in reports] == [
+        ["bloc4/data/raw/dt=2025-12-09/hour=21/compacted-20251209T21.parquet"],
+        ["bloc4/data/raw/dt=2025-12-09/hour=21/compacted-20251209T22.parquet"]], "❌ Partition ou nom de fichier incorrect"
+    body = s3_bucket.get_object(Bucket=TEST_BUCKET, Key=reports[0]["keys"][0])["Body"].read()
+    assert sorted(pq.read_table(io.BytesIO(body)).column("trans_num").to_pylist()) == ["a", "b"], "❌ Lignes incorrectes"
+
+    remaining = [obj["Key"] for obj in s3_bucket.list_objects_v2(Bucket=TEST_BUCKET)["Contents"]]
+    assert "bloc4/data/raw/20251209-210000_transaction.json" not in remaining, "❌ L'original aurait dû être supprimé"
+    assert "bloc4/data/raw/20251210-010000_transaction.json" in remaining, "❌ Hors fenêtre : ne doit pas être supprimé"
+    logging.info("✅ Compaction RAW OK")
+
+
+def test_compact_gold_to_ndjson(s3_bucket):
+    """
+    Compaction GOLD en NDJSON compressé, fichiers d'origine conservés
+    """
+    for i in range(3):
+        csv_gold = pd.DataFrame([{"trans_num": f"t{i}", "amt": 1.0 + i, "unix_time": 1765317289.296,
+                                  "classification": 0.0}]).to_csv(index=False)
+        s3_bucket.put_object(Bucket=TEST_BUCKET, Key=f"bloc4/data/gold/20251209_21000{i}_transaction.csv", Body=csv_gold)
+
+    reports = compact("gold", datetime(2025, 12, 9, 21), datetime(2025, 12, 9, 22), file_format="ndjson", bucket=TEST_BUCKET)
+
+    assert len(reports) == 1 and reports[0]["rows"] == 3, "❌ 3 lignes attendues dans un seul fichier"
+    body = s3_bucket.get_object(Bucket=TEST_BUCKET, Key=reports[0]["keys"][0])["Body"].read()
+    records = [json.loads(line) for line in gzip.decompress(body).splitlines()]
+    assert sorted(record["trans_num"] for record in records) == ["t0", "t1", "t2"], "❌ Lignes incorrectes"
+    assert s3_bucket.list_objects_v2(Bucket=TEST_BUCKET, Prefix="bloc4/data/gold/2025")["KeyCount"] == 3, \
+        "❌ Sans --delete, les originaux doivent être conservés"
+    logging.info("✅ Compaction GOLD OK")
+
+
+def test_compact_rerun_is_idempotent(s3_bucket):
+    """
+    Relancée sur la même fenêtre : heure déjà compactée ignorée, aucun fichier compacté en double,
+    --delete ensuite ne supprime que les originaux vérifiés
+    """
+    put_raw(s3_bucket, "bloc4/data/raw/20251209-210000_transaction.json", "a")
+    put_raw(s3_bucket, "bloc4/data/raw/20251209-213000_transaction.json", "b")
+
+    first = compact("raw", datetime(2025, 12, 9, 21), datetime(2025, 12, 9, 22), bucket=TEST_BUCKET)
+    put_raw(s3_bucket, "bloc4/data/raw/20251209-215900_transaction.json", "late")
+    second = compact("raw", datetime(2025, 12, 9, 21), datetime(2025, 12, 9, 22), delete=True, bucket=TEST_BUCKET)
+
+    assert len(first) == 1 and second == [], "❌ L'heure déjà compactée ne doit pas l'être une seconde fois"
+    compacted = s3_bucket.list_objects_v2(Bucket=TEST_BUCKET, Prefix="bloc4/data/raw/dt=")["Contents"]
+    assert [obj["Key"] for obj in compacted] == first[0]["keys"], "❌ Un seul fichier compacté attendu"
+    remaining = [obj["Key"] for obj in s3_bucket.list_objects_v2(Bucket=TEST_BUCKET, Prefix="bloc4/data/raw/2025")["Contents"]]
+    assert remaining == ["bloc4/data/raw/20251209-215900_transaction.json"], \
+        "❌ Seuls les originaux compactés doivent être supprimés"
+    logging.info("✅ Compaction relancée sans doublon")
+
+
+def test_compact_delete_errors_raise(s3_bucket, monkeypatch):
+    """
+    Suppression refusée par S3 (Quiet : seules les erreurs sont renvoyées) : la compaction échoue
+    """
+    put_raw(s3_bucket, "bloc4/data/raw/20251209-210000_transaction.json", "a")
+    monkeypatch.setattr(storage.get_s3_client(), "delete_objects", lambda **kwargs: {"Errors": [
+        {"Key": "bloc4/data/raw/20251209-210000_transaction.json", "Code": "AccessDenied", "Message": "Access Denied"}]})
+
+    with pytest.raises(ValueError, match="AccessDenied"):
+        compact("raw", datetime(2025, 12, 9, 21), datetime(2025, 12, 9, 22), delete=True, bucket=TEST_BUCKET)
+    logging.info("✅ Erreurs de suppression remontées")
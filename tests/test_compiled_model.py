@@ -0,0 +1,68 @@
+# pytest tests/test_compiled_model.py
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+import numpy as np
+import pytest
+from sklearn.pipeline import Pipeline
+from compiled_model import compile_pipeline, CompiledForest
+from conftest import make_transactions
+import logging
+
+# Log infos
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+
+@pytest.fixture(scope="module")
+def trained(trained_pipeline):
+    return trained_pipeline, make_transactions(2000, seed=1).drop(columns="is_fraud")
+
+
+def test_compiled_model_matches_sklearn(trained):
+    """
+    Modèle compilé : probabilités et classes strictement identiques au pipeline sklearn
+    - sur un DataFrame (gros lot, parcours NumPy)
+    - sur des dicts au format test.json, un par un (parcours Python)
+    """
+    model, X = trained
+    compiled = compile_pipeline(model)
+    expected = model.predict_proba(X)
+
+    assert np.array_equal(compiled.predict_proba(X), expected), "❌ Probabilités différentes sur le DataFrame"
+    assert np.array_equal(compiled.predict(X), model.predict(X)), "❌ Classes différentes sur le DataFrame"
+    records = X.to_dict("records")
+    single = np.vstack([compiled.predict_proba([record]) for record in records[:300]])
+    assert np.array_equal(single, expected[:300]), "❌ Probabilités différentes transaction par transaction"
+    assert np.array_equal(compiled.predict_proba(records), expected), "❌ Probabilités différentes sur les dicts"
+    logging.info("✅ Modèle compilé identique à sklearn")
+
+
+def test_compiled_model_save_load(trained, tmp_path):
+    """
+    Enregistrement .npz puis rechargement : mêmes prédictions
+    """
+    model, X = trained
+    path = str(tmp_path / "compiled_model.npz")
+    compile_pipeline(model).save(path)
+    assert np.array_equal(CompiledForest.load(path).predict_proba(X), model.predict_proba(X)), \
+        "❌ Prédictions différentes après rechargement"
+    logging.info("✅ Enregistrement du modèle compilé OK")
+
+
+def test_compiled_model_rejects_unknown_layout(trained):
+    """
+    - catégorie inconnue : ValueError (comme le OneHotEncoder)
+    - pipeline d'une autre forme : ValueError à la compilation
+    """
+    model, X = trained
+    compiled = compile_pipeline(model)
+    record = X.iloc[0].to_dict()
+    record["category"] = "unknown_category"
+    with pytest.raises(ValueError):
+        compiled.predict_proba([record])
+    with pytest.raises(ValueError):
+        compile_pipeline(Pipeline(steps=[("Classifier", model.named_steps["Classifier"])]))
+    logging.info("✅ Formes non prises en charge refusées")
@@ -0,0 +1,111 @@
+# pytest tests/test_dataset.py
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "train"))
+
+import pytest
+import pandas as pd
+from dataset import load_dataset, to_model_input, snapshot_paths, iter_dataset_chunks, balanced_sample, BalancedSampler, DTYPES
+from conftest import make_transactions
+import logging
+
+# Log infos
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+
+## CSV with the layout of fraudTest.csv (row index first, integer columns written as integers, unique trans_num)
+def write_dataset_csv(path: str, n_rows: int, seed: int = 0):
+
+    data = make_transactions(n_rows, seed)
+    data["trans_num"] = [f"{seed:04x}{i:028x}" for i in range(n_rows)]
+    data = data.astype({col: "int64" for col, dtype in DTYPES.items() if dtype.startswith("int")})
+    data[list(DTYPES)].to_csv(path)
+
+## Former loading of train/train.py : read_csv with the default dtypes, integers cast to float64
+def read_dataset_legacy(path: str) -> pd.DataFrame:
+
+    data = pd.read_csv(path, index_col=0)
+    return data.astype({col: "float64" for col in data.select_dtypes(include=["int"]).columns})
+
+
+def test_snapshot_same_data_as_csv(tmp_path, monkeypatch):
+    """Le snapshot typé donne au modèle exactement les données de l'ancien read_csv, sans relire le CSV"""
+
+    data_path = str(tmp_path / "fraudTest.csv")
+    write_dataset_csv(data_path, 500)
+
+    data = load_dataset(data_path, str(tmp_path / "snapshots"))
+    assert os.path.exists(snapshot_paths(data_path, str(tmp_path / "snapshots"))[0]), "❌ Snapshot non écrit"
+    assert isinstance(data["category"].dtype, pd.CategoricalDtype), "❌ category devrait être catégorielle"
+    assert data["is_fraud"].dtype == "int8", "❌ is_fraud devrait être en int8"
+
+    # Second run : the snapshot only, the CSV is not parsed again
+    monkeypatch.setattr(pd, "read_csv", lambda *args, **kwargs: (_ for _ in ()).throw(AssertionError("CSV relu")))
+    snapshot = load_dataset(data_path, str(tmp_path / "snapshots"))
+    pd.testing.assert_frame_equal(snapshot, data, check_exact=True)
+    monkeypatch.undo()
+
+    pd.testing.assert_frame_equal(to_model_input(snapshot), read_dataset_legacy(data_path), check_exact=True)
+    logging.info("✅ Snapshot identique au CSV et relu sans parser le CSV")
+
+def test_snapshot_rebuilt_when_csv_changes(tmp_path):
+    """Un CSV modifié (hash différent) invalide le snapshot"""
+
+    data_path = str(tmp_path / "fraudTest.csv")
+    write_dataset_csv(data_path, 200, seed=0)
+    first = load_dataset(data_path, str(tmp_path / "snapshots"))
+
+    write_dataset_csv(data_path, 300, seed=1)
+    second = load_dataset(data_path, str(tmp_path / "snapshots"))
+
+    assert len(first) == 200 and len(second) == 300, "❌ Le snapshot aurait dû être reconstruit"
+    pd.testing.assert_frame_equal(to_model_input(second), read_dataset_legacy(data_path), check_exact=True)
+    logging.info("✅ Snapshot reconstruit après modification du CSV")
+
+def test_balanced_sample_by_chunks(tmp_path):
+    """Échantillonnage par morceaux : toutes les fraudes, n négatifs tirés du dataset, indépendant de la taille des morceaux"""
+
+    data_path = str(tmp_path / "fraudTest.csv")
+    write_dataset_csv(data_path, 3000)
+    source = read_dataset_legacy(data_path)
+    n_frauds = int(source["is_fraud"].sum())
+
+    sample = balanced_sample(iter_dataset_chunks(data_path, str(tmp_path / "snapshots"), chunk_size=500), negatives=400)
+    assert (sample["is_fraud"] == 1).sum() == n_frauds, "❌ Toutes les fraudes devraient être gardées"
+    assert (sample["is_fraud"] == 0).sum() == 400, "❌ 400 transactions non frauduleuses attendues"
+    assert sample["trans_num"].is_unique, "❌ Transaction tirée deux fois"
+    assert set(sample["trans_num"]) <= set(source["trans_num"]), "❌ Transaction absente du dataset"
+
+    # Same seed : same sample, whatever the size of the chunks
+    for chunk_size in (97, 3000):
+        other = balanced_sample(iter_dataset_chunks(data_path, str(tmp_path / "snapshots"), chunk_size=chunk_size),
+                                negatives=400)
+        pd.testing.assert_frame_equal(to_model_input(other), to_model_input(sample), check_exact=True)
+
+    # Ratio : 2 negatives per fraud (at most `negatives`)
+    sample = balanced_sample(iter_dataset_chunks(data_path, str(tmp_path / "snapshots"), chunk_size=500),
+                             negatives=10000, ratio=2)
+    assert (sample["is_fraud"] == 0).sum() == 2 * n_frauds, "❌ Ratio de négatifs non respecté"
+    logging.info("✅ Échantillon équilibré identique quelle que soit la taille des morceaux")
+
+def test_balanced_sampler_memory_bounded(tmp_path):
+    """Le réservoir ne garde jamais plus de 2 fois l'échantillon de négatifs (plus le morceau en cours)"""
+
+    data_path = str(tmp_path / "fraudTest.csv")
+    write_dataset_csv(data_path, 5000)
+    sampler = BalancedSampler(negatives=100)
+    for chunk in iter_dataset_chunks(data_path, str(tmp_path / "snapshots"), chunk_size=250):
+        sampler.add(chunk)
+        assert sum(len(negatives) for negatives in sampler._pending) <= 2 * 100 + 250, "❌ Réservoir non borné"
+    assert (sampler.result()["is_fraud"] == 0).sum() == 100, "❌ 100 négatifs attendus"
+    logging.info("✅ Mémoire du réservoir bornée par la taille de l'échantillon")
+
+def test_balanced_sample_empty_source():
+    """Source sans aucun morceau : erreur explicite (pas d'IndexError)"""
+
+    with pytest.raises(ValueError, match="source vide"):
+        balanced_sample(iter([]), negatives=100)
+    logging.info("✅ Source vide signalée")
@@ -3,11 +3,17 @@
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
 
 import os
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
 import requests
 from dotenv import find_dotenv, load_dotenv
-from app.extract import get_api
+import app.extract
+from app.extract import get_api, get_api_batch, merge_transactions, decode_api_payload
 import logging
 
 # Charger le .env
@@ -43,5 +49,104 @@ def test_extract():
     logging.info("✅ Test API transactions OK : status 200 + JSON valide + fonction interne OK")
 
 
+def test_merge_transactions():
+    """
+    Fusion de plusieurs réponses de l'API en un seul lot
+    - les lignes sont concaténées dans l'ordre
+    - une réponse avec les colonnes dans un autre ordre est réalignée
+    """
+
+    first = {"columns": ["trans_num", "amt"], "index": [1], "data": [["a", 1.0]]}
+    second = {"columns": ["amt", "trans_num"], "index": [2], "data": [[2.0, "b"]]}
+
+    merged = merge_transactions([first, second])
+    assert merged["columns"] == ["trans_num", "amt"], "❌ Les colonnes du lot sont incorrectes"
+    assert merged["index"] == [1, 2], "❌ L'index du lot est incorrect"
+    assert merged["data"] == [["a", 1.0], ["b", 2.0]], "❌ Les lignes du lot sont incorrectes"
+    logging.info("✅ Fusion des transactions OK")
+
+
+def test_get_api_batch():
+    """
+    Récupération d'un lot de transactions : au plus max_size lignes, au moins une
+    """
+
+    data_api = get_api_batch(max_size=3, max_wait_ms=60000)
+    assert "data" in data_api, "❌ Le champ 'data' est absent du lot"
+    assert 1 <= len(data_api["data"]) <= 3, "❌ Le lot doit contenir entre 1 et 3 transactions"
+    assert all(len(row) == len(data_api["columns"]) for row in data_api["data"]), "❌ Lignes incomplètes"
+    logging.info("✅ Lot de transactions OK")
+
+
+def test_get_api_batch_keeps_collected_transactions(monkeypatch):
+    """
+    Erreur de l'API en cours de lot : les transactions déjà récupérées sont renvoyées,
+    l'erreur n'est levée que si aucune transaction n'a été récupérée
+    """
+
+    responses = [{"columns": ["trans_num", "amt"], "index": [i], "data": [[f"t{i}", 1.0]]} for i in range(2)]
+
+    def flaky_api():
+        if responses:
+            return responses.pop(0)
+        raise requests.ConnectionError("API injoignable")
+
+    monkeypatch.setattr(app.extract, "get_api", flaky_api)
+    data_api = get_api_batch(max_size=5, max_wait_ms=60000)
+    assert data_api["data"] == [["t0", 1.0], ["t1", 1.0]], "❌ Les transactions récupérées avant l'erreur sont perdues"
+
+    with pytest.raises(requests.ConnectionError):
+        get_api_batch(max_size=5, max_wait_ms=60000)
+    logging.info("✅ Lot partiel conservé après une erreur de l'API")
+
+
+def test_decode_api_payload():
+    """
+    Décodage de la réponse de l'API (JSON encodé dans une chaîne JSON) en un seul appel
+    """
+
+    data_api = {"columns": ["trans_num", "amt"], "index": [1], "data": [["a", 1.5]]}
+    assert decode_api_payload(json.dumps(json.dumps(data_api)).encode("utf-8")) == data_api, \
+        "❌ Réponse doublement encodée mal décodée"
+    assert decode_api_payload(json.dumps(data_api).encode("utf-8")) == data_api, "❌ Réponse JSON simple mal décodée"
+    logging.info("✅ Décodage de la réponse API OK")
+
+
+def test_get_api_retries_transient_errors(monkeypatch):
+    """
+    API locale qui renvoie 503 deux fois puis la transaction :
+    - get_api réessaie (backoff) et renvoie la transaction
+    - la connexion HTTP est réutilisée (keep-alive)
+    """
+
+    data_api = {"columns": ["trans_num", "amt"], "index": [1], "data": [["a", 1.5]]}
+    calls = []
+
+    class FlakyAPI(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            calls.append(self.client_address)
+            status = 503 if len(calls) <= 2 else 200
+            body = json.dumps(json.dumps(data_api)).encode("utf-8") if status == 200 else b"unavailable"
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
 
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyAPI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(app.extract, "API_BACKOFF", 0.01)
+    monkeypatch.setattr(app.extract, "_http_session", None)
+    try:
+        assert get_api(f"http://127.0.0.1:{server.server_port}/") == data_api, "❌ Transaction incorrecte après reprise"
+    finally:
+        server.shutdown()
+        server.server_close()
 
+    assert len(calls) == 3, f"❌ 3 appels attendus (2 erreurs 503 + 1 succès), {len(calls)} reçus"
+    assert len(set(calls)) == 1, "❌ La connexion HTTP aurait dû être réutilisée entre les appels"
+    logging.info("✅ Reprise sur erreur transitoire OK")
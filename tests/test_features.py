@@ -0,0 +1,115 @@
+# pytest tests/test_features.py
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+import numpy as np
+import pandas as pd
+from app.features import features_engineering, haversine
+import logging
+
+# Log infos
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+transactions = pd.DataFrame(
+    [
+        {
+            "trans_date_trans_time": "2025-12-11 20:05:57",
+            "cc_num": 3538520143479972.0,
+            "merchant": "fraud_Heaney-Marquardt",
+            "category": "entertainment",
+            "amt": 5.38,
+            "first": "Cassandra",
+            "last": "Nunez",
+            "gender": "F",
+            "street": "9572 Austin Forge Suite 612",
+            "city": "Clay Center",
+            "state": "OH",
+            "zip": 43408.0,
+            "lat": 41.5686,
+            "long": -83.3632,
+            "city_pop": 269.0,
+            "job": "Insurance underwriter",
+            "dob": "1965-09-15",
+            "trans_num": "2d7184f185bb8647162267e4adef813d",
+            "unix_time": 1765483557.381,
+            "merch_lat": 41.534246,
+            "merch_long": -83.786492
+        },
+        {
+            "trans_date_trans_time": "2025-12-09 21:55:32",
+            "cc_num": 4.710826438164848e+18,
+            "merchant": "fraud_Monahan-Morar",
+            "category": "personal_care",
+            "amt": 9.37,
+            "first": "Juan",
+            "last": "Henry",
+            "gender": "M",
+            "street": "9795 Lori Island Suite 346",
+            "city": "Turner",
+            "state": "MT",
+            "zip": 59542.0,
+            "lat": 48.8328,
+            "long": -108.3961,
+            "city_pop": 192.0,
+            "job": "Further education lecturer",
+            "dob": "1964-01-04",
+            "trans_num": "dbfd69662b4b1b0fdffabbd3073a2b81",
+            "unix_time": 1765317332.249,
+            "merch_lat": 47.968839,
+            "merch_long": -109.158183
+        }
+    ]
+)
+
+
+## Former row-by-row distance of train/train.py (applied on each row, numpy scalars)
+def haversine_row(long, merch_long, lat, merch_lat):
+
+    long, merch_long, lat, merch_lat = map(np.radians, [long, merch_long, lat, merch_lat])
+    diff_lon = merch_long - long
+    diff_lat = merch_lat - lat
+    return 2*6371*np.arcsin(np.sqrt(np.sin(diff_lat/2.0)**2 + np.cos(lat) * np.cos(merch_lat) * np.sin(diff_lon/2.0)**2))
+
+
+def test_features_engineering():
+    """
+    Features créées par le modèle :
+    - seules les colonnes utiles restent
+    - jour / heure / longueur de carte / âge corrects
+    """
+
+    features = features_engineering(transactions)
+
+    assert list(features.columns) == ["category", "amt", "city_pop", "weekday", "hour", "lenght_cc_num", "age", "distance_km"], \
+        "❌ Les colonnes produites sont incorrectes"
+    assert list(features["weekday"]) == ["Thursday", "Tuesday"], "❌ Le jour de la semaine est incorrect"
+    assert list(features["hour"]) == [20, 21], "❌ L'heure est incorrecte"
+    assert list(features["lenght_cc_num"]) == [len(str(3538520143479972.0)), len(str(4.710826438164848e+18))], \
+        "❌ La longueur du numéro de carte est incorrecte"
+    assert features["lenght_cc_num"].dtype == "float64", "❌ Les entiers doivent être convertis en float64"
+    assert "cc_num" in transactions.columns, "❌ Le DataFrame d'origine ne doit pas être modifié"
+    logging.info("✅ Features engineering OK")
+
+
+def test_distance_matches_row_by_row():
+    """
+    La distance vectorisée doit être identique au bit près au calcul ligne à ligne de l'ancien code
+    (DataFrame.apply, opérations sur des scalaires numpy)
+    """
+
+    rng = np.random.default_rng(0)
+    points = pd.DataFrame({"lat": rng.uniform(20, 65, 5000), "long": rng.uniform(-165, -67, 5000)})
+    points["merch_lat"] = points["lat"] + rng.uniform(-1, 1, 5000)
+    points["merch_long"] = points["long"] + rng.uniform(-1, 1, 5000)
+    points = pd.concat([transactions[["lat", "long", "merch_lat", "merch_long"]], points], ignore_index=True)
+
+    vectorized = haversine(*(points[col].to_numpy(dtype="float64") for col in ("long", "merch_long", "lat", "merch_lat")))
+    expected = points.astype(object).apply(
+        lambda x: haversine_row(x['long'], x['merch_long'], x['lat'], x['merch_lat']), axis=1)
+
+    np.testing.assert_array_equal(vectorized, expected.to_numpy(dtype="float64"))
+    np.testing.assert_array_equal(features_engineering(transactions)["distance_km"], expected[:len(transactions)])
+    logging.info("✅ Distance vectorisée identique au calcul ligne à ligne")
@@ -0,0 +1,124 @@
+# pytest tests/test_fetcher.py
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+import time
+import pytest
+import fetcher as fetcher_module
+from fetcher import TransactionFetcher, RateLimiter
+from fake_api import FakeTransactionAPI, COLUMNS
+import logging
+
+# Log infos
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+
+## Clock of the rate limiter : sleep() only moves the time forward (and records the wait)
+class FakeClock:
+
+    def __init__(self):
+
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+
+        return self.now
+
+    def sleep(self, seconds: float):
+
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_fetcher_scales_with_concurrency():
+    """
+    API locale lente (50 ms par appel), 8 appels en parallèle :
+    - les appels se chevauchent réellement, jamais plus de 8 à la fois
+    - format de sortie identique à get_api
+    """
+    with FakeTransactionAPI(latency=0.05) as fake_api:
+        fetcher = TransactionFetcher(url=fake_api.url, concurrency=8, rate_limit=0).start()
+        rows = []
+        while len(rows) < 40:
+            data_api = fetcher.get_batch(max_size=40 - len(rows), max_wait_ms=5000)
+            assert data_api is not None, "❌ Aucune transaction collectée"
+            rows.extend(data_api["data"])
+        fetcher.stop()
+
+    assert data_api["columns"] == COLUMNS, "❌ Colonnes différentes de la réponse de l'API"
+    assert len({row[COLUMNS.index("trans_num")] for row in rows}) == 40, "❌ Transactions en double"
+    assert 1 < fake_api.max_in_flight <= 8, \
+        f"❌ {fake_api.max_in_flight} appels simultanés observés par l'API (entre 2 et 8 attendus)"
+    logging.info(f"✅ Collecte concurrente OK : jusqu'à {fake_api.max_in_flight} appels simultanés")
+
+
+def test_fetcher_dedupes_trans_num():
+    """
+    L'API renvoie toujours les 5 mêmes transactions (test.json) : chacune n'est transmise qu'une fois
+    """
+    with FakeTransactionAPI(unique=False) as fake_api:
+        fetcher = TransactionFetcher(url=fake_api.url, concurrency=4, rate_limit=0).start()
+        while fake_api.requests < 30:
+            time.sleep(0.01)
+        fetcher.stop()
+
+    data_api = fetcher.get_batch(max_size=100, max_wait_ms=0)
+    trans_nums = [row[COLUMNS.index("trans_num")] for row in data_api["data"]]
+    assert len(trans_nums) == 5 and len(set(trans_nums)) == 5, f"❌ 5 transactions uniques attendues : {trans_nums}"
+    assert fetcher.duplicates >= 25, "❌ Les doublons n'ont pas été comptés"
+    logging.info("✅ Dédoublonnage par trans_num OK")
+
+
+def test_fetcher_stop_keeps_unqueued_transactions():
+    """
+    Fetcher arrêté alors que la file est pleine : les transactions reçues mais jamais mises en file
+    ne sont pas marquées comme vues, elles sont transmises au redémarrage (pas comptées comme doublons)
+    """
+    with FakeTransactionAPI(unique=False) as fake_api:
+        fetcher = TransactionFetcher(url=fake_api.url, concurrency=1, rate_limit=0, queue_size=1)
+        fetcher.queue.put({"columns": COLUMNS, "index": [], "data": []})
+        fetcher.start()
+        deadline = time.monotonic() + 5
+        while fake_api.requests < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.1)
+        fetcher.stop()
+        assert fetcher.fetched == 0, "❌ Transactions comptées alors qu'elles n'ont pas été mises en file"
+
+        fetcher.queue.get_nowait()
+        fetcher.start()
+        data_api = fetcher.get_batch(max_size=5, max_wait_ms=5000)
+        fetcher.stop()
+
+    assert data_api is not None and len(data_api["data"]) == 5, \
+        "❌ Transactions perdues : traitées comme doublons après l'arrêt du fetcher"
+    logging.info("✅ Transactions non mises en file conservées à l'arrêt du fetcher")
+
+
+def test_fetcher_bounded_queue_and_rate_limit(monkeypatch):
+    """
+    - file pleine : les appels s'arrêtent (backpressure)
+    - limite de débit : 10 appels / s au plus (horloge simulée)
+    """
+    with FakeTransactionAPI() as fake_api:
+        fetcher = TransactionFetcher(url=fake_api.url, concurrency=4, rate_limit=0, queue_size=3).start()
+        deadline = time.monotonic() + 5
+        while fetcher.queue_depth < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert fetcher.queue_depth == 3, "❌ La file devrait être pleine"
+        # Calls still running when the queue filled up : at most one per worker
+        time.sleep(0.2)
+        assert fake_api.requests <= 3 + 4, f"❌ {fake_api.requests} appels alors que la file est pleine"
+        fetcher.stop()
+
+    clock = FakeClock()
+    monkeypatch.setattr(fetcher_module, "time", clock)
+    limiter = RateLimiter(rate=10)
+    for _ in range(6):
+        limiter.acquire()
+    assert clock.sleeps == pytest.approx([0.1] * 5), f"❌ La limite de débit n'est pas respectée : {clock.sleeps}"
+    logging.info("✅ File bornée et limite de débit OK")
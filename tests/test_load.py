@@ -6,13 +6,17 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import os
 import json
+import time
 import pandas as pd
+import psycopg2
 from sqlalchemy import create_engine, text
 from app.load import (
     ensure_predictions_table_exists,
     build_db_rows,
     insert_predictions,
+    copy_predictions,
     pg_connect,
+    PgPool,
     DATABASE_URL)
 import logging
 
@@ -28,6 +32,128 @@ def test_pg_connect():
     logging.info("✅ Connexion à la base de données réussie")
 
 
+def test_pg_pool_reuses_and_reconnects():
+    """
+    Pool de connexions :
+    - la même connexion est réutilisée d'un appel à l'autre
+    - une connexion coupée côté serveur est remplacée automatiquement
+    """
+    pool = PgPool(health_check_interval=0)
+    backend_pid = lambda cur: (cur.execute("SELECT pg_backend_pid()"), cur.fetchone()[0])[1]
+
+    first_pid = pool.run(backend_pid)
+    assert pool.run(backend_pid) == first_pid, "❌ La connexion doit être réutilisée"
+
+    # Kill the pooled connection from another session
+    conn = pg_connect()
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_terminate_backend(%s)", (first_pid,))
+    conn.commit()
+    conn.close()
+
+    new_pid = pool.run(backend_pid)
+    assert new_pid != first_pid, "❌ Une nouvelle connexion aurait dû être ouverte"
+    pool.close()
+    logging.info("✅ Pool de connexions OK (réutilisation + reconnexion)")
+
+def test_pg_pool_skips_every_dead_connection():
+    """
+    Toutes les connexions inactives du pool coupées côté serveur (ex : redémarrage de la base) :
+    getconn les écarte une par une et renvoie une connexion valide
+    """
+    pool = PgPool(min_size=3, max_size=3, health_check_interval=0)
+    conns = [pool.getconn() for _ in range(3)]
+    pids = []
+    for conn in conns:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_backend_pid()")
+            pids.append(cur.fetchone()[0])
+        conn.rollback()
+        pool.putconn(conn)
+
+    killer = pg_connect()
+    killer.autocommit = True
+    with killer.cursor() as cur:
+        for pid in pids:
+            cur.execute("SELECT pg_terminate_backend(%s)", (pid,))
+        # pg_terminate_backend only signals the backends : wait until they are gone
+        for _ in range(50):
+            cur.execute("SELECT COUNT(*) FROM pg_stat_activity WHERE pid = ANY(%s)", (pids,))
+            if cur.fetchone()[0] == 0:
+                break
+            time.sleep(0.1)
+    killer.close()
+
+    conn = pool.getconn()
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_backend_pid()")
+        assert cur.fetchone()[0] not in pids, "❌ getconn a renvoyé une connexion coupée"
+    conn.rollback()
+    pool.putconn(conn)
+    pool.close()
+    logging.info("✅ Connexions coupées écartées jusqu'à une connexion valide")
+
+def test_pg_pool_no_replay_after_connection_lost():
+    """
+    Connexion coupée juste après l'exécution d'une écriture :
+    - autocommit : l'INSERT est peut-être déjà validé, il n'est pas rejoué (pas de doublon)
+    - transaction : le serveur l'annule avec la connexion, elle est rejouée une fois
+    """
+    ensure_predictions_table_exists()
+    test_merchant = "TEST_POOL_REPLAY_PYTEST"
+    pool = PgPool(health_check_interval=0, retries=2)
+
+    def delete_rows():
+        conn = pg_connect()
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM public.transactions WHERE merchant = %s", (test_merchant,))
+        conn.commit()
+        conn.close()
+
+    def count_rows():
+        conn = pg_connect()
+        with conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM public.transactions WHERE merchant = %s", (test_merchant,))
+            count = cur.fetchone()[0]
+        conn.close()
+        return count
+
+    ## INSERT, then the connection is killed from another session before the next statement (first call only)
+    def insert_then_drop(calls):
+        def func(cur):
+            calls.append(1)
+            cur.execute("INSERT INTO public.transactions (merchant, trans_num) VALUES (%s, %s)",
+                        (test_merchant, f"replay-{len(calls)}"))
+            if len(calls) == 1:
+                cur.execute("SELECT pg_backend_pid()")
+                killer = pg_connect()
+                with killer.cursor() as killer_cur:
+                    killer_cur.execute("SELECT pg_terminate_backend(%s)", (cur.fetchone()[0],))
+                killer.commit()
+                killer.close()
+                cur.execute("SELECT 1")
+        return func
+
+    delete_rows()
+    calls = []
+    try:
+        pool.run(insert_then_drop(calls), autocommit=True)
+        assert False, "❌ L'erreur de connexion aurait dû être levée"
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        pass
+    assert len(calls) == 1, "❌ Une écriture en autocommit ne doit pas être rejouée"
+    assert count_rows() == 1, "❌ L'INSERT validé devrait être présent une seule fois"
+
+    delete_rows()
+    calls = []
+    pool.run(insert_then_drop(calls))
+    assert len(calls) == 2, "❌ La transaction annulée aurait dû être rejouée"
+    assert count_rows() == 1, "❌ Une seule ligne attendue après la nouvelle tentative"
+
+    delete_rows()
+    pool.close()
+    logging.info("✅ Aucune écriture rejouée après validation possible")
+
 def test_ensure_predictions_table_exists_runs():
     """
     Test très simple : la fonction ne doit pas lever d'erreur
@@ -157,6 +283,59 @@ def test_build_db_rows_basic():
     assert isinstance(row[22], float), "❌ La valeur 'classification' doit être de type 'float'"
     logging.info("✅ Les valeurs et formats attendus sont OK")
 
+## API's response + predictions for a batch of n_rows transactions
+def make_batch(n_rows, merchant="TEST_bidon"):
+
+    fake_data = {
+        "columns": ["trans_num", "is_fraud"],
+        "data": [[f"trans_{i}", i % 2] for i in range(n_rows)]
+        }
+    pred_df = pd.DataFrame(
+        [
+            {
+                "cc_num": 999999 + i,
+                "merchant" : merchant,
+                "category" : "kids_pets",
+                "amt" : 100.01,
+                "first" : "Jenna",
+                "last" : "Brooks",
+                "gender" : "F",
+                "street" : "South Park",
+                "city" : "Baton Rouge",
+                "state" : "LA",
+                "zip" : 99999,
+                "lat" : 30.4066,
+                "long" : -91.494831,
+                "city_pop" : 7950,
+                "job" : "Designer",
+                "dob" : "1977-02-22",
+                "trans_num" : f"trans_{i}",
+                "merch_lat" : 30.731498,
+                "merch_long" : -91.494831,
+                "unix_time": 1765483867.831,
+                "trans_date_trans_time": "2025-12-12 18:00:00",
+                "classification": 1.0
+            }
+            for i in range(n_rows)
+        ]
+    )
+    return fake_data, pred_df
+
+def test_build_db_rows_batch_keeps_is_fraud_per_row():
+    """
+    Sur un lot de plusieurs transactions, chaque ligne garde son propre 'is_fraud'
+    """
+    n_rows = 3
+    fake_data, pred_df = make_batch(n_rows)
+
+    rows = build_db_rows(data_api=fake_data, pred_df=pred_df)
+
+    assert len(rows) == n_rows, f"❌ Le lot doit contenir exactement {n_rows} lignes"
+    assert [row[16] for row in rows] == ["trans_0", "trans_1", "trans_2"], "❌ L'ordre des lignes est incorrect"
+    assert [row[19] for row in rows] == [0.0, 1.0, 0.0], "❌ 'is_fraud' doit être celui de chaque transaction"
+    assert all(isinstance(row[0], float) for row in rows), "❌ La valeur 'cc_num' doit être de type 'float'"
+    logging.info("✅ 'is_fraud' correct pour chaque ligne du lot")
+
 def test_insert_predictions_inserts_rows():
     """
     Test d'intégration simple :
@@ -217,3 +396,37 @@ def test_insert_predictions_inserts_rows():
         assert count >= 1, "❌ La ligne test est absente de la base"
         logging.info("✅ La ligne test a bien été insérée dans la base")
 
+def test_copy_predictions_bulk_load():
+    """
+    Chargement en masse (COPY) :
+    - toutes les lignes du lot sont écrites, en plusieurs paquets
+    - chaque ligne garde son 'is_fraud'
+    """
+    ensure_predictions_table_exists()
+
+    test_merchant = "TEST_COPY_PYTEST"
+    fake_data, pred_df = make_batch(5, merchant=test_merchant)
+
+    engine = create_engine(DATABASE_URL)
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM public.transactions WHERE merchant = :merchant"), {"merchant": test_merchant})
+
+    # COPY forced (min_rows=0), committed by chunks of 2 rows
+    n_rows = copy_predictions(fake_data, pred_df, chunk_size=2, min_rows=0)
+    assert n_rows == 5, "❌ copy_predictions doit renvoyer le nombre de lignes chargées"
+
+    with engine.connect() as conn:
+        result = conn.execute(
+            text(
+                """
+                SELECT trans_num, is_fraud
+                FROM public.transactions
+                WHERE merchant = :merchant
+                ORDER BY trans_num
+                """
+            ),
+            {"merchant": test_merchant},
+        )
+        loaded = [(trans_num, float(is_fraud)) for trans_num, is_fraud in result]
+    assert loaded == [(f"trans_{i}", float(i % 2)) for i in range(5)], "❌ Les lignes chargées par COPY sont incorrectes"
+    logging.info("✅ Chargement en masse (COPY) OK")
@@ -3,8 +3,9 @@
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
 
-from app.load_model import load_mlflow_model
+from app.load_model import load_mlflow_model, ModelRegistry
 import logging
 
 # Log infos
@@ -19,3 +20,42 @@ def test_load_mlflow_model():
     model = load_mlflow_model()
     assert model is not None, "❌ Le modèle MLflow n'a pas été chargé"
     logging.info("✅ Modèle MLflow chargé")
+
+
+def test_model_registry_keeps_model_in_memory():
+    """
+    Registre du modèle
+    - le modèle est chargé une seule fois au démarrage
+    - tant que l'alias ne bouge pas, refresh() ne recharge rien
+    """
+
+    registry = ModelRegistry(poll_interval=0).start()
+    model = registry.get()
+    assert model is not None, "❌ Le registre n'a pas chargé le modèle"
+
+    assert registry.refresh() is False, "❌ Le modèle ne doit pas être rechargé si l'alias n'a pas bougé"
+    assert registry.get() is model, "❌ Le modèle en mémoire doit rester le même objet"
+    registry.stop()
+    logging.info("✅ Registre du modèle OK")
+
+
+def test_model_registry_listeners():
+    """
+    Écouteurs du registre
+    - appelés tout de suite avec le modèle chargé, puis à chaque changement de modèle
+    - une erreur d'un écouteur ne bloque pas le changement de modèle
+    """
+
+    registry = ModelRegistry(poll_interval=0).start()
+    calls = []
+    registry.add_listener(lambda version, model: calls.append((version, model)))
+    registry.add_listener(lambda version, model: 1 / 0)
+    assert calls == [(registry.version, registry.get())], "❌ L'écouteur doit recevoir le modèle déjà chargé"
+
+    # Alias moved (version in memory made different) : new model loaded, listeners called again
+    version = registry.version
+    registry._current = ("0", registry.get())
+    assert registry.refresh() is True, "❌ Le modèle aurait dû être rechargé"
+    assert calls[-1] == (version, registry.get()) and len(calls) == 2, "❌ L'écouteur doit recevoir le nouveau modèle"
+    registry.stop()
+    logging.info("✅ Écouteurs du registre OK")
@@ -0,0 +1,104 @@
+# pytest tests/test_metrics.py
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+import pytest
+import requests
+from metrics import Histogram, MetricsRegistry, get_metrics, timed, start_metrics_server, write_textfile
+from transform import build_features_from_transaction
+from test_transform import data, index, columns
+import logging
+
+# Log infos
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+
+def test_histogram_cumulative_buckets():
+    """
+    Histogramme (étapes de l'ETL et regroupement du service de scoring) : comptes cumulés par borne,
+    nombre et somme des valeurs
+    """
+    histogram = Histogram([1, 10])
+    for value in (0.5, 1, 5, 50):
+        histogram.observe(value)
+    snapshot = histogram.snapshot()
+    assert snapshot["buckets"] == [(1, 2), (10, 3), ("+Inf", 4)], f"❌ Buckets incorrects : {snapshot['buckets']}"
+    assert snapshot["count"] == 4 and snapshot["sum"] == 56.5, "❌ Nombre / somme incorrects"
+    logging.info("✅ Histogramme OK")
+
+
+def test_timed_records_latency_rows_and_errors():
+    """
+    Fonction instrumentée : chaque appel est compté dans l'histogramme de latence,
+    les lignes traitées et les erreurs sont comptées, l'exception est relancée
+    """
+
+    @timed("test_stage", rows=len)
+    def stage(values):
+        if values is None:
+            raise ValueError("lot vide")
+        return values
+
+    before = get_metrics().stage("test_stage").snapshot()
+    stage([1, 2, 3])
+    with pytest.raises(ValueError):
+        stage(None)
+    after = get_metrics().stage("test_stage").snapshot()
+
+    assert after["count"] - before["count"] == 2, "❌ Les deux appels doivent être comptés"
+    assert after["rows"] - before["rows"] == 3, "❌ 3 lignes traitées attendues"
+    assert after["errors"] - before["errors"] == 1, "❌ 1 erreur attendue"
+    assert after["buckets"][-1] == ("+Inf", after["count"]), "❌ Le bucket +Inf doit contenir tous les appels"
+    logging.info("✅ Instrumentation des étapes OK")
+
+
+def test_render_prometheus_format():
+    """
+    Format texte Prometheus : histogramme par étape, compteurs, jauges (files d'attente)
+    """
+
+    registry = MetricsRegistry()
+    registry.stage("predict_fraud").observe(0.003, rows=50)
+    registry.stage("insert_predictions").observe(2.0, error=True)
+    registry.register_gauge("etl_queue_depth", "Items waiting in front of a stage", "queue", lambda: {"fetch": 4})
+    text = registry.render()
+
+    assert "# TYPE etl_stage_duration_seconds histogram" in text, "❌ Type de l'histogramme absent"
+    assert 'etl_stage_duration_seconds_bucket{stage="predict_fraud",le="0.0025"} 0' in text, "❌ Bucket incorrect"
+    assert 'etl_stage_duration_seconds_bucket{stage="predict_fraud",le="0.005"} 1' in text, "❌ Bucket incorrect"
+    assert 'etl_stage_duration_seconds_count{stage="insert_predictions"} 1' in text, "❌ Nombre d'appels incorrect"
+    assert 'etl_stage_rows_total{stage="predict_fraud"} 50' in text, "❌ Compteur de lignes incorrect"
+    assert 'etl_stage_errors_total{stage="insert_predictions"} 1' in text, "❌ Compteur d'erreurs incorrect"
+    assert 'etl_queue_depth{queue="fetch"} 4' in text, "❌ Jauge de file d'attente absente"
+    logging.info("✅ Format Prometheus OK")
+
+
+def test_metrics_endpoint_and_textfile(tmp_path):
+    """
+    Étapes de l'ETL instrumentées, métriques lisibles sur /metrics et dans le fichier pour node_exporter
+    """
+
+    build_features_from_transaction({"data": data, "index": index, "columns": columns})
+
+    server = start_metrics_server(port=0, host="127.0.0.1")
+    try:
+        response = requests.get(f"http://127.0.0.1:{server.server_port}/metrics", timeout=5)
+        missing = requests.get(f"http://127.0.0.1:{server.server_port}/other", timeout=5)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert response.status_code == 200, f"❌ /metrics renvoie {response.status_code}, attendu 200"
+    assert response.headers["Content-Type"].startswith("text/plain"), "❌ Content-Type incorrect"
+    assert 'etl_stage_duration_seconds_count{stage="build_features_from_transaction"}' in response.text, \
+        "❌ L'étape build_features_from_transaction n'est pas instrumentée"
+    assert missing.status_code == 404, "❌ Seul /metrics doit être servi"
+
+    path = tmp_path / "etl.prom"
+    write_textfile(str(path))
+    assert 'etl_stage_rows_total{stage="build_features_from_transaction"}' in path.read_text(encoding="utf-8"), \
+        "❌ Fichier de métriques incomplet"
+    assert os.listdir(tmp_path) == ["etl.prom"], "❌ Fichier temporaire laissé dans le dossier"
+    logging.info("✅ Endpoint /metrics et fichier texte OK")
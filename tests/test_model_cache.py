@@ -0,0 +1,76 @@
+# pytest tests/test_model_cache.py
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from app.model_cache import ModelArtifactCache, MODEL_FILE
+import logging
+
+# Log infos
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+MODEL_NAME = "fraud_detector_test"
+
+X = np.random.RandomState(42).rand(200, 4)
+y = (X[:, 0] > 0.5).astype(int)
+model = RandomForestClassifier(n_estimators=5, random_state=42).fit(X, y)
+
+
+def test_cache_put_and_get(tmp_path):
+    """
+    Le modèle mis en cache doit être rechargé à l'identique
+    """
+
+    cache = ModelArtifactCache(cache_dir=str(tmp_path))
+    assert cache.get(MODEL_NAME, "1") is None, "❌ Le cache doit être vide"
+
+    cache.put(MODEL_NAME, "1", model)
+    cached_model = cache.get(MODEL_NAME, "1")
+
+    assert cached_model is not None, "❌ Le modèle n'a pas été rechargé depuis le cache"
+    assert (cached_model.predict(X) == model.predict(X)).all(), "❌ Les prédictions du modèle en cache diffèrent"
+    assert cache.latest_version(MODEL_NAME) == "1", "❌ La dernière version en cache doit être la 1"
+    logging.info("✅ Mise en cache du modèle OK")
+
+
+def test_cache_rejects_corrupted_file(tmp_path):
+    """
+    Un fichier modifié sur disque ne doit pas être chargé (checksum)
+    """
+
+    cache = ModelArtifactCache(cache_dir=str(tmp_path))
+    entry_dir = cache.put(MODEL_NAME, "1", model)
+
+    with open(os.path.join(entry_dir, MODEL_FILE), "r+b") as f:
+        f.seek(10)
+        f.write(b"corrupted")
+
+    assert cache.get(MODEL_NAME, "1") is None, "❌ Un modèle corrompu ne doit pas être chargé"
+    assert not os.path.exists(entry_dir), "❌ L'entrée corrompue doit être supprimée"
+    logging.info("✅ Contrôle du checksum OK")
+
+
+def test_cache_lru_eviction(tmp_path):
+    """
+    Au-delà de la taille max, la version la moins récemment utilisée est supprimée
+    """
+
+    cache = ModelArtifactCache(cache_dir=str(tmp_path))
+    entry_dir = cache.put(MODEL_NAME, "1", model)
+    model_size = os.path.getsize(os.path.join(entry_dir, MODEL_FILE))
+
+    # Room for two models only
+    cache.max_bytes = 2 * model_size
+    cache.put(MODEL_NAME, "2", model)
+    os.utime(os.path.join(entry_dir, "meta.json"), (0, 0))
+    cache.put(MODEL_NAME, "3", model)
+
+    assert cache.get(MODEL_NAME, "1") is None, "❌ La version 1 aurait dû être évincée"
+    assert cache.get(MODEL_NAME, "2") is not None, "❌ La version 2 doit rester en cache"
+    assert cache.get(MODEL_NAME, "3") is not None, "❌ La version 3 doit rester en cache"
+    assert cache.size() <= cache.max_bytes, "❌ Le cache dépasse la taille max"
+    logging.info("✅ Eviction LRU OK")
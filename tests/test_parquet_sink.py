@@ -0,0 +1,133 @@
+# pytest tests/test_parquet_sink.py
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+import io
+import pandas as pd
+import pyarrow.parquet as pq
+from parquet_sink import ParquetSink, read_partition, to_arrow_table, GOLD_SCHEMA
+import storage
+from storage import S3Uploader
+from conftest import TEST_BUCKET
+import logging
+
+# Log infos
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+GOLD_TEST_PREFIX = "test/gold"
+
+
+## n_rows transactions with classification, at the given unix time
+def make_predictions(n_rows, unix_time):
+
+    return pd.DataFrame(
+        [
+            {
+                "cc_num": 4653879239169997, "merchant": "fraud_Morissette-Schaefer", "category": "personal_care",
+                "amt": 50.29, "first": "Monica", "last": "Tucker", "gender": "F", "street": "302 Christina Islands",
+                "city": "Smiths Grove", "state": "KY", "zip": 42171, "lat": 37.0581, "long": -86.1938,
+                "city_pop": 6841, "job": "Therapist, sports", "dob": "1999-06-06", "trans_num": f"trans_{unix_time}_{i}",
+                "merch_lat": 36.708164, "merch_long": -86.996368, "unix_time": unix_time,
+                "trans_date_trans_time": "2025-12-09 21:54:49", "classification": 0.0
+            }
+            for i in range(n_rows)
+        ]
+    )
+
+
+def test_to_arrow_table_keeps_missing_values():
+    """
+    Valeurs manquantes (None / NaN) écrites comme null, jamais comme les textes "None" / "nan"
+    """
+    predictions = make_predictions(3, 1765317289.296)
+    predictions["job"] = predictions["job"].astype(object)
+    predictions.loc[0, "job"] = None
+    predictions.loc[1, "job"] = float("nan")
+    predictions.loc[1, "zip"] = None
+    predictions["dob"] = [19990606, "1999-06-06", None]
+
+    table = to_arrow_table(predictions, GOLD_SCHEMA)
+    assert table.schema == GOLD_SCHEMA, "❌ Schéma différent de GOLD_SCHEMA"
+    assert table.column("job").to_pylist() == [None, None, "Therapist, sports"], "❌ Texte manquant mal écrit"
+    assert table.column("zip").to_pylist() == [42171.0, None, 42171.0], "❌ Nombre manquant mal écrit"
+    assert table.column("dob").to_pylist() == ["19990606", "1999-06-06", None], "❌ Valeurs converties en texte attendues"
+    logging.info("✅ Valeurs manquantes écrites comme null")
+
+
+def test_parquet_sink_flush_by_size(s3_bucket):
+    """
+    Le buffer est écrit quand il atteint max_rows :
+    - un fichier Parquet par partition dt=YYYY-MM-DD/hour=HH
+    - schéma typé, noms de fichiers uniques
+    """
+    uploader = S3Uploader(workers=1)
+    sink = ParquetSink(GOLD_TEST_PREFIX, GOLD_SCHEMA, max_rows=5, max_seconds=0, bucket=TEST_BUCKET, uploader=uploader)
+
+    # 2025-12-09 21:xx UTC and 2025-12-09 22:xx UTC
+    sink.add(make_predictions(2, 1765317289.296))
+    assert s3_bucket.list_objects_v2(Bucket=TEST_BUCKET).get("KeyCount") == 0, "❌ Rien ne doit être écrit avant max_rows"
+    sink.add(make_predictions(3, 1765320889.296))
+    uploader.flush()
+    assert sink.flush(wait=True) == [], "❌ Le buffer aurait dû être vidé à 5 lignes"
+
+    listed = sorted(obj["Key"] for obj in s3_bucket.list_objects_v2(Bucket=TEST_BUCKET)["Contents"])
+    assert len(listed) == 2, "❌ Un fichier par heure est attendu"
+    assert listed[0].startswith(f"{GOLD_TEST_PREFIX}/dt=2025-12-09/hour=21/part-"), "❌ Partition incorrecte"
+    assert listed[1].startswith(f"{GOLD_TEST_PREFIX}/dt=2025-12-09/hour=22/part-"), "❌ Partition incorrecte"
+
+    body = s3_bucket.get_object(Bucket=TEST_BUCKET, Key=listed[0])["Body"].read()
+    table = pq.read_table(io.BytesIO(body))
+    assert table.schema.equals(GOLD_SCHEMA), "❌ Le schéma Parquet est incorrect"
+    assert table.num_rows == 2, "❌ La partition 21h doit contenir 2 lignes"
+    uploader.shutdown()
+    logging.info("✅ Ecriture Parquet partitionnée OK")
+
+
+def test_parquet_sink_retry_does_not_duplicate(s3_bucket, monkeypatch):
+    """
+    Envoi de la 2e partition en erreur puis réessayé : la 1re partition est réécrite sous la même clé,
+    aucune ligne en double
+    """
+    client = storage.get_s3_client()
+    put_object = client.put_object
+    calls = []
+
+    def flaky_put_object(**kwargs):
+        calls.append(kwargs["Key"])
+        if "/hour=22/" in kwargs["Key"] and calls.count(kwargs["Key"]) == 1:
+            raise ConnectionError("S3 indisponible")
+        return put_object(**kwargs)
+
+    monkeypatch.setattr(client, "put_object", flaky_put_object)
+    uploader = S3Uploader(workers=1, retries=2, backoff=0)
+    sink = ParquetSink(GOLD_TEST_PREFIX, GOLD_SCHEMA, max_rows=1000, max_seconds=0, bucket=TEST_BUCKET, uploader=uploader)
+    sink.add(make_predictions(2, 1765317289.296))
+    sink.add(make_predictions(3, 1765320889.296))
+    keys = sink.flush().result()
+    uploader.shutdown()
+
+    assert len(calls) == 4 and calls[:2] == calls[2:] == keys, f"❌ Les mêmes clés doivent être renvoyées : {calls}"
+    listed = [obj["Key"] for obj in s3_bucket.list_objects_v2(Bucket=TEST_BUCKET)["Contents"]]
+    assert sorted(listed) == sorted(keys), f"❌ Un fichier par partition attendu : {listed}"
+    day = read_partition(GOLD_TEST_PREFIX, "2025-12-09", bucket=TEST_BUCKET)
+    assert len(day) == 5 and day["trans_num"].is_unique, "❌ Lignes en double après la nouvelle tentative"
+    logging.info("✅ Nouvelle tentative sans doublon")
+
+
+def test_read_partition(s3_bucket):
+    """
+    Lecture d'une journée complète de GOLD en un seul DataFrame
+    """
+    sink = ParquetSink(GOLD_TEST_PREFIX, GOLD_SCHEMA, max_rows=1000, max_seconds=0, bucket=TEST_BUCKET)
+    sink.add(make_predictions(2, 1765317289.296))
+    sink.flush(wait=True)
+    sink.add(make_predictions(3, 1765320889.296))
+    sink.flush(wait=True)
+
+    day = read_partition(GOLD_TEST_PREFIX, "2025-12-09", bucket=TEST_BUCKET)
+    assert len(day) == 5, "❌ La journée doit contenir 5 transactions"
+    assert day["trans_num"].is_unique, "❌ Aucune transaction ne doit être écrasée"
+    logging.info("✅ Lecture d'une journée GOLD OK")
@@ -0,0 +1,106 @@
+# pytest tests/test_profiling.py
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+import time
+import pstats
+import signal
+from metrics import timed
+from profiling import WorkerProfiler
+import logging
+
+# Log infos
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+
+@timed("profiled_stage")
+def profiled_stage(duration: float = 0.02):
+
+    end_time = time.perf_counter() + duration
+    total = 0
+    while time.perf_counter() < end_time:
+        total += sum(range(100))
+    return total
+
+## Lines kept alive between runs (memory growing at every run)
+LEAK = []
+
+def leaking_run():
+
+    LEAK.append([str(i) for i in range(5000)])
+    profiled_stage(0.001)
+
+
+def test_cprofile_capture_on_signal(tmp_path):
+    """
+    Profilage cProfile demandé par signal (SIGUSR1) :
+    - rien n'est capturé avant le signal
+    - les 2 itérations suivantes sont profilées, puis le profil est écrit (pstats + résumé par étape)
+    """
+
+    profiler = WorkerProfiler(mode="cprofile", iterations=2, seconds=0, memory=False, output_dir=str(tmp_path))
+    previous_handler = signal.getsignal(signal.SIGUSR1)
+    try:
+        profiler.install_signal()
+        with profiler.iteration():
+            profiled_stage()
+        assert profiler.session is None and not os.listdir(tmp_path), "❌ Aucun profil attendu avant le signal"
+
+        os.kill(os.getpid(), signal.SIGUSR1)
+        for _ in range(3):
+            with profiler.iteration():
+                profiled_stage()
+    finally:
+        signal.signal(signal.SIGUSR1, previous_handler)
+
+    assert profiler.session is None, "❌ Le profilage doit s'arrêter après 2 itérations"
+    assert sorted(os.path.splitext(path)[1] for path in profiler.last_paths) == [".pstats", ".txt"], \
+        "❌ Fichiers pstats et texte attendus"
+    report = open(profiler.last_paths[1], encoding="utf-8").read()
+    assert "2 runs" in report, "❌ Le profil doit couvrir 2 itérations"
+    assert "profiled_stage" in report.split("\n\n")[0], "❌ L'étape instrumentée doit figurer dans le résumé"
+    stats = pstats.Stats(profiler.last_paths[0])
+    assert any(name == "profiled_stage" and calls == 2 for (_, _, name), (_, calls, *_) in stats.stats.items()), \
+        "❌ 2 appels de l'étape attendus dans le pstats"
+    logging.info("✅ Profilage cProfile à la demande OK")
+
+
+def test_sampling_capture_annotates_stages(tmp_path):
+    """
+    Profilage par échantillonnage : piles au format 'collapsed', racine = étape de l'ETL en cours
+    """
+
+    profiler = WorkerProfiler(mode="sampling", iterations=1, seconds=0, memory=False,
+                              output_dir=str(tmp_path), interval=0.001)
+    profiler.request()
+    with profiler.iteration():
+        profiled_stage(0.3)
+
+    collapsed = open(profiler.last_paths[0], encoding="utf-8").read().splitlines()
+    assert collapsed, "❌ Aucun échantillon"
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in collapsed), "❌ Format 'pile compte' attendu"
+    assert any(line.startswith("stage:profiled_stage;thread:MainThread;") for line in collapsed), \
+        "❌ Les piles de l'étape doivent être annotées"
+    logging.info("✅ Profilage par échantillonnage OK")
+
+
+def test_memory_growth_report(tmp_path):
+    """
+    Différence de snapshots tracemalloc : la ligne qui garde de la mémoire à chaque itération apparaît en tête
+    """
+
+    profiler = WorkerProfiler(mode="cprofile", iterations=4, seconds=0, memory=True, output_dir=str(tmp_path))
+    profiler.request()
+    for _ in range(4):
+        with profiler.iteration():
+            leaking_run()
+    LEAK.clear()
+
+    memory_path = [path for path in profiler.last_paths if path.endswith(".memory.txt")][0]
+    lines = open(memory_path, encoding="utf-8").read().splitlines()
+    assert "over 3 runs" in lines[1], "❌ La croissance doit être mesurée après la 1re itération"
+    assert "test_profiling.py" in lines[2], "❌ La ligne qui garde la mémoire doit apparaître en tête"
+    logging.info("✅ Rapport de croissance mémoire OK")
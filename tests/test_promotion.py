@@ -0,0 +1,48 @@
+# pytest tests/test_promotion.py
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "train"))
+
+from compiled_model import compile_pipeline
+from promotion import benchmark_candidate, promotion_failures
+from conftest import make_transactions, train_pipeline
+import logging
+
+# Log infos
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+METRICS = {"single_row_p99_ms": 12.0, "batch_rows_per_s": 50000.0, "model_size_mb": 3.0, "test_f1": 0.9}
+
+
+def test_benchmark_candidate():
+    """Le banc d'essai du candidat mesure latence, débit, taille, temps de chargement et qualité"""
+
+    data = make_transactions(1200)
+    model = train_pipeline(data.iloc[:1000])
+    X_test, y_test = data.iloc[1000:].drop(columns="is_fraud"), data.iloc[1000:]["is_fraud"]
+
+    metrics = benchmark_candidate(model, X_test, y_test, compile_pipeline(model))
+    for name in ("single_row_p50_ms", "single_row_p99_ms", "compiled_single_row_p50_ms", "compiled_single_row_p99_ms",
+                 "batch_rows_per_s", "model_size_mb", "model_load_seconds"):
+        assert metrics[name] > 0, f"❌ {name} non mesuré"
+    assert metrics["single_row_p50_ms"] <= metrics["single_row_p99_ms"], "❌ p50 au-dessus du p99"
+    assert 0 <= metrics["test_f1"] <= 1, "❌ F1 invalide"
+    logging.info("✅ Candidat mesuré : " + ", ".join(f"{name} {value:.4g}" for name, value in metrics.items()))
+
+def test_promotion_failures():
+    """Le candidat n'est promu que si les seuils de latence, débit, taille et qualité sont respectés"""
+
+    assert promotion_failures(METRICS, max_p99_ms=50, min_rows_per_s=10000, max_model_mb=100, min_f1=0.8) == [], \
+        "❌ Candidat dans le budget refusé"
+
+    failures = promotion_failures(METRICS, max_p99_ms=10, min_rows_per_s=100000, max_model_mb=100, min_f1=0.95)
+    assert [name for name, _, _ in failures] == ["single_row_p99_ms", "batch_rows_per_s", "test_f1"], \
+        f"❌ Seuils dépassés mal détectés : {failures}"
+
+    # 0 : threshold not checked
+    assert promotion_failures(METRICS, max_p99_ms=0, min_rows_per_s=0, max_model_mb=0, min_f1=0) == [], \
+        "❌ Un seuil à 0 ne devrait pas être vérifié"
+    logging.info("✅ Seuils de promotion appliqués")
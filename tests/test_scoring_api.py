@@ -0,0 +1,102 @@
+# pytest tests/test_scoring_api.py
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fastAPI", "server"))
+
+import json
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+import logging
+
+# Log infos
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+with open(os.path.join(ROOT_DIR, "test.json"), encoding="utf-8") as f:
+    RECORDS = json.load(f)
+
+
+@pytest.fixture(scope="module")
+def client():
+    """
+    Service de scoring démarré une fois (modèle chargé au démarrage)
+    """
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def test_predict_one_transaction(client):
+    """
+    /predict : une transaction au format test.json -> classification + probabilité
+    """
+    response = client.post("/predict", json=RECORDS[0])
+    assert response.status_code == 200, f"❌ /predict renvoie {response.status_code}"
+    prediction = response.json()
+    assert prediction["trans_num"] == RECORDS[0]["trans_num"], "❌ trans_num incorrect"
+    assert prediction["classification"] in (0, 1), "❌ Classification hors de {0, 1}"
+    assert 0.0 <= prediction["probability"] <= 1.0, "❌ Probabilité hors de [0, 1]"
+    logging.info("✅ /predict OK")
+
+
+def test_predict_batch_matches_model(client):
+    """
+    /predict/batch : mêmes résultats que model.predict / model.predict_proba sur les mêmes lignes
+    """
+    response = client.post("/predict/batch", json=RECORDS)
+    assert response.status_code == 200, f"❌ /predict/batch renvoie {response.status_code}"
+    predictions = response.json()["predictions"]
+
+    model = app.state.registry.get()
+    features = pd.DataFrame(RECORDS)
+    assert [p["classification"] for p in predictions] == model.predict(features).astype(int).tolist(), \
+        "❌ Classifications différentes de model.predict"
+    assert [p["probability"] for p in predictions] == pytest.approx(model.predict_proba(features)[:, 1].tolist()), \
+        "❌ Probabilités différentes de model.predict_proba"
+    logging.info("✅ /predict/batch OK")
+
+
+def test_predict_rejects_invalid_transaction(client):
+    """
+    Transaction incomplète : erreur 422, le service continue de répondre
+    """
+    record = dict(RECORDS[0])
+    del record["amt"]
+    assert client.post("/predict", json=record).status_code == 422, "❌ Une transaction sans 'amt' doit être refusée"
+    assert client.get("/health").json()["status"] == "ok", "❌ Le service ne répond plus"
+    logging.info("✅ Validation des transactions OK")
+
+
+def test_batching_metrics(client):
+    """
+    Requêtes regroupées : histogrammes de taille de lot et d'attente exposés
+    """
+    client.post("/predict", json=RECORDS[1])
+    metrics = client.get("/metrics/batching").json()
+    assert metrics["enabled"], "❌ Le regroupement dynamique devrait être actif par défaut"
+    assert metrics["batch_size"]["count"] >= 1, "❌ Aucun lot compté"
+    assert metrics["wait_ms"]["buckets"]["+Inf"] >= 1, "❌ Aucune attente comptée"
+    logging.info("✅ Métriques de regroupement OK")
+
+
+def test_scoring_model_compiled_at_swap(client):
+    """
+    Forêt compilée au changement de modèle (pas pendant les requêtes), scoring sklearn si la compilation échoue
+    """
+    import main
+    from compiled_model import CompiledForest
+    model = app.state.registry.get()
+    assert isinstance(main.get_scoring_model(), CompiledForest), "❌ Le modèle chargé devrait être compilé"
+
+    # Any error of the compilation (not only ValueError) : sklearn model kept for scoring
+    broken = object()
+    main.prepare_scoring_model("broken", broken)
+    assert main.get_scoring_model() is broken, "❌ Modèle non compilable : le modèle sklearn devrait être utilisé"
+
+    main.prepare_scoring_model(app.state.registry.version, model)
+    assert client.post("/predict", json=RECORDS[0]).status_code == 200, "❌ Le service ne répond plus"
+    logging.info("✅ Modèle compilé au chargement")
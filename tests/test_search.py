@@ -0,0 +1,70 @@
+# pytest tests/test_search.py
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "train"))
+
+import pytest
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import FunctionTransformer, OneHotEncoder, StandardScaler
+from features import features_engineering
+from search import search, parse_grid
+from conftest import make_transactions
+import logging
+
+# Log infos
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+ENGINEERING_CALLS = []
+
+
+## features_engineering counting its calls (preprocessing done once, whatever the number of candidates)
+def counted_features_engineering(data):
+
+    ENGINEERING_CALLS.append(len(data))
+    return features_engineering(data)
+
+
+def test_parse_grid():
+    """La grille en ligne de commande donne les valeurs typées de chaque paramètre"""
+
+    grid = parse_grid("n_estimators=5,20; min_samples_split=2 ;max_features=sqrt,None,0.5")
+    assert grid == {"n_estimators": [5, 20], "min_samples_split": [2], "max_features": ["sqrt", None, 0.5]}, \
+        f"❌ Grille mal lue : {grid}"
+    with pytest.raises(ValueError):
+        parse_grid("n_estimators")
+    logging.info("✅ Grille lue")
+
+def test_search_preprocessing_once():
+    """Chaque candidat est évalué, le meilleur en premier, le prétraitement n'est fait qu'une fois"""
+
+    data = make_transactions(600)
+    X, y = data.drop(columns="is_fraud"), data["is_fraud"].astype(int)
+    engineered = features_engineering(X)
+    categorical_features = engineered.select_dtypes("object").columns
+    numeric_features = engineered.columns[~engineered.columns.isin(categorical_features)]
+    preprocessor = Pipeline(steps=[
+        ("Features_engineering", FunctionTransformer(counted_features_engineering)),
+        ("Features_transforming", ColumnTransformer(transformers=[
+            ("categorical_transformer", OneHotEncoder(drop='first'), categorical_features),
+            ("numeric_transformer", StandardScaler(), numeric_features)]))])
+
+    ENGINEERING_CALLS.clear()
+    results = search(preprocessor, RandomForestClassifier(random_state=42), X, y,
+                     parse_grid("n_estimators=3,6;min_samples_split=2,8"), workers=2)
+
+    assert len(results) == 4, "❌ 4 candidats attendus"
+    assert sorted(str(result["params"]) for result in results) == sorted(
+        str(params) for params in [{"min_samples_split": 2, "n_estimators": 3}, {"min_samples_split": 2, "n_estimators": 6},
+                                   {"min_samples_split": 8, "n_estimators": 3}, {"min_samples_split": 8, "n_estimators": 6}]), \
+        "❌ Candidats manquants"
+    f1_scores = [result["metrics"]["f1"] for result in results]
+    assert f1_scores == sorted(f1_scores, reverse=True), "❌ Le meilleur candidat devrait être en premier"
+    assert all(result["trial_seconds"] >= result["fit_seconds"] > 0 for result in results), "❌ Durées manquantes"
+    # fit_transform on the fitting part + transform on the validation part, never per candidate
+    assert ENGINEERING_CALLS == [480, 120], f"❌ Prétraitement refait : {ENGINEERING_CALLS}"
+    logging.info("✅ 4 candidats évalués sur un seul prétraitement")
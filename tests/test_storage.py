@@ -0,0 +1,87 @@
+# pytest tests/test_storage.py
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+import threading
+import pandas as pd
+import pytest
+import storage
+import transform
+from conftest import TEST_BUCKET
+import logging
+
+# Log infos
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+
+def test_shared_s3_client():
+    """
+    Un seul client S3 pour tout le processus
+    """
+    assert storage.get_s3_client() is storage.get_s3_client(), "❌ Le client S3 doit être partagé"
+    logging.info("✅ Client S3 partagé OK")
+
+
+def test_uploader_runs_in_background(s3_bucket):
+    """
+    Les envois S3 sont faits en arrière-plan :
+    - submit() rend la main sans attendre l'envoi
+    - après flush(), les fichiers SILVER et GOLD sont dans le bucket
+    """
+    uploader = storage.S3Uploader(workers=2, queue_size=4)
+    features = pd.DataFrame([{"trans_num": "abc", "amt": 10.5}])
+
+    gate = threading.Event()
+    blocked = uploader.submit(gate.wait)
+    silver = uploader.submit(transform.save_features_to_s3, features, "unused")
+    assert not blocked.done(), "❌ submit() ne doit pas attendre la fin de l'envoi"
+    gate.set()
+
+    uploader.flush()
+    assert uploader.queue_depth == 0, "❌ Tous les envois doivent être terminés après flush()"
+
+    keys = [obj["Key"] for obj in s3_bucket.list_objects_v2(Bucket=TEST_BUCKET)["Contents"]]
+    assert silver.result() in keys, "❌ Le fichier SILVER est absent du bucket"
+    uploader.shutdown()
+    logging.info("✅ Envois S3 en arrière-plan OK")
+
+
+def test_uploader_retries_failed_uploads():
+    """
+    Un envoi en erreur est retenté avant d'être abandonné
+    """
+    uploader = storage.S3Uploader(workers=1, queue_size=2, retries=2, backoff=0)
+    calls = []
+
+    def flaky_upload():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConnectionError("S3 indisponible")
+        return "ok"
+
+    assert uploader.submit(flaky_upload).result() == "ok", "❌ L'envoi aurait dû réussir après 2 erreurs"
+    assert len(calls) == 3, "❌ L'envoi doit être tenté 3 fois"
+
+    failing = uploader.submit(lambda: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        failing.result()
+    assert uploader.failed == 1, "❌ L'envoi abandonné doit être compté"
+    uploader.shutdown()
+    logging.info("✅ Nouvelles tentatives des envois S3 OK")
+
+
+def test_uploader_releases_slot_when_submit_fails():
+    """
+    Envoi refusé par le pool (arrêté) : la place dans la file est rendue, submit ne bloque pas ensuite
+    """
+    uploader = storage.S3Uploader(workers=1, queue_size=1)
+    uploader._executor.shutdown(wait=True)
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            uploader.submit(lambda: "ok")
+    assert uploader._slots.acquire(blocking=False), "❌ La place dans la file n'a pas été rendue"
+    logging.info("✅ Place rendue quand l'envoi n'est pas mis en file")
@@ -0,0 +1,82 @@
+# pytest tests/test_stream_pipeline.py
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+import time
+import random
+import asyncio
+import extract
+import stream_pipeline
+from stream_pipeline import StreamingPipeline, Batch, run_stage, STOP
+from load import pg_connect
+from fake_api import FakeTransactionAPI, COLUMNS
+from conftest import TEST_BUCKET
+import logging
+
+# Log infos
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+
+def test_run_stage_ordered_sink():
+    """
+    Étape amont à 4 tâches (durées aléatoires : les lots en sortent dans le désordre) :
+    - un puits "ordered" reçoit les lots dans l'ordre de collecte
+    - un lot en erreur garde sa place et n'est pas traité par les étapes suivantes
+    """
+    def slow_body(batch):
+        time.sleep(random.uniform(0, 0.02))
+        if batch.seq == 3:
+            raise ValueError("lot invalide")
+
+    received = []
+
+    async def scenario():
+        inbox, middle = asyncio.Queue(maxsize=2), asyncio.Queue(maxsize=2)
+
+        async def produce():
+            for seq in range(20):
+                await inbox.put(Batch(seq, {"columns": [], "data": [[]]}, "ts"))
+            await inbox.put(STOP)
+
+        await asyncio.gather(
+            produce(),
+            run_stage("slow", slow_body, inbox, [middle], concurrency=4),
+            run_stage("sink", lambda batch: received.append(batch.seq), middle, [], ordered=True))
+
+    asyncio.run(scenario())
+    assert received == [seq for seq in range(20) if seq != 3], f"❌ Ordre incorrect : {received}"
+    logging.info("✅ Puits ordonné OK")
+
+
+def test_streaming_pipeline_end_to_end(s3_bucket, monkeypatch):
+    """
+    API locale -> features -> score -> S3 (moto) + base de données :
+    - toutes les transactions collectées sont en base
+    - RAW / SILVER / GOLD archivés pour chaque lot
+    """
+    monkeypatch.setattr(extract, "S3_BUCKET", TEST_BUCKET)
+    monkeypatch.setattr(stream_pipeline, "LAKE_FORMAT", "csv")
+
+    with FakeTransactionAPI() as fake_api:
+        pipeline = StreamingPipeline(url=fake_api.url, fetch_concurrency=4, rate_limit=0,
+                                     batch_size=10, batch_wait_ms=500, queue_size=2)
+        stats = pipeline.run(max_rows=30)
+
+    assert stats["fetch"]["rows"] == 30, "❌ 30 transactions auraient dû être collectées"
+    assert stats["db"]["rows"] == 30 and stats["db"]["errors"] == 0, f"❌ Écriture en base incomplète : {stats}"
+    assert stats["archive"]["batches"] == stats["fetch"]["batches"], "❌ Archivage S3 incomplet"
+
+    keys = [obj["Key"] for obj in s3_bucket.list_objects_v2(Bucket=TEST_BUCKET)["Contents"]]
+    for prefix in ("bloc4/data/raw/", "bloc4/data/silver/", "bloc4/data/gold/"):
+        assert sum(key.startswith(prefix) for key in keys) == stats["fetch"]["batches"], f"❌ Fichiers {prefix} manquants"
+
+    conn = pg_connect()
+    with conn.cursor() as cur:
+        cur.execute("SELECT count(*) FROM public.transactions WHERE trans_num LIKE %s AND merchant LIKE 'fraud_%%'",
+                    ("%0000001d",))
+        assert cur.fetchone()[0] >= 1, "❌ La 30e transaction est absente de la base"
+    conn.close()
+    logging.info("✅ Pipeline en flux OK")
@@ -3,9 +3,10 @@
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
 
 import pandas as pd
-from app.transform import build_features_from_transaction, predict_fraud
+from app.transform import build_features_from_transaction, build_features_from_frame, predict_fraud
 from app.load_model import load_mlflow_model
 import logging
 
@@ -82,6 +83,32 @@ def test_build_features_from_transaction():
     logging.info("✅ La fonction 'build_features' est OK")
 
 
+def test_build_features_same_as_pandas():
+    """
+    Construction par schéma compilé : même DataFrame (valeurs et dtypes) que la version pandas
+    - plusieurs lignes, millisecondes et dates avant 1970
+    - disposition de colonnes inhabituelle (colonne 'unix_time' déjà présente) : version pandas
+    """
+
+    rows = [list(data[0]) for _ in range(4)]
+    rows[1][3], rows[1][-1] = 12, 1765317289999
+    rows[2][3], rows[2][-1] = 7.5, -1
+    rows[3][-1] = 0
+    test_transaction = {"data": rows, "index": list(range(4)), "columns": columns}
+
+    expected = build_features_from_frame(test_transaction)
+    df = build_features_from_transaction(test_transaction)
+    pd.testing.assert_frame_equal(df, expected, check_exact=True)
+    assert df.loc[2, "trans_date_trans_time"] == "1969-12-31 23:59:59", "❌ Date avant 1970 incorrecte"
+
+    # Colonne 'unix_time' déjà présente / valeur manquante : version pandas
+    unusual = {"data": [row + [1.0] for row in rows], "index": list(range(4)), "columns": columns + ["unix_time"]}
+    pd.testing.assert_frame_equal(build_features_from_transaction(unusual), build_features_from_frame(unusual))
+    rows[0][10] = None
+    pd.testing.assert_frame_equal(build_features_from_transaction(test_transaction), build_features_from_frame(test_transaction))
+    logging.info("✅ Construction des features identique à la version pandas")
+
+
 def test_predict_fraud():
     """
     Test simple :
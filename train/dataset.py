@@ -0,0 +1,280 @@
+# python train/dataset.py --data data/fraudTest.csv
+# Training dataset : the CSV is parsed once (by chunks) with explicit dtypes, then written as a Parquet snapshot
+# (categories, compact integers) that the next runs read instead. The snapshot is rebuilt when the CSV changes.
+# The balanced training sample is drawn from the chunks, without ever loading the whole dataset.
+
+import os
+import json
+import time
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import logging
+
+# Log infos
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# === Training data settings ===
+TRAIN_DATA_PATH = os.getenv("TRAIN_DATA_PATH", "data/fraudTest.csv")
+## Snapshots directory ('' : next to the CSV, in .snapshots/)
+TRAIN_SNAPSHOT_DIR = os.getenv("TRAIN_SNAPSHOT_DIR", "")
+HASH_BLOCK_SIZE = 1024 * 1024
+## Rows per chunk (CSV parsing, snapshot row groups, sampling) : memory used beside the sample
+TRAIN_CHUNK_SIZE = int(os.getenv("TRAIN_CHUNK_SIZE", "100000"))
+## Negatives kept by the undersampling (class 0 reduced to this size)
+TRAIN_NEGATIVES = int(os.getenv("TRAIN_NEGATIVES", "55000"))
+
+## Columns of fraudTest.csv (first column : row index)
+## Low-cardinality strings as categories, integers as small as their range allows, coordinates and amounts kept in float64
+## (float32 would change the values seen by the model)
+DTYPES = {
+    "trans_date_trans_time": "object",
+    "cc_num": "int64",
+    "merchant": "category",
+    "category": "category",
+    "amt": "float64",
+    "first": "category",
+    "last": "category",
+    "gender": "category",
+    "street": "category",
+    "city": "category",
+    "state": "category",
+    "zip": "int32",
+    "lat": "float64",
+    "long": "float64",
+    "city_pop": "int32",
+    "job": "category",
+    "dob": "category",
+    "trans_num": "object",
+    "unix_time": "int64",
+    "merch_lat": "float64",
+    "merch_long": "float64",
+    "is_fraud": "int8",
+}
+
+
+## sha256 of the file, read by blocks (the CSV is never held in memory)
+def file_hash(path: str) -> str:
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+## Snapshot of a CSV : <snapshot dir>/<csv name>.parquet, with <csv name>.json (hash of the CSV it was built from)
+def snapshot_paths(data_path: str, snapshot_dir: str = TRAIN_SNAPSHOT_DIR) -> tuple:
+
+    snapshot_dir = snapshot_dir or os.path.join(os.path.dirname(os.path.abspath(data_path)), ".snapshots")
+    name = os.path.splitext(os.path.basename(data_path))[0]
+    return os.path.join(snapshot_dir, f"{name}.parquet"), os.path.join(snapshot_dir, f"{name}.json")
+
+## Typed read of the CSV by chunks of chunk_size rows (columns missing from DTYPES left to pandas)
+def read_dataset_csv(data_path: str, chunk_size: int = TRAIN_CHUNK_SIZE):
+
+    return pd.read_csv(data_path, index_col=0, dtype=DTYPES, chunksize=chunk_size)
+
+## Arrow schema of the snapshot : categories stored as int32 dictionaries (their number differs between chunks)
+def snapshot_schema(chunk: pd.DataFrame) -> pa.Schema:
+
+    schema = pa.Schema.from_pandas(chunk, preserve_index=True)
+    for i, field in enumerate(schema):
+        if pa.types.is_dictionary(field.type):
+            schema = schema.set(i, pa.field(field.name, pa.dictionary(pa.int32(), pa.string())))
+    return schema
+
+## Parse the CSV chunk by chunk into its snapshot (one row group per chunk), then write the hash
+## (Parquet first, then the hash : a half-written snapshot is never used)
+def build_snapshot(data_path: str, snapshot_dir: str = TRAIN_SNAPSHOT_DIR, source_hash: str = None,
+                   chunk_size: int = TRAIN_CHUNK_SIZE) -> str:
+
+    snapshot_path, meta_path = snapshot_paths(data_path, snapshot_dir)
+    os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+    source_hash = source_hash or file_hash(data_path)
+
+    start_time = time.perf_counter()
+    tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    writer, n_rows = None, 0
+    try:
+        for chunk in read_dataset_csv(data_path, chunk_size):
+            if writer is None:
+                schema = snapshot_schema(chunk)
+                writer = pq.ParquetWriter(tmp_path, schema)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=True))
+            n_rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp_path, snapshot_path)
+    with open(f"{meta_path}.{os.getpid()}.tmp", "w", encoding="utf-8") as f:
+        json.dump({"source": os.path.abspath(data_path), "sha256": source_hash, "rows": n_rows}, f)
+    os.replace(f"{meta_path}.{os.getpid()}.tmp", meta_path)
+
+    logging.info(f"✅ Snapshot {snapshot_path} créé ({n_rows} lignes, {time.perf_counter() - start_time:.2f} s)")
+    return snapshot_path
+
+## Hash of the CSV recorded with the snapshot (None : no usable snapshot)
+def snapshot_hash(data_path: str, snapshot_dir: str = TRAIN_SNAPSHOT_DIR) -> str:
+
+    snapshot_path, meta_path = snapshot_paths(data_path, snapshot_dir)
+    if not (os.path.exists(snapshot_path) and os.path.exists(meta_path)):
+        return None
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            return json.load(f).get("sha256")
+    except (OSError, ValueError):
+        return None
+
+## Snapshot built from this very CSV (rebuilt when the CSV changed), returns its path
+def ensure_snapshot(data_path: str = TRAIN_DATA_PATH, snapshot_dir: str = TRAIN_SNAPSHOT_DIR) -> str:
+
+    source_hash = file_hash(data_path)
+    if snapshot_hash(data_path, snapshot_dir) == source_hash:
+        return snapshot_paths(data_path, snapshot_dir)[0]
+    logging.info(f"🚀 Pas de snapshot à jour pour {data_path} : lecture du CSV")
+    return build_snapshot(data_path, snapshot_dir, source_hash)
+
+## Whole typed training data : the snapshot if it was built from this very CSV, otherwise the CSV (and a new snapshot)
+def load_dataset(data_path: str = TRAIN_DATA_PATH, snapshot_dir: str = TRAIN_SNAPSHOT_DIR) -> pd.DataFrame:
+
+    snapshot_path = ensure_snapshot(data_path, snapshot_dir)
+    start_time = time.perf_counter()
+    try:
+        data = pd.read_parquet(snapshot_path, engine="pyarrow")
+    except Exception as e:
+        logging.warning(f"⚠️ Snapshot {snapshot_path} illisible, relecture du CSV ({e})")
+        data = pd.read_parquet(build_snapshot(data_path, snapshot_dir), engine="pyarrow")
+    logging.info(f"✅ Snapshot {snapshot_path} chargé ({len(data)} lignes, {time.perf_counter() - start_time:.2f} s)")
+    return data
+
+## Typed chunks of the training data, never the whole dataset in memory :
+## CSV -> its snapshot (built chunk by chunk if needed), Parquet file or directory of Parquet files -> read as is
+def iter_dataset_chunks(data_path: str = TRAIN_DATA_PATH, snapshot_dir: str = TRAIN_SNAPSHOT_DIR,
+                        chunk_size: int = TRAIN_CHUNK_SIZE):
+
+    if os.path.isdir(data_path):
+        paths = sorted(os.path.join(data_path, name) for name in os.listdir(data_path) if name.endswith(".parquet"))
+    elif data_path.endswith(".parquet"):
+        paths = [data_path]
+    else:
+        paths = [ensure_snapshot(data_path, snapshot_dir)]
+
+    for path in paths:
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield pa.Table.from_batches([batch]).to_pandas()
+
+## Concatenate chunks without losing the categories (pd.concat of categories that differ gives objects)
+def concat_chunks(chunks: list) -> pd.DataFrame:
+
+    chunks = [chunk for chunk in chunks if len(chunk)] or chunks[:1]
+    dtypes = {}
+    for col, dtype in chunks[0].dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            categories = [chunk[col].cat.categories for chunk in chunks]
+            if not all(other.equals(categories[0]) for other in categories[1:]):
+                dtypes[col] = pd.CategoricalDtype(categories[0].append(categories[1:]).unique())
+    if dtypes:
+        chunks = [chunk.astype(dtypes) for chunk in chunks]
+    return pd.concat(chunks)
+
+# === Out-of-core undersampling : every positive kept, negatives drawn by reservoir sampling ===
+class BalancedSampler:
+
+    ## negatives : size of the reservoir / ratio : negatives per positive (at most `negatives`)
+    def __init__(self, negatives: int = TRAIN_NEGATIVES, ratio: float = None, seed: int = 42, label: str = "is_fraud"):
+
+        self.negatives = negatives
+        self.ratio = ratio
+        self.seed = seed
+        self.label = label
+        self.rows = 0
+        self._rng = np.random.default_rng(seed)
+        self._positives = []
+        # Negatives (and their keys) waiting to be merged, largest key kept so far (the reservoir's threshold)
+        self._pending = []
+        self._keys = []
+        self._threshold = np.inf
+
+    ## One chunk : positives stored, each negative gets a random key and the `negatives` smallest keys are kept
+    ## (one key per negative in the order of the source : the sample does not depend on the chunk size)
+    def add(self, chunk: pd.DataFrame):
+
+        self.rows += len(chunk)
+        labels = chunk[self.label].to_numpy()
+        self._positives.append(chunk[labels == 1])
+        negatives = chunk[labels == 0]
+        keys = self._rng.random(len(negatives))
+
+        # Only the negatives with a key below the threshold can still be among the smallest keys
+        entering = keys < self._threshold
+        if entering.any():
+            self._pending.append(negatives[entering])
+            self._keys.append(keys[entering])
+        # Merged once twice the reservoir is waiting (not at every chunk)
+        if sum(len(keys) for keys in self._keys) > 2 * self.negatives:
+            self._trim(self.negatives)
+
+    ## Keep the n smallest keys, in the order of the source
+    def _trim(self, n: int):
+
+        keys = np.concatenate(self._keys) if self._keys else np.empty(0)
+        kept = np.sort(np.argpartition(keys, n - 1)[:n]) if 0 < n < len(keys) else np.arange(min(n, len(keys)))
+        reservoir = concat_chunks(self._pending).iloc[kept] if self._pending else None
+        self._pending = [reservoir] if reservoir is not None else []
+        self._keys = [keys[kept]]
+        if len(kept) >= self.negatives:
+            self._threshold = keys[kept].max() if len(kept) else 0.0
+
+    ## Balanced frame : sampled negatives then every positive, shuffled (seed), index reset as in train.py
+    def result(self) -> pd.DataFrame:
+
+        if not self._positives:
+            raise ValueError("Échantillon impossible : aucun morceau lu (source vide)")
+        positives = concat_chunks(self._positives)
+        n_negatives = self.negatives
+        if self.ratio is not None:
+            n_negatives = min(n_negatives, int(round(self.ratio * len(positives))))
+        self._trim(n_negatives)
+        negatives = self._pending[0] if self._pending else positives.iloc[:0]
+
+        data = concat_chunks([negatives, positives])
+        logging.info(f"✅ Échantillon équilibré : {len(negatives)} négatifs et {len(positives)} positifs "
+                     f"sur {self.rows} lignes")
+        return data.sample(frac=1, random_state=self.seed).reset_index(drop=True)
+
+## Balanced training frame from chunks (iter_dataset_chunks) : memory bounded by the sample, not by the source
+def balanced_sample(chunks, negatives: int = TRAIN_NEGATIVES, ratio: float = None, seed: int = 42,
+                    label: str = "is_fraud") -> pd.DataFrame:
+
+    sampler = BalancedSampler(negatives, ratio, seed, label)
+    for chunk in chunks:
+        sampler.add(chunk)
+    return sampler.result()
+
+## Layout seen by the model, as in production : numbers in float64, strings as str objects (not categories)
+def to_model_input(data: pd.DataFrame) -> pd.DataFrame:
+
+    dtypes = {}
+    for col, dtype in data.dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            dtypes[col] = "object"
+        elif pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_float_dtype(dtype):
+            dtypes[col] = "float64"
+    return data.astype(dtypes)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", default=TRAIN_DATA_PATH, help="fraudTest.csv (TRAIN_DATA_PATH)")
+    parser.add_argument("--snapshot-dir", default=TRAIN_SNAPSHOT_DIR, help="TRAIN_SNAPSHOT_DIR ('' : next to the CSV)")
+    parser.add_argument("--force", action="store_true", help="rebuild the snapshot even if it is up to date")
+    args = parser.parse_args()
+
+    if args.force:
+        build_snapshot(args.data, args.snapshot_dir)
+    else:
+        ensure_snapshot(args.data, args.snapshot_dir)
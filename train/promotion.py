@@ -0,0 +1,102 @@
+# Promotion gate of train/train.py : the candidate is benchmarked (latency, throughput, size, load time, quality)
+# before the "production" alias is moved. A candidate over the budget stays registered, without the alias.
+
+import os
+import time
+import tempfile
+import numpy as np
+import mlflow.sklearn
+from sklearn.metrics import f1_score, precision_score, recall_score
+import logging
+
+# Log infos
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# === Promotion thresholds (0 : not checked) ===
+## p99 of one transaction scored by the sklearn pipeline (worker, fallback of the scoring API)
+PROMOTION_MAX_P99_MS = float(os.getenv("PROMOTION_MAX_P99_MS", "100"))
+## Transactions per second scored by batches of PROMOTION_BATCH_SIZE
+PROMOTION_MIN_ROWS_PER_S = float(os.getenv("PROMOTION_MIN_ROWS_PER_S", "10000"))
+## Pickled pipeline, as downloaded and loaded by the worker and the scoring API
+PROMOTION_MAX_MODEL_MB = float(os.getenv("PROMOTION_MAX_MODEL_MB", "200"))
+## F1 score on the test set
+PROMOTION_MIN_F1 = float(os.getenv("PROMOTION_MIN_F1", "0.8"))
+
+## Single transactions scored (after PROMOTION_WARMUP untimed ones) and rows per batch
+PROMOTION_SAMPLES = int(os.getenv("PROMOTION_SAMPLES", "200"))
+PROMOTION_WARMUP = 10
+PROMOTION_BATCH_SIZE = int(os.getenv("PROMOTION_BATCH_SIZE", "10000"))
+PROMOTION_BATCH_REPEAT = 3
+
+
+## Latency of each call of func(i) for i in range(n_calls), in ms
+def time_calls(func, n_calls: int) -> np.ndarray:
+
+    timings = np.empty(n_calls)
+    for i in range(n_calls):
+        start_time = time.perf_counter()
+        func(i)
+        timings[i] = time.perf_counter() - start_time
+    return timings * 1000
+
+## One transaction at a time : p50 / p99 (ms)
+def single_row_latency(model, X, prefix: str, samples: int = PROMOTION_SAMPLES) -> dict:
+
+    rows = [X.iloc[[i % len(X)]] for i in range(samples + PROMOTION_WARMUP)]
+    time_calls(lambda i: model.predict_proba(rows[i]), PROMOTION_WARMUP)
+    timings = time_calls(lambda i: model.predict_proba(rows[PROMOTION_WARMUP + i]), samples)
+    p50, p99 = np.percentile(timings, [50, 99])
+    return {f"{prefix}single_row_p50_ms": float(p50), f"{prefix}single_row_p99_ms": float(p99)}
+
+## Transactions per second on batches of batch_size rows (median of PROMOTION_BATCH_REPEAT runs)
+def batch_throughput(model, X, batch_size: int = PROMOTION_BATCH_SIZE) -> dict:
+
+    batch = X.iloc[np.arange(batch_size) % len(X)]
+    model.predict_proba(batch.iloc[:PROMOTION_WARMUP])
+    timings = time_calls(lambda i: model.predict_proba(batch), PROMOTION_BATCH_REPEAT)
+    return {"batch_rows_per_s": batch_size / (float(np.median(timings)) / 1000)}
+
+## Size of the pickled pipeline (MLflow format) and time to load it back
+def serialized_size_and_load_time(model) -> dict:
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        model_dir = os.path.join(tmp_dir, "model")
+        mlflow.sklearn.save_model(model, model_dir)
+        size = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(model_dir) for name in names)
+        start_time = time.perf_counter()
+        mlflow.sklearn.load_model(model_dir)
+        load_seconds = time.perf_counter() - start_time
+    return {"model_size_mb": size / 1024 / 1024, "model_load_seconds": load_seconds}
+
+## Quality on the test set
+def test_quality(model, X_test, y_test) -> dict:
+
+    predictions = model.predict(X_test)
+    return {"test_f1": f1_score(y_test, predictions), "test_precision": precision_score(y_test, predictions, zero_division=0),
+            "test_recall": recall_score(y_test, predictions)}
+
+## Every metric of the gate (compiled : flat-array forest of the scoring API, measured if given)
+def benchmark_candidate(model, X_test, y_test, compiled=None) -> dict:
+
+    metrics = single_row_latency(model, X_test, "")
+    if compiled is not None:
+        metrics.update(single_row_latency(compiled, X_test, "compiled_"))
+    metrics.update(batch_throughput(model, X_test))
+    metrics.update(serialized_size_and_load_time(model))
+    metrics.update(test_quality(model, X_test, y_test))
+    return metrics
+
+## Thresholds not met : [(metric, value, threshold), ...] (empty : the candidate can be promoted)
+def promotion_failures(metrics: dict, max_p99_ms: float = PROMOTION_MAX_P99_MS,
+                       min_rows_per_s: float = PROMOTION_MIN_ROWS_PER_S, max_model_mb: float = PROMOTION_MAX_MODEL_MB,
+                       min_f1: float = PROMOTION_MIN_F1) -> list:
+
+    failures = []
+    for metric, threshold, too_high in (("single_row_p99_ms", max_p99_ms, True),
+                                        ("batch_rows_per_s", min_rows_per_s, False),
+                                        ("model_size_mb", max_model_mb, True),
+                                        ("test_f1", min_f1, False)):
+        value = metrics[metric]
+        if threshold and (value > threshold if too_high else value < threshold):
+            failures.append((metric, value, threshold))
+    return failures
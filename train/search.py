@@ -0,0 +1,106 @@
+# Hyperparameter search of train/train.py (--search) : features engineering and ColumnTransformer fitted once,
+# their matrices shared by every candidate (each candidate only pays for the classifier fit), candidates fitted
+# in parallel in a process pool.
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from sklearn.base import clone
+from sklearn.model_selection import ParameterGrid, train_test_split
+from sklearn.metrics import f1_score, precision_score, recall_score, roc_auc_score
+import logging
+
+# Log infos
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# === Search settings ===
+## Grid of the classifier : "param=value,value;param=value,value"
+TRAIN_SEARCH_GRID = os.getenv("TRAIN_SEARCH_GRID", "n_estimators=5,20,50;min_samples_split=2,10")
+## Candidates fitted at the same time (1 : one at a time, each using every core)
+TRAIN_SEARCH_WORKERS = int(os.getenv("TRAIN_SEARCH_WORKERS", str(os.cpu_count() or 1)))
+## Share of the training set held out to compare the candidates (the test set is kept for the final model)
+TRAIN_SEARCH_VALIDATION = float(os.getenv("TRAIN_SEARCH_VALIDATION", "0.2"))
+## Metric of the validation set used to pick the best candidate
+TRAIN_SEARCH_METRIC = os.getenv("TRAIN_SEARCH_METRIC", "f1")
+
+
+## "n_estimators=5,20;min_samples_split=2,10" -> {"n_estimators": [5, 20], "min_samples_split": [2, 10]}
+def parse_grid(grid: str) -> dict:
+
+    parsed = {}
+    for item in filter(None, (item.strip() for item in grid.split(";"))):
+        name, _, values = item.partition("=")
+        if not values:
+            raise ValueError(f"Grille invalide : {item} (param=valeur,valeur attendu)")
+        parsed[name.strip()] = [parse_value(value.strip()) for value in values.split(",")]
+    return parsed
+
+def parse_value(value: str):
+
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return {"None": None, "True": True, "False": False}.get(value, value)
+
+
+# === Matrices shared by every candidate (sent once to each process of the pool) ===
+_search_data = None
+
+def init_trial(data: dict):
+
+    global _search_data
+    _search_data = data
+    # Candidates are logged by the parent process (nested runs), not by autolog in the workers
+    import mlflow.sklearn
+    mlflow.sklearn.autolog(disable=True)
+
+## One candidate : classifier fitted on the transformed training matrix, scored on the validation matrix
+def run_trial(classifier, params: dict, n_jobs: int) -> dict:
+
+    start_time = time.perf_counter()
+    classifier = clone(classifier).set_params(**params, n_jobs=n_jobs)
+    classifier.fit(_search_data["X_fit"], _search_data["y_fit"])
+    fit_seconds = time.perf_counter() - start_time
+
+    y_val = _search_data["y_val"]
+    probabilities = classifier.predict_proba(_search_data["X_val"])[:, 1]
+    predictions = classifier.classes_[(probabilities > 0.5).astype(int)]
+    metrics = {"f1": f1_score(y_val, predictions), "precision": precision_score(y_val, predictions, zero_division=0),
+               "recall": recall_score(y_val, predictions), "roc_auc": roc_auc_score(y_val, probabilities)}
+    return {"params": params, "metrics": metrics, "fit_seconds": fit_seconds,
+            "trial_seconds": time.perf_counter() - start_time, "pid": os.getpid()}
+
+
+## Every candidate of the grid, best first : [{"params", "metrics", "fit_seconds", "trial_seconds"}, ...]
+## preprocessor : unfitted (features engineering + transforming) pipeline, on_result(result) called as each one ends
+def search(preprocessor, classifier, X_train, y_train, grid: dict, workers: int = TRAIN_SEARCH_WORKERS,
+           validation: float = TRAIN_SEARCH_VALIDATION, metric: str = TRAIN_SEARCH_METRIC, on_result=None) -> list:
+
+    # Features engineering and transforming fitted once, on the part of the training set used for fitting
+    start_time = time.perf_counter()
+    X_fit, X_val, y_fit, y_val = train_test_split(X_train, y_train, test_size=validation, stratify=y_train,
+                                                  random_state=42)
+    preprocessor = clone(preprocessor)
+    data = {"X_fit": preprocessor.fit_transform(X_fit), "y_fit": y_fit.to_numpy(),
+            "X_val": preprocessor.transform(X_val), "y_val": y_val.to_numpy()}
+    candidates = list(ParameterGrid(grid))
+    workers = max(1, min(workers, len(candidates)))
+    logging.info(f"🚀 Recherche : {len(candidates)} candidats, {workers} processus "
+                 f"(prétraitement {time.perf_counter() - start_time:.2f} s)")
+
+    # Several candidates at once : one core each / one at a time : every core for its trees
+    n_jobs = 1 if workers > 1 else -1
+    results = []
+    with ProcessPoolExecutor(workers, initializer=init_trial, initargs=(data,)) as pool:
+        futures = [pool.submit(run_trial, classifier, params, n_jobs) for params in candidates]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            logging.info(f"✅ {result['params']} : {metric} {result['metrics'][metric]:.4f} "
+                         f"({result['trial_seconds']:.2f} s)")
+            if on_result:
+                on_result(result)
+
+    return sorted(results, key=lambda result: result["metrics"][metric], reverse=True)
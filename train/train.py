@@ -3,10 +3,12 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Import libraries
-import pandas as pd
+import os
+import sys
 import numpy as np
 import argparse
 import time
+import tempfile
 import mlflow
 from mlflow.models.signature import infer_signature
 from mlflow.tracking import MlflowClient
@@ -16,6 +18,15 @@ from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
 from sklearn.ensemble import RandomForestClassifier
 
+# Features engineering is imported from app/ (and shipped with the model), not pickled by value
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+sys.path.append(APP_DIR)
+from features import features_engineering
+from compiled_model import compile_pipeline
+from dataset import iter_dataset_chunks, balanced_sample, to_model_input, TRAIN_DATA_PATH, TRAIN_SNAPSHOT_DIR, TRAIN_NEGATIVES
+from search import search, parse_grid, TRAIN_SEARCH_GRID, TRAIN_SEARCH_WORKERS, TRAIN_SEARCH_METRIC
+from promotion import benchmark_candidate, promotion_failures
+
 if __name__ == "__main__":
 
     # MLflow tracking setup
@@ -39,6 +50,14 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--n_estimators", default=5)
     parser.add_argument("--min_samples_split", default=10)
+    parser.add_argument("--data", default=TRAIN_DATA_PATH, help="fraudTest.csv (TRAIN_DATA_PATH)")
+    parser.add_argument("--snapshot-dir", default=TRAIN_SNAPSHOT_DIR, help="Parquet snapshots (TRAIN_SNAPSHOT_DIR)")
+    parser.add_argument("--negatives", default=TRAIN_NEGATIVES, help="non-fraud transactions kept (TRAIN_NEGATIVES)")
+    parser.add_argument("--ratio", default=None, help="non-fraud transactions kept per fraud (at most --negatives)")
+    ## Search : every candidate of --grid (nested runs), the best one replaces --n_estimators / --min_samples_split
+    parser.add_argument("--search", action="store_true", help="hyperparameter search before the final fit")
+    parser.add_argument("--grid", default=TRAIN_SEARCH_GRID, help="param=value,value;param=value (TRAIN_SEARCH_GRID)")
+    parser.add_argument("--search-workers", default=TRAIN_SEARCH_WORKERS, help="candidates fitted at the same time")
     args = parser.parse_args()
   
     ##############################################################
@@ -46,24 +65,14 @@ if __name__ == "__main__":
 
     # Import data
     print("🏃 Loading dataset...")
-    data = pd.read_csv("C:/Users/Jedha1/Desktop/Bloc_4_Fraud_Detection_Plus/data/fraudTest.csv", index_col=0)
-    data = data.astype({col: "float64" for col in data.select_dtypes(include=["int"]).columns})
-
-    # Imbalanced dataset!!!
-    count_class_0, count_class_1 = data['is_fraud'].value_counts()
-
-    data_class_0 = data[data['is_fraud'] == 0]
-    data_class_1 = data[data['is_fraud'] == 1]
-
-    # Reduce Class 0 to Class 1 level
-    data_class_0_under = data_class_0.sample(55000, random_state=42)
-    #data_class_0_under = data_class_0.sample(count_class_1, random_state=42)
+    ## Imbalanced dataset!!! Class 0 reduced to --negatives rows (or --ratio per fraud), every fraud kept
+    ## Read by chunks from the typed snapshot (rebuilt only when the CSV changes) : the whole dataset is never in memory
+    chunks = iter_dataset_chunks(args.data, args.snapshot_dir)
+    ratio = float(args.ratio) if args.ratio else None
+    data = balanced_sample(chunks, negatives=int(args.negatives), ratio=ratio, seed=42)
 
-    # Concatenate new Class 0 and Class 1
-    data_balanced = pd.concat([data_class_0_under, data_class_1])
-
-    # Shuffle data to get a random order
-    data = data_balanced.sample(frac=1, random_state=42).reset_index(drop=True)
+    # Same dtypes as the transactions scored in production (float64 numbers, str objects)
+    data = to_model_input(data)
 
     # Separate target variable y from features X
     print("🏃 Separating labels from features...")
@@ -74,45 +83,7 @@ if __name__ == "__main__":
     print("🏃 Dividing into train and test sets...")
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, stratify = y, random_state=42)
 
-    ## Features engineering
-    def features_engineering(data):
-      
-        # Create new features
-        data = data.copy()
-        
-        # Extract date information
-        data['weekday'] = pd.to_datetime(data['trans_date_trans_time']).dt.day_name()
-        data['hour'] = pd.to_datetime(data['trans_date_trans_time']).dt.hour
-
-        # Enrichment with lenght of credit card number
-        data['cc_num'] = data['cc_num'].astype(str)
-        data['lenght_cc_num'] = data['cc_num'].str.len()
-  
-        # Convert date of birthday in age (from today)
-        data['age'] = pd.to_datetime('today').date().year - pd.to_datetime(data['dob']).dt.year
-
-        # Enrichment with distance (kms) between customer and merchant
-        def haversine(long, merch_long, lat, merch_lat):
-            # Convert degrees to radians
-            long, merch_long, lat, merch_lat = map(np.radians, [long, merch_long, lat, merch_lat])
-            diff_lon = merch_long - long
-            diff_lat = merch_lat - lat
-            # earth radius: 6371 kms
-            distance_km = 2*6371*np.arcsin(np.sqrt(np.sin(diff_lat/2.0)**2 + np.cos(lat) * np.cos(merch_lat) \
-                                                * np.sin(diff_lon/2.0)**2))
-            return distance_km
-        data.loc[:, 'distance_km'] = data.apply(lambda x: haversine(x['long'], x['merch_long'], x['lat'], x['merch_lat']), axis = 1)
-       
-        # Anonymize (because of compliance) and drop useless data (or too many categories)
-        useless_columns= ['trans_date_trans_time', 'cc_num', 'merchant', 'first', 'last', 'gender', 'street',
-                           'city', 'zip', 'state', 'lat', 'long', 'job', 'dob', 'trans_num', 'unix_time',
-                           'merch_lat', 'merch_long']
-        
-        data = data.drop(useless_columns, axis=1)
-        data = data.astype({col: "float64" for col in data.select_dtypes(include=["int"]).columns})
-
-        return data
-
+    ## Features engineering (shared with the model in production : app/features.py)
     engineering_preprocessor = FunctionTransformer(features_engineering)
 
     # Preprocessing 
@@ -153,28 +124,92 @@ if __name__ == "__main__":
     
     # Log experiment to MLFlow
     with mlflow.start_run(experiment_id = experiment.experiment_id) as run:
+
+        if args.search:
+            print("🏃 Hyperparameter search...")
+            search_start_time = time.time()
+
+            ## One nested run per candidate : its parameters, validation metrics and wall-clock
+            def log_trial(result):
+                with mlflow.start_run(run_name="-".join(f"{name}={value}" for name, value in result["params"].items()),
+                                      nested=True):
+                    mlflow.log_params(result["params"])
+                    mlflow.log_metrics({f"val_{name}": value for name, value in result["metrics"].items()})
+                    mlflow.log_metrics({"fit_seconds": result["fit_seconds"], "trial_seconds": result["trial_seconds"]})
+
+            ## Autolog off during the search : the preprocessing fit would log its params into this run,
+            ## and the final fit could no longer log its own (MLflow params can't change once logged)
+            mlflow.sklearn.autolog(disable=True)
+            try:
+                results = search(model[:-1], model[-1], X_train, y_train, parse_grid(args.grid),
+                                 workers=int(args.search_workers), on_result=log_trial)
+            finally:
+                mlflow.sklearn.autolog(log_models=False)
+            best = results[0]
+            model.set_params(**{f"Classifier__{name}": value for name, value in best["params"].items()})
+            mlflow.log_params({f"best_{name}": value for name, value in best["params"].items()})
+            mlflow.log_metrics({f"best_val_{TRAIN_SEARCH_METRIC}": best["metrics"][TRAIN_SEARCH_METRIC],
+                                "search_seconds": time.time() - search_start_time})
+            print(f"✅ Best candidate: {best['params']} ({TRAIN_SEARCH_METRIC} {best['metrics'][TRAIN_SEARCH_METRIC]:.4f})")
+
         print("🏃 Log model to MLFlow...")
+        ## Trees fitted on every core, the logged model scores on one (no thread pool per request in production)
+        model.set_params(Classifier__n_jobs=-1)
         model.fit(X_train, y_train)
+        model.set_params(Classifier__n_jobs=None)
         predictions = model.predict(X_train)
         print("✅ Model trained!")
         print(f"---Total training time: {time.time()-start_time:.2f} seconds")
 
+        # Compiled forest (flat NumPy arrays) for low-latency scoring, checked against the pipeline on the test set
+        # before the model is registered. Optional : if it fails or differs, the sklearn model is registered alone
+        # (the scoring API falls back to sklearn)
+        try:
+            compiled = compile_pipeline(model)
+            if not np.array_equal(compiled.predict_proba(X_test), model.predict_proba(X_test)):
+                raise ValueError("predictions differ from the pipeline on the test set")
+        except Exception as e:
+            compiled = None
+            mlflow.set_tag("compiled_model", "skipped")
+            print(f"[WARN] Compiled model skipped, sklearn model only: {e}")
+
         # Log model seperately to have more flexibility on setup 
         # Record in registry
-        mlflow.sklearn.log_model(
+        model_info = mlflow.sklearn.log_model(
             sk_model=model,
             artifact_path=EXPERIMENT_NAME,
             registered_model_name="fraud_detector_Christophe_RFC_",
-            signature=infer_signature(X_train, predictions))
+            signature=infer_signature(X_train, predictions),
+            code_paths=[os.path.join(APP_DIR, "features.py")])
         print("✅ Model logged in MLflow")
 
-        # Get last model's version
+        # Compiled forest logged with the model version
+        if compiled is not None:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                compiled_path = os.path.join(tmp_dir, "compiled_model.npz")
+                compiled.save(compiled_path)
+                mlflow.log_artifact(compiled_path, artifact_path=EXPERIMENT_NAME)
+            print("✅ Compiled model logged in MLflow")
+
+        # Promotion gate : latency, throughput, size, load time and quality of the candidate (PROMOTION_* thresholds)
+        print("🏃 Benchmarking the candidate...")
+        gate_metrics = benchmark_candidate(model, X_test, y_test, compiled)
+        mlflow.log_metrics(gate_metrics)
+        failures = promotion_failures(gate_metrics)
+        print("✅ " + ", ".join(f"{name}: {value:.4g}" for name, value in gate_metrics.items()))
+
+        # Version created by this log_model (not the latest one of the registry : another run may register meanwhile)
         client = MlflowClient()
-        latest = client.get_latest_versions(
-            "fraud_detector_Christophe_RFC_", stages=["None"]
-        )
-        if latest:
-            model_version = latest[-1].version
+        model_version = model_info.registered_model_version
+        if model_version is not None and failures:
+            print(f"[INFO] Model logged as version {model_version}")
+
+            # Over the budget : registered, but the alias stays on the current version
+            reasons = ", ".join(f"{name} {value:.4g} (threshold {threshold:g})" for name, value, threshold in failures)
+            client.set_model_version_tag("fraud_detector_Christophe_RFC_", model_version, "promotion", f"rejected: {reasons}")
+            mlflow.set_tag("promotion", "rejected")
+            print(f"[WARN] Alias 'production' not moved, version {model_version} rejected: {reasons}")
+        elif model_version is not None:
             print(f"[INFO] Model logged as version {model_version}")
 
             # Update alias "candidate"
@@ -183,6 +218,8 @@ if __name__ == "__main__":
                 alias="production",
                 version=model_version,
             )
+            client.set_model_version_tag("fraud_detector_Christophe_RFC_", model_version, "promotion", "promoted")
+            mlflow.set_tag("promotion", "promoted")
             print(f"[INFO] Alias 'production' now points to version {model_version}")
         else:
             print("[WARN] Aucun modèle trouvé dans le registre.")